@@ -17,3 +17,42 @@ CREATE TABLE groups (
     group_name VARCHAR(100) NOT NULL,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
+
+CREATE TABLE geocode_cache (
+    address TEXT PRIMARY KEY,
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX groups_group_name_user_id_idx ON groups (group_name, user_id);
+CREATE INDEX groups_user_id_idx ON groups (user_id);
+
+-- Поиск пользователей рядом: geohash (9 символов, ~5 м) с B-tree индексом.
+-- COLLATE "C" нужен, чтобы LIKE 'префикс%' шёл по индексу при любой локали БД.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS geohash VARCHAR(12) COLLATE "C";
+CREATE INDEX IF NOT EXISTS users_geohash_idx ON users (geohash);
+
+-- Агрегаты для центра группы: число участников с геолокацией и сумма их
+-- единичных векторов на сфере. Поддерживаются в тех же транзакциях, что
+-- меняют геолокации и состав групп; починить расхождения:
+-- python group_centroids.py verify / rebuild
+CREATE TABLE IF NOT EXISTS group_centroids (
+    group_name VARCHAR(100) PRIMARY KEY,
+    member_count INT NOT NULL DEFAULT 0,
+    sum_x DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_y DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_z DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Агрегаты для групп, созданных до появления таблицы.
+INSERT INTO group_centroids (group_name, member_count, sum_x, sum_y, sum_z)
+SELECT groups.group_name,
+       COUNT(users.latitude),
+       COALESCE(SUM(COS(RADIANS(users.latitude)) * COS(RADIANS(users.longitude))), 0),
+       COALESCE(SUM(COS(RADIANS(users.latitude)) * SIN(RADIANS(users.longitude))), 0),
+       COALESCE(SUM(SIN(RADIANS(users.latitude))), 0)
+FROM groups JOIN users ON users.id = groups.user_id
+GROUP BY groups.group_name
+ON CONFLICT (group_name) DO NOTHING;
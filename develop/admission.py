@@ -0,0 +1,94 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import CallbackContext
+from cache import TTLCache
+from rate_limiter import TokenBucket
+
+RATE_LIMITED_MESSAGE = "Слишком много запросов. Подождите немного и попробуйте снова."
+OVERLOADED_MESSAGE = "Бот сейчас перегружен. Попробуйте через минуту."
+
+
+class AdmissionController:
+    """Контроль допуска для поисковых команд.
+
+    Каждый пользователь получает свой token bucket, общее число
+    одновременно выполняемых поисков ограничено max_concurrent, а очередь
+    ожидающих - max_queue. Всё, что не помещается, получает вежливый отказ.
+    Число одновременных запросов к внешним API ограничивает сам ApiClient
+    (max_concurrency).
+    """
+
+    def __init__(
+        self,
+        user_rate=0.2,
+        user_burst=3,
+        max_concurrent=20,
+        max_queue=100,
+        max_users=10000,
+    ):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._buckets = TTLCache(ttl=3600, max_entries=max_users)
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_rate_limited = 0
+        self.rejected_overloaded = 0
+
+    def _bucket(self, user_id):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(rate=self.user_rate, capacity=self.user_burst)
+            self._buckets.set(user_id, bucket)
+        return bucket
+
+    def guard(self, handler):
+        async def guarded(update: Update, context: CallbackContext) -> None:
+            # Перегрузка проверяется первой: отказ не по вине пользователя
+            # не должен тратить его токен.
+            if self.in_flight >= self.max_concurrent and self.waiting >= self.max_queue:
+                self.rejected_overloaded += 1
+                await self._reply(update, OVERLOADED_MESSAGE)
+                return
+
+            user = update.effective_user
+            if user is not None and not self._bucket(user.id).try_acquire():
+                self.rejected_rate_limited += 1
+                await self._reply(update, RATE_LIMITED_MESSAGE)
+                return
+
+            self.waiting += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self.waiting -= 1
+
+            self.admitted += 1
+            self.in_flight += 1
+            try:
+                await handler(update, context)
+            finally:
+                self.in_flight -= 1
+                self._slots.release()
+
+        return guarded
+
+    @staticmethod
+    async def _reply(update, text):
+        if update.callback_query:
+            await update.callback_query.message.reply_text(text)
+        elif update.message:
+            await update.message.reply_text(text)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_rate_limited": self.rejected_rate_limited,
+            "rejected_overloaded": self.rejected_overloaded,
+        }
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import httpx
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metrics import UPSTREAM_LATENCY, UPSTREAM_RESPONSES
+from tracing import TRACER
+
+CATALOG_URL = "https://catalog.api.2gis.com/3.0/items"
+GEOCODER_URL = "https://nominatim.openstreetmap.org/search"
+SERVICE_TITLES = {"catalog": "2GIS", "nominatim": "Nominatim"}
+HEALTH_URLS = {
+    "catalog": CATALOG_URL,
+    "nominatim": "https://nominatim.openstreetmap.org/status",
+}
+
+
+class InvalidResponseError(httpx.HTTPError):
+    """Сервис ответил успешно, но тело ответа не разбирается как JSON
+    (например, HTML-страница прокси или заглушки)."""
+
+
+class ApiClient:
+    """Асинхронный клиент для 2GIS и Nominatim с общим пулом соединений."""
+
+    def __init__(
+        self,
+        timeout=5.0,
+        max_connections=100,
+        max_keepalive_connections=20,
+        max_concurrency=200,
+        user_agent="knad_bar_bot",
+        transport=None,
+        breakers=None,
+    ):
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.headers = {"User-Agent": user_agent}
+        self.transport = transport
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        if breakers is None:
+            breakers = {
+                "catalog": CircuitBreaker("catalog"),
+                "nominatim": CircuitBreaker("nominatim"),
+            }
+        self.breakers = breakers
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                headers=self.headers,
+                transport=self.transport,
+            )
+        return self._client
+
+    def is_available(self, service):
+        breaker = self.breakers.get(service)
+        return breaker is None or not breaker.is_open()
+
+    def retry_after(self, service):
+        breaker = self.breakers.get(service)
+        return breaker.retry_after() if breaker is not None else 0.0
+
+    async def get_json(self, url, params, timeout=None, service="other"):
+        breaker = self.breakers.get(service)
+        if breaker is None:
+            return await self._request(url, params, timeout, service)
+        if not breaker.allow():
+            UPSTREAM_RESPONSES.labels(service, "circuit_open").inc()
+            title = SERVICE_TITLES.get(service, service)
+            raise CircuitOpenError(f"Сервис {title} временно недоступен")
+        try:
+            result = await self._request(url, params, timeout, service)
+        except httpx.HTTPError as e:
+            if self._is_outage(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
+
+    @staticmethod
+    def _is_outage(error):
+        """Таймауты, обрывы соединения, 5xx и 429 говорят о проблемах сервиса,
+        остальные 4xx - об ошибке в самом запросе."""
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status >= 500 or status == 429
+        return True
+
+    async def _request(self, url, params, timeout, service):
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                with TRACER.span(f"http {service}"):
+                    response = await self._get_client().get(
+                        url, params=params, timeout=timeout or self.timeout
+                    )
+            except httpx.HTTPError:
+                UPSTREAM_RESPONSES.labels(service, "error").inc()
+                raise
+            finally:
+                UPSTREAM_LATENCY.labels(service).observe(time.perf_counter() - start)
+            UPSTREAM_RESPONSES.labels(service, str(response.status_code)).inc()
+            response.raise_for_status()
+            try:
+                return response.json()
+            except ValueError as e:
+                UPSTREAM_RESPONSES.labels(service, "invalid_body").inc()
+                title = SERVICE_TITLES.get(service, service)
+                raise InvalidResponseError(
+                    f"Сервис {title} вернул некорректный ответ"
+                ) from e
+
+    async def search_items(self, params, timeout=None):
+        return await self.get_json(
+            CATALOG_URL, params, timeout=timeout, service="catalog"
+        )
+
+    async def geocode(self, params, timeout=None):
+        return await self.get_json(
+            GEOCODER_URL, params, timeout=timeout, service="nominatim"
+        )
+
+    async def ping(self, service):
+        """Открывает соединение с сервисом заранее. Любой ответ, кроме 5xx,
+        значит, что сервис доступен; в автомат результат не попадает."""
+        try:
+            response = await self._get_client().head(HEALTH_URLS[service])
+        except httpx.HTTPError as e:
+            print(f"Сервис {SERVICE_TITLES[service]} не отвечает: {e}")
+            return False
+        return response.status_code < 500
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from database_manager import DatabaseManager
+from metrics import DB_ERRORS, DB_IN_FLIGHT, DB_LATENCY
+from tracing import TRACER
+
+
+class AsyncDatabaseManager:
+    """Асинхронная обёртка над DatabaseManager с пулом соединений.
+
+    Каждая операция берёт соединение из пула, выполняет запрос в отдельном
+    потоке и возвращает соединение обратно. Соединения, которые сервер
+    закрыл, выбрасываются из пула, а запрос повторяется на новом.
+    """
+
+    def __init__(
+        self,
+        db_name,
+        user,
+        password,
+        host="localhost",
+        port="5432",
+        min_connections=1,
+        max_connections=10,
+        statement_timeout=5000,
+        connect_timeout=5,
+        reconnect_attempts=1,
+    ):
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.reconnect_attempts = reconnect_attempts
+        self.connect_kwargs = {
+            "dbname": db_name,
+            "user": user,
+            "password": password,
+            "host": host,
+            "port": port,
+            "connect_timeout": connect_timeout,
+            "options": f"-c statement_timeout={statement_timeout}",
+        }
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(
+                    self.min_connections, self.max_connections, **self.connect_kwargs
+                )
+            return self._pool
+
+    def _call_sync(self, method_name, args):
+        pool = self._get_pool()
+        attempts = self.reconnect_attempts + 1
+        for attempt in range(attempts):
+            connection = pool.getconn()
+            try:
+                manager = DatabaseManager.from_connection(connection)
+                result = getattr(manager, method_name)(*args)
+                if not connection.closed:
+                    manager.cursor.close()
+                    return result
+            except (psycopg2.InterfaceError, psycopg2.OperationalError):
+                if not connection.closed or attempt == attempts - 1:
+                    raise
+            finally:
+                pool.putconn(connection, close=bool(connection.closed))
+            print("Соединение с БД потеряно, переподключение...")
+        return result
+
+    async def _call(self, method_name, *args, default=None):
+        in_flight = DB_IN_FLIGHT.labels(method_name)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            with TRACER.span(f"db {method_name}"):
+                async with self._semaphore:
+                    return await asyncio.to_thread(self._call_sync, method_name, args)
+        except Exception as e:
+            DB_ERRORS.labels(method_name).inc()
+            print(f"Ошибка при выполнении {method_name} в БД: {e}")
+            return default
+        finally:
+            in_flight.dec()
+            DB_LATENCY.labels(method_name).observe(time.perf_counter() - start)
+
+    async def add_user(self, username):
+        return await self._call("add_user", username)
+
+    async def update_user_location(self, username, latitude, longitude):
+        return await self._call("update_user_location", username, latitude, longitude)
+
+    async def add_users(self, usernames):
+        return await self._call("add_users", usernames, default=False)
+
+    async def update_user_locations(self, locations):
+        return await self._call("update_user_locations", locations, default=False)
+
+    async def get_user_location(self, username):
+        return await self._call("get_user_location", username)
+
+    async def get_all_users(self):
+        return await self._call("get_all_users", default=[])
+
+    async def add_user_to_group(self, username, group_name):
+        return await self._call(
+            "add_user_to_group", username, group_name, default=False
+        )
+
+    async def remove_user_from_group(self, username, group_name):
+        return await self._call(
+            "remove_user_from_group", username, group_name, default=False
+        )
+
+    async def get_group_members(self, group_name):
+        return await self._call("get_group_members", group_name, default=[])
+
+    async def get_group_locations(self, group_name):
+        return await self._call("get_group_locations", group_name, default=[])
+
+    async def get_group_center(self, group_name):
+        return await self._call("get_group_center", group_name)
+
+    async def get_cached_coordinates(self, address, ttl, miss_ttl):
+        return await self._call("get_cached_coordinates", address, ttl, miss_ttl)
+
+    async def save_cached_coordinates(self, address, latitude, longitude):
+        return await self._call("save_cached_coordinates", address, latitude, longitude)
+
+    async def get_users_within(self, latitude, longitude, radius, group_name=None):
+        return await self._call(
+            "get_users_within", latitude, longitude, radius, group_name, default=[]
+        )
+
+    async def get_nearest_users(
+        self, latitude, longitude, k, max_radius=50000, group_name=None
+    ):
+        return await self._call(
+            "get_nearest_users",
+            latitude,
+            longitude,
+            k,
+            max_radius,
+            group_name,
+            default=[],
+        )
+
+    async def backfill_user_geohashes(self, batch_size=1000):
+        return await self._call("backfill_user_geohashes", batch_size, default=0)
+
+    async def ping(self):
+        """Создаёт пул, если его ещё нет, и проверяет соединение с БД."""
+        return await self._call("ping", default=False)
+
+    async def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            await asyncio.to_thread(pool.closeall)
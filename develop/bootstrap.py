@@ -0,0 +1,39 @@
+from telegram.ext import Application
+from update_processor import PerUserUpdateProcessor
+from metrics import start_metrics_server
+from tracing import TRACER, TracedRequest, create_exporter
+
+
+def build_application(token, config, updater=True):
+    """Application с обработкой апдейтов по пользователям и трассировкой
+    вызовов Bot API. Воркеры получают апдейты от приёмника, поэтому
+    собираются без updater."""
+    update_processor = PerUserUpdateProcessor(
+        max_workers=config.getint("bot", "max_workers", fallback=32),
+        max_pending_updates=config.getint("bot", "max_pending_updates", fallback=256),
+        max_user_pending=config.getint("bot", "max_user_pending", fallback=4),
+    )
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(TracedRequest(connection_pool_size=256))
+        .concurrent_updates(update_processor)
+    )
+    if not updater:
+        builder = builder.updater(None)
+    return builder.build()
+
+
+def configure_observability(config, metrics_port_offset=0):
+    TRACER.configure(
+        create_exporter(
+            config.get("tracing", "exporter", fallback="none"),
+            path=config.get("tracing", "path", fallback="traces.jsonl"),
+            endpoint=config.get("tracing", "endpoint", fallback=None),
+        )
+    )
+    if config.getboolean("metrics", "enabled", fallback=True):
+        start_metrics_server(
+            port=config.getint("metrics", "port", fallback=8000) + metrics_port_offset,
+            addr=config.get("metrics", "addr", fallback="127.0.0.1"),
+        )
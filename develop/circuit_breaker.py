@@ -0,0 +1,108 @@
+import time
+from collections import deque
+
+import httpx
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Запрос не отправлялся: сервис недавно отказывал и автомат разомкнут.
+
+    Наследуется от httpx.HTTPError, чтобы существующие обработчики сетевых
+    ошибок (резервный ответ из индекса, пропуск геокодирования) работали
+    без изменений.
+    """
+
+
+class CircuitBreaker:
+    """Автомат с состояниями closed, open и half-open.
+
+    В закрытом состоянии помнит исходы последних window вызовов и
+    размыкается, если среди них не меньше min_calls и доля отказов
+    достигла failure_rate. Через reset_timeout секунд пропускает один
+    пробный вызов: успех замыкает автомат, отказ снова размыкает.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_rate=0.5,
+        window=20,
+        min_calls=5,
+        reset_timeout=30.0,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self._results = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def is_open(self):
+        """Разомкнут и ещё не готов к пробному вызову."""
+        return self.state == OPEN and self.retry_after() > 0
+
+    def retry_after(self):
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def allow(self):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            self._close()
+        else:
+            self._results.append(True)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._results.append(False)
+        failures = self._results.count(False)
+        if (
+            len(self._results) >= self.min_calls
+            and failures / len(self._results) >= self.failure_rate
+        ):
+            self._open()
+
+    def release(self):
+        """Пробный вызов не дал ответа (например, был отменён)."""
+        self._probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self._probe_in_flight = False
+        print(f"Сервис {self.name} недоступен, запросы приостановлены")
+
+    def _close(self):
+        self.state = CLOSED
+        self._results.clear()
+        self._probe_in_flight = False
+
+    def stats(self):
+        return {
+            "open": int(self.state != CLOSED),
+            "calls": len(self._results),
+            "failures": self._results.count(False),
+        }
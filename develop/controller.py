@@ -15,71 +15,322 @@ from telegram.ext import (
 from location_manager import LocationManager
 from search import Search
 from group import Group
-from database_manager import DatabaseManager
+from async_database_manager import AsyncDatabaseManager
+from write_behind import WriteBehindDatabaseManager
+from location_cache import CachedDatabaseManager
+from admission import AdmissionController
+from api_client import ApiClient
+from circuit_breaker import CircuitBreaker
+from cache import TTLCache
+from shared_cache import SharedCache
+from geocoder import NOMINATIM_RATE, Geocoder
+from rate_limiter import TokenBucket
+from spatial_index import VenueIndex
+from metrics import HEALTH, STATS, instrument, record_cold_start
+from tracing import PROFILER, TRACER, install_profiler_signal
+import asyncio
 import configparser
+import functools
 
+INFO_MESSAGE = (
+    "Спасибо за использование данного бота, с его помощью вы сможете найти ближайший бар для вас и ваших друзей, бот работает "
+    "в двух режимах:\n"
+    "Одиночный режим: бот ищет бар/клуб исходя из вашей геолокации\n"
+    "Групповой режим: бот ищет бар/клуб исходя из геолокации всех участников\n\n"
+    "Узнать о боте:\n/info\n\n"
+    "Найти ближайший бар:\n /search\n\n"
+    "Обновить геолокацию:\n /update_location\n\n"
+    "Текущая геолокация:\n /current_location\n\n"
+    "Список группы:\n /show_group_info\n\n"
+    "Найти бар для группы:\n /search_for_group"
+)
 
-def read_api_key_from_config(file_path: str) -> str:
+# Разметка клавиатур неизменяема, поэтому собирается один раз при импорте.
+START_REPLY_MARKUP = ReplyKeyboardMarkup(
+    [
+        [
+            KeyboardButton("/menu"),
+            KeyboardButton("Обновить геолокацию", request_location=True),
+        ]
+    ],
+    resize_keyboard=True,
+)
+START_INLINE_MARKUP = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("Узнать о боте", callback_data="info")],
+        [InlineKeyboardButton("Найти ближайший бар/клуб", callback_data="search")],
+        [InlineKeyboardButton("Список группы", callback_data="status_group")],
+        [
+            InlineKeyboardButton(
+                "Найти бар для группы", callback_data="search_for_group"
+            )
+        ],
+    ]
+)
+MENU_MARKUP = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("Узнать о боте", callback_data="info")],
+        [InlineKeyboardButton("Найти ближайший бар", callback_data="search")],
+        [InlineKeyboardButton("Обновить геолокацию", callback_data="update_location")],
+        [InlineKeyboardButton("Текущая геолокация", callback_data="current_location")],
+        [
+            InlineKeyboardButton(
+                "Показать список группы", callback_data="show_group_info"
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                "Найти бар для группы", callback_data="search_for_group"
+            )
+        ],
+    ]
+)
+
+
+def read_config(file_path: str) -> configparser.ConfigParser:
     config = configparser.ConfigParser()
     config.read(file_path)
+    return config
+
+
+def read_api_key_from_config(file_path: str) -> str:
+    config = read_config(file_path)
     return config["api"]["yandex_api_key"]
 
 
 class Controller:
-    def __init__(self, application):
-        api_key = read_api_key_from_config("../config.ini")
-        self.db_manager = DatabaseManager(
-            db_name="bot_database",
-            user="postgres",
-            password="mysecretpassword",
-            host="localhost",
-            port="5432",
-        )
-        self.location_manager = LocationManager(self.db_manager)
+    def __init__(self, application, config=None, db_backend=None, api_client=None):
+        if config is None:
+            config = read_config("../config.ini")
+        api_key = config["api"]["yandex_api_key"]
+        self.config = config
+        self._warmup_tasks = set()
+        self.db_manager = self._create_db_manager(config, db_backend)
         self.application = application
-        self.search = Search(api_key=api_key, db_manager=self.db_manager)
+        self.api_client = api_client or ApiClient(
+            timeout=config.getfloat("api", "timeout", fallback=5.0),
+            max_connections=config.getint("api", "max_connections", fallback=100),
+            max_concurrency=config.getint("api", "max_concurrency", fallback=200),
+            breakers={
+                service: self._create_breaker(config, service)
+                for service in ("catalog", "nominatim")
+            },
+        )
+        self.search = Search(
+            api_key=api_key,
+            db_manager=self.db_manager,
+            api_client=self.api_client,
+            venue_cache=self._create_cache(
+                config,
+                # Записи Venue, а не сырой JSON 2GIS, как раньше в "venues".
+                "venue_records",
+                ttl=config.getint("cache", "venue_ttl", fallback=300),
+                max_entries=config.getint("cache", "venue_max_entries", fallback=1024),
+            ),
+            tile_precision=config.getint("cache", "tile_precision", fallback=7),
+            geocoder=Geocoder(
+                self.api_client,
+                self.db_manager,
+                ttl=config.getint("cache", "geocode_ttl", fallback=30 * 24 * 3600),
+                miss_ttl=config.getint("cache", "geocode_miss_ttl", fallback=24 * 3600),
+                memory_cache=self._create_cache(
+                    config,
+                    "geocode",
+                    ttl=config.getint("cache", "geocode_ttl", fallback=30 * 24 * 3600),
+                    max_entries=4096,
+                ),
+                rate_limiter=self._create_nominatim_limiter(config),
+                # Не ставить в очередь Nominatim то, что не успеет к ответу.
+                max_wait=config.getfloat("api", "geocode_deadline", fallback=3.0),
+            ),
+            geocode_deadline=config.getfloat("api", "geocode_deadline", fallback=3.0),
+            center_in_db=config.getboolean("search", "center_in_db", fallback=False),
+            meeting_strategy=config.get(
+                "search", "meeting_strategy", fallback="centroid"
+            ),
+            revalidate_interval=config.getfloat(
+                "breaker", "revalidate_interval", fallback=5.0
+            ),
+            venue_index=VenueIndex(
+                max_venues=config.getint("index", "max_venues", fallback=100000),
+                coverage_ttl=config.getint("index", "coverage_ttl", fallback=3600),
+                min_venues=config.getint("index", "min_venues", fallback=1),
+            ),
+            prefetch_rate=config.getfloat("search", "prefetch_rate", fallback=1.0),
+            prefetch_burst=config.getint("search", "prefetch_burst", fallback=5),
+            max_prefetches=config.getint("search", "max_prefetches", fallback=4),
+        )
+        self.location_manager = LocationManager(
+            self.db_manager,
+            on_location=(
+                self.search.prefetch_area
+                if config.getboolean("search", "prefetch_on_location", fallback=False)
+                else None
+            ),
+        )
         self.group = Group(self.db_manager)
+        self.admission = AdmissionController(
+            user_rate=config.getfloat("admission", "user_rate", fallback=0.2),
+            user_burst=config.getint("admission", "user_burst", fallback=3),
+            max_concurrent=config.getint("admission", "max_concurrent", fallback=20),
+            max_queue=config.getint("admission", "max_queue", fallback=100),
+        )
+        self.search_command = self.admission.guard(self.search.search)
+        self.search_for_group_command = self.admission.guard(
+            self.search.search_for_group
+        )
+        self.search_nearby_command = self.admission.guard(self.search_nearby)
+        # Страница выдачи тоже может идти в 2GIS, поэтому проходит тот же допуск.
+        self.show_page_command = self.admission.guard(self.search.show_page)
+        STATS.register("admission", self.admission.stats)
+        STATS.register("location_cache", self.db_manager.stats)
+        STATS.register("prefetch", self.search.prefetch_stats)
+        for service, breaker in self.api_client.breakers.items():
+            STATS.register(f"breaker_{service}", breaker.stats)
         self._register_handlers()
+        self.application.post_init = self.post_init
+        self.application.post_shutdown = self.shutdown
 
-    def _register_handlers(self):
-        self.application.add_handler(CommandHandler("start", self.start))
-        self.application.add_handler(CommandHandler("menu", self.menu_handler))
-        self.application.add_handler(CommandHandler("info", self.info))
-        self.application.add_handler(CommandHandler("search", self.search.search))
-        self.application.add_handler(
-            CommandHandler("status_group", self.group.show_group_info)
+    @staticmethod
+    def _create_cache(config, namespace, ttl, max_entries):
+        """Кэш в памяти процесса или, если задан [cache] shared_path, общий
+        для всех воркеров кэш в SQLite."""
+        path = config.get("cache", "shared_path", fallback=None)
+        if path:
+            return SharedCache(path, namespace, ttl=ttl, max_entries=max_entries)
+        return TTLCache(ttl=ttl, max_entries=max_entries)
+
+    @staticmethod
+    def _create_nominatim_limiter(config):
+        """В режиме воркеров лимит Nominatim делится между процессами;
+        иначе используется общий лимитер модуля geocoder."""
+        if config.get("bot", "mode", fallback="polling") != "workers":
+            return None
+        workers = max(1, config.getint("workers", "count", fallback=1))
+        return TokenBucket(rate=NOMINATIM_RATE / workers, capacity=1)
+
+    @staticmethod
+    def _create_breaker(config, service):
+        return CircuitBreaker(
+            service,
+            failure_rate=config.getfloat("breaker", "failure_rate", fallback=0.5),
+            window=config.getint("breaker", "window", fallback=20),
+            min_calls=config.getint("breaker", "min_calls", fallback=5),
+            reset_timeout=config.getfloat("breaker", "reset_timeout", fallback=30.0),
         )
-        self.application.add_handler(
-            MessageHandler(filters.TEXT & ~filters.COMMAND, self.greet)
+
+    @staticmethod
+    def _create_db_manager(config, db_backend=None):
+        db_manager = db_backend or AsyncDatabaseManager(
+            db_name=config.get("database", "db_name", fallback="bot_database"),
+            user=config.get("database", "user", fallback="postgres"),
+            password=config.get("database", "password", fallback="mysecretpassword"),
+            host=config.get("database", "host", fallback="localhost"),
+            port=config.get("database", "port", fallback="5432"),
+            min_connections=config.getint("database", "min_connections", fallback=1),
+            max_connections=config.getint("database", "max_connections", fallback=10),
+            statement_timeout=config.getint(
+                "database", "statement_timeout", fallback=5000
+            ),
         )
-        self.application.add_handler(CallbackQueryHandler(self.button_handler))
-        self.application.add_handler(
-            CommandHandler("search_for_group", self.search.search_for_group)
+        db_manager = WriteBehindDatabaseManager(
+            db_manager,
+            max_batch=config.getint("database", "write_batch_size", fallback=500),
+            # Воркер не видит буферы других процессов, поэтому по умолчанию
+            # пишет сразу, чтобы групповые запросы не теряли геолокации.
+            flush_interval=config.getfloat(
+                "database",
+                "write_flush_interval",
+                fallback=(
+                    0.0
+                    if config.get("bot", "mode", fallback="polling") == "workers"
+                    else 1.0
+                ),
+            ),
+            max_pending=config.getint("database", "write_max_pending", fallback=10000),
         )
-        self.application.add_handler(
-            CommandHandler(
-                "current_location", self.location_manager.show_current_location
-            )
+        return CachedDatabaseManager(
+            db_manager,
+            max_entries=config.getint("cache", "location_max_entries", fallback=10000),
+            ttl=config.getint("cache", "location_ttl", fallback=300),
+            enabled=config.getboolean("cache", "location_cache", fallback=True),
         )
-        self.application.add_handler(
-            CommandHandler(
-                "update_location", self.location_manager.update_location_command
-            )
+
+    async def post_init(self, application) -> None:
+        self.db_manager.start()
+        await self.warm_up()
+        print(f"Бот готов к работе за {record_cold_start():.2f} с")
+        install_profiler_signal(
+            every=self.config.getint("profiler", "every", fallback=100),
+            output=self.config.get("profiler", "output", fallback="profile.folded"),
         )
-        self.application.add_handler(
-            MessageHandler(filters.LOCATION, self.location_manager.update_location)
+
+    async def warm_up(self):
+        """Параллельно создаёт пул соединений с БД и открывает соединения с
+        2GIS и Nominatim. Ждёт не дольше warmup_timeout: медленная зависимость
+        не задерживает запуск, её проверка просто доделывается в фоне."""
+        checks = {
+            "database": self.db_manager.ping(),
+            "catalog": self.api_client.ping("catalog"),
+            "nominatim": self.api_client.ping("nominatim"),
+        }
+        tasks = set()
+        for component, check in checks.items():
+            task = asyncio.ensure_future(check)
+            task.add_done_callback(functools.partial(self._report_health, component))
+            tasks.add(task)
+        self._warmup_tasks = tasks
+        await asyncio.wait(
+            tasks, timeout=self.config.getfloat("bot", "warmup_timeout", fallback=5.0)
         )
-        self.application.add_handler(
-            CommandHandler("search_nearby", self.search_nearby)
+
+    @staticmethod
+    def _report_health(component, task):
+        healthy = (
+            not task.cancelled() and task.exception() is None and bool(task.result())
         )
+        HEALTH.labels(component).set(int(healthy))
+        if not healthy:
+            print(f"Проверка {component} при запуске не прошла")
+
+    async def shutdown(self, application) -> None:
+        PROFILER.stop()
+        await TRACER.close()
+        await self.api_client.close()
+        await self.db_manager.close()
+
+    def _register_handlers(self):
+        commands = {
+            "start": self.start,
+            "menu": self.menu_handler,
+            "info": self.info,
+            "search": self.search_command,
+            "status_group": self.group.show_group_info,
+            "search_for_group": self.search_for_group_command,
+            "current_location": self.location_manager.show_current_location,
+            "update_location": self.location_manager.update_location_command,
+            "search_nearby": self.search_nearby_command,
+            "add_to_group": self.group.add_to_group,
+            "show_group_info": self.group.show_group_info,
+            "remove_from_group": self.group.remove_from_group,
+        }
+        for command, callback in commands.items():
+            self.application.add_handler(
+                CommandHandler(command, instrument(command, callback))
+            )
         self.application.add_handler(
-            CommandHandler("add_to_group", self.group.add_to_group)
+            MessageHandler(
+                filters.TEXT & ~filters.COMMAND, instrument("greet", self.greet)
+            )
         )
         self.application.add_handler(
-            CommandHandler("show_group_info", self.group.show_group_info)
+            CallbackQueryHandler(instrument("button", self.button_handler))
         )
         self.application.add_handler(
-            CommandHandler("remove_from_group", self.group.remove_from_group)
+            MessageHandler(
+                filters.LOCATION,
+                instrument("location", self.location_manager.update_location),
+            )
         )
 
     async def search_nearby(self, update: Update, context: CallbackContext) -> None:
@@ -90,11 +341,11 @@ class Controller:
         )
         username = f"@{user.username}" if user.username else user.full_name
 
-        location = self.location_manager.db_manager.get_user_location(username)
+        location = await self.location_manager.db_manager.get_user_location(username)
 
         if location and location[0] is not None and location[1] is not None:
             latitude, longitude = location
-            results = self.search.find_nearest_bars_and_clubs(latitude, longitude)
+            results = await self.search.find_nearest_bars_and_clubs(latitude, longitude)
 
             if update.message:
                 await update.message.reply_text(results)
@@ -118,77 +369,16 @@ class Controller:
         user = update.message.from_user
         username = f"@{user.username}" if user.username else user.full_name
 
-        self.db_manager.add_user(username)
-
-        keyboard = [
-            [
-                KeyboardButton("/menu"),
-                KeyboardButton("Обновить геолокацию", request_location=True),
-            ]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-
-        inline_keyboard = [
-            [InlineKeyboardButton("Узнать о боте", callback_data="info")],
-            [InlineKeyboardButton("Найти ближайший бар/клуб", callback_data="search")],
-            [InlineKeyboardButton("Список группы", callback_data="status_group")],
-            [
-                InlineKeyboardButton(
-                    "Найти бар для группы", callback_data="search_for_group"
-                )
-            ],
-        ]
-        inline_reply_markup = InlineKeyboardMarkup(inline_keyboard)
-
-        welcome_message = (
-            "Спасибо за использование данного бота, с его помощью вы сможете найти ближайший бар для вас и ваших друзей, бот работает "
-            "в двух режимах:\n"
-            "Одиночный режим: бот ищет бар/клуб исходя из вашей геолокации\n"
-            "Групповой режим: бот ищет бар/клуб исходя из геолокации всех участников\n\n"
-            "Узнать о боте:\n/info\n\n"
-            "Найти ближайший бар:\n /search\n\n"
-            "Обновить геолокацию:\n /update_location\n\n"
-            "Текущая геолокация:\n /current_location\n\n"
-            "Список группы:\n /show_group_info\n\n"
-            "Найти бар для группы:\n /search_for_group"
-        )
+        await self.db_manager.add_user(username)
 
+        await update.message.reply_text(INFO_MESSAGE, reply_markup=START_INLINE_MARKUP)
         await update.message.reply_text(
-            welcome_message, reply_markup=inline_reply_markup
-        )
-        await update.message.reply_text(
-            "Меню доступно в любое время.", reply_markup=reply_markup
+            "Меню доступно в любое время.", reply_markup=START_REPLY_MARKUP
         )
 
     async def menu_handler(self, update: Update, context: CallbackContext) -> None:
-        keyboard = [
-            [InlineKeyboardButton("Узнать о боте", callback_data="info")],
-            [InlineKeyboardButton("Найти ближайший бар", callback_data="search")],
-            [
-                InlineKeyboardButton(
-                    "Обновить геолокацию", callback_data="update_location"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "Текущая геолокация", callback_data="current_location"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "Показать список группы", callback_data="show_group_info"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "Найти бар для группы", callback_data="search_for_group"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
         await update.message.reply_text(
-            "Выберите одну из опций:", reply_markup=reply_markup
+            "Выберите одну из опций:", reply_markup=MENU_MARKUP
         )
 
     async def button_handler(self, update: Update, context: CallbackContext) -> None:
@@ -198,7 +388,7 @@ class Controller:
         if query.data == "info":
             await self.info(update, context, is_callback=True)
         elif query.data == "search":
-            await self.search.search(update, context)
+            await self.search_command(update, context)
         elif query.data == "update_location":
             await self.request_location(update, context)
         elif query.data == "current_location":
@@ -206,7 +396,9 @@ class Controller:
         elif query.data == "show_group_info":
             await self.group.show_group_info(update, context)
         elif query.data == "search_for_group":
-            await self.search.search_for_group(update, context)
+            await self.search_for_group_command(update, context)
+        elif query.data.startswith("page:"):
+            await self.show_page_command(update, context)
 
     async def request_location(self, update: Update, context: CallbackContext) -> None:
         if update.callback_query:
@@ -221,20 +413,7 @@ class Controller:
     async def info(
         self, update: Update, context: CallbackContext, is_callback=False
     ) -> None:
-        info_message = (
-            "Спасибо за использование данного бота, с его помощью вы сможете найти ближайший бар для вас и ваших друзей, бот работает "
-            "в двух режимах:\n"
-            "Одиночный режим: бот ищет бар/клуб исходя из вашей геолокации\n"
-            "Групповой режим: бот ищет бар/клуб исходя из геолокации всех участников\n\n"
-            "Узнать о боте:\n/info\n\n"
-            "Найти ближайший бар:\n /search\n\n"
-            "Обновить геолокацию:\n /update_location\n\n"
-            "Текущая геолокация:\n /current_location\n\n"
-            "Список группы:\n /show_group_info\n\n"
-            "Найти бар для группы:\n /search_for_group"
-        )
-
         if is_callback:
-            await update.callback_query.message.reply_text(info_message)
+            await update.callback_query.message.reply_text(INFO_MESSAGE)
         else:
-            await update.message.reply_text(info_message)
+            await update.message.reply_text(INFO_MESSAGE)
@@ -1,4 +1,38 @@
 import psycopg2
+from psycopg2.extras import execute_values
+from metrics import DB_ERRORS
+from geo import (
+    geohash_cover,
+    geohash_encode,
+    haversine,
+    unit_vector,
+    vector_to_point,
+)
+
+# Длина geohash в таблице users (~5 м); запросы по радиусу используют
+# префиксы этой строки.
+USER_GEOHASH_PRECISION = 9
+
+
+def user_geohash(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return geohash_encode(latitude, longitude, USER_GEOHASH_PRECISION)
+
+
+def _location_vector(latitude, longitude):
+    if latitude is None or longitude is None:
+        return 0.0, 0.0, 0.0
+    return unit_vector(latitude, longitude)
+
+
+# Вектор точки в SQL, для пересборки и проверки агрегатов group_centroids.
+_CENTROID_SUMS = (
+    "COUNT(users.latitude) AS member_count, "
+    "COALESCE(SUM(COS(RADIANS(users.latitude)) * COS(RADIANS(users.longitude))), 0) AS sum_x, "
+    "COALESCE(SUM(COS(RADIANS(users.latitude)) * SIN(RADIANS(users.longitude))), 0) AS sum_y, "
+    "COALESCE(SUM(SIN(RADIANS(users.latitude))), 0) AS sum_z"
+)
 
 
 class DatabaseManager:
@@ -8,6 +42,13 @@ class DatabaseManager:
         )
         self.cursor = self.connection.cursor()
 
+    @classmethod
+    def from_connection(cls, connection):
+        manager = cls.__new__(cls)
+        manager.connection = connection
+        manager.cursor = connection.cursor()
+        return manager
+
     def add_user(self, username):
         try:
             self.cursor.execute(
@@ -17,19 +58,88 @@ class DatabaseManager:
             self.connection.commit()
         except Exception as e:
             print(f"Ошибка при добавлении пользователя в БД: {e}")
+            DB_ERRORS.labels("add_user").inc()
             self.connection.rollback()
 
     def update_user_location(self, username, latitude, longitude):
         try:
             self.cursor.execute(
-                "UPDATE public.users SET latitude = %s, longitude = %s WHERE username = %s;",
-                (latitude, longitude, username),
+                "SELECT id, latitude, longitude FROM public.users "
+                "WHERE username = %s FOR UPDATE;",
+                (username,),
+            )
+            previous = self.cursor.fetchone()
+            self.cursor.execute(
+                "UPDATE public.users SET latitude = %s, longitude = %s, geohash = %s "
+                "WHERE username = %s;",
+                (latitude, longitude, user_geohash(latitude, longitude), username),
             )
+            if previous is not None:
+                user_id, old_latitude, old_longitude = previous
+                self._shift_group_centroids(
+                    [(user_id, old_latitude, old_longitude, latitude, longitude)]
+                )
             self.connection.commit()
         except Exception as e:
             print(f"Ошибка при обновлении геолокации пользователя в БД: {e}")
+            DB_ERRORS.labels("update_user_location").inc()
             self.connection.rollback()
 
+    def add_users(self, usernames):
+        try:
+            execute_values(
+                self.cursor,
+                "INSERT INTO public.users (username) VALUES %s ON CONFLICT (username) DO NOTHING;",
+                [(username,) for username in usernames],
+            )
+            self.connection.commit()
+            return True
+        except Exception as e:
+            print(f"Ошибка при пакетном добавлении пользователей в БД: {e}")
+            DB_ERRORS.labels("add_users").inc()
+            self.connection.rollback()
+            return False
+
+    def update_user_locations(self, locations):
+        try:
+            # Строки блокируются в порядке имён, чтобы параллельные пакеты
+            # не ловили взаимоблокировку.
+            self.cursor.execute(
+                "SELECT username, id, latitude, longitude FROM public.users "
+                "WHERE username = ANY(%s) ORDER BY username FOR UPDATE;",
+                (sorted({username for username, _, _ in locations}),),
+            )
+            current = {row[0]: row[1:] for row in self.cursor.fetchall()}
+            execute_values(
+                self.cursor,
+                "INSERT INTO public.users (username, latitude, longitude, geohash) "
+                "VALUES %s ON CONFLICT (username) DO UPDATE SET "
+                "latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude, "
+                "geohash = EXCLUDED.geohash;",
+                [
+                    (username, latitude, longitude, user_geohash(latitude, longitude))
+                    for username, latitude, longitude in locations
+                ],
+            )
+            changes = []
+            for username, latitude, longitude in locations:
+                if username not in current:
+                    # Новый пользователь ещё не состоит в группах.
+                    continue
+                user_id, old_latitude, old_longitude = current[username]
+                changes.append(
+                    (user_id, old_latitude, old_longitude, latitude, longitude)
+                )
+                current[username] = (user_id, latitude, longitude)
+            self._shift_group_centroids(changes)
+            self.connection.commit()
+            return True
+        except Exception as e:
+            print(f"Ошибка при пакетном обновлении геолокаций в БД: {e}")
+            DB_ERRORS.labels("update_user_locations").inc()
+            self.connection.rollback()
+            return False
+
     def get_user_location(self, username):
         try:
             self.cursor.execute(
@@ -40,8 +150,14 @@ class DatabaseManager:
             return result if result else None
         except Exception as e:
             print(f"Ошибка при получении геолокации пользователя из БД: {e}")
+            DB_ERRORS.labels("get_user_location").inc()
             return None
 
+    def ping(self):
+        self.cursor.execute("SELECT 1;")
+        self.cursor.fetchone()
+        return True
+
     def close(self):
         self.cursor.close()
         self.connection.close()
@@ -52,4 +168,343 @@ class DatabaseManager:
             return self.cursor.fetchall()
         except Exception as e:
             print(f"Ошибка при получении списка пользователей: {e}")
+            DB_ERRORS.labels("get_all_users").inc()
             return []
+
+    def get_cached_coordinates(self, address, ttl, miss_ttl):
+        try:
+            self.cursor.execute(
+                "SELECT latitude, longitude FROM public.geocode_cache WHERE address = %s "
+                "AND updated_at > NOW() - make_interval(secs => CASE WHEN latitude IS NULL THEN %s ELSE %s END);",
+                (address, miss_ttl, ttl),
+            )
+            return self.cursor.fetchone()
+        except Exception as e:
+            print(f"Ошибка при получении координат из кэша геокодирования: {e}")
+            DB_ERRORS.labels("get_cached_coordinates").inc()
+            self.connection.rollback()
+            return None
+
+    def save_cached_coordinates(self, address, latitude, longitude):
+        try:
+            self.cursor.execute(
+                "INSERT INTO public.geocode_cache (address, latitude, longitude, updated_at) "
+                "VALUES (%s, %s, %s, NOW()) ON CONFLICT (address) DO UPDATE SET "
+                "latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude, updated_at = NOW();",
+                (address, latitude, longitude),
+            )
+            self.connection.commit()
+        except Exception as e:
+            print(f"Ошибка при сохранении координат в кэш геокодирования: {e}")
+            DB_ERRORS.labels("save_cached_coordinates").inc()
+            self.connection.rollback()
+
+    def add_user_to_group(self, username, group_name):
+        try:
+            user = self._lock_user(username)
+            if user is None:
+                self.connection.rollback()
+                return False
+            user_id, latitude, longitude = user
+            self.cursor.execute(
+                "INSERT INTO public.groups (user_id, group_name) VALUES (%s, %s) "
+                "ON CONFLICT (group_name, user_id) DO NOTHING;",
+                (user_id, group_name),
+            )
+            added = self.cursor.rowcount > 0
+            if added:
+                self._add_to_group_centroid(group_name, latitude, longitude, 1)
+            self.connection.commit()
+            return added
+        except Exception as e:
+            print(f"Ошибка при добавлении пользователя в группу: {e}")
+            DB_ERRORS.labels("add_user_to_group").inc()
+            self.connection.rollback()
+            return False
+
+    def remove_user_from_group(self, username, group_name):
+        try:
+            user = self._lock_user(username)
+            if user is None:
+                self.connection.rollback()
+                return False
+            user_id, latitude, longitude = user
+            self.cursor.execute(
+                "DELETE FROM public.groups WHERE user_id = %s AND group_name = %s;",
+                (user_id, group_name),
+            )
+            removed = self.cursor.rowcount > 0
+            if removed:
+                self._add_to_group_centroid(group_name, latitude, longitude, -1)
+            self.connection.commit()
+            return removed
+        except Exception as e:
+            print(f"Ошибка при удалении пользователя из группы: {e}")
+            DB_ERRORS.labels("remove_user_from_group").inc()
+            self.connection.rollback()
+            return False
+
+    def _lock_user(self, username):
+        """id и геолокация пользователя; строка блокируется до конца транзакции,
+        чтобы смена геолокации не разошлась с агрегатами его групп."""
+        self.cursor.execute(
+            "SELECT id, latitude, longitude FROM public.users "
+            "WHERE username = %s FOR UPDATE;",
+            (username,),
+        )
+        return self.cursor.fetchone()
+
+    def _add_to_group_centroid(self, group_name, latitude, longitude, sign):
+        """Прибавляет (sign=1) или вычитает (sign=-1) точку участника из
+        агрегата группы."""
+        x, y, z = _location_vector(latitude, longitude)
+        count = 1 if latitude is not None and longitude is not None else 0
+        self.cursor.execute(
+            "INSERT INTO public.group_centroids "
+            "(group_name, member_count, sum_x, sum_y, sum_z, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, NOW()) ON CONFLICT (group_name) DO UPDATE SET "
+            "member_count = group_centroids.member_count + EXCLUDED.member_count, "
+            "sum_x = group_centroids.sum_x + EXCLUDED.sum_x, "
+            "sum_y = group_centroids.sum_y + EXCLUDED.sum_y, "
+            "sum_z = group_centroids.sum_z + EXCLUDED.sum_z, updated_at = NOW();",
+            (group_name, sign * count, sign * x, sign * y, sign * z),
+        )
+
+    def _shift_group_centroids(self, changes):
+        """Переносит точки пользователей в агрегатах всех их групп.
+
+        changes - список (id пользователя, старые широта и долгота, новые).
+        Вызывается внутри транзакции, обновившей users.
+        """
+        deltas = []
+        for user_id, old_latitude, old_longitude, latitude, longitude in changes:
+            old = _location_vector(old_latitude, old_longitude)
+            new = _location_vector(latitude, longitude)
+            count = int(latitude is not None and longitude is not None) - int(
+                old_latitude is not None and old_longitude is not None
+            )
+            delta = tuple(after - before for after, before in zip(new, old))
+            if count or any(delta):
+                deltas.append((user_id, *delta, count))
+        if not deltas:
+            return
+        execute_values(
+            self.cursor,
+            "UPDATE public.group_centroids SET "
+            "member_count = group_centroids.member_count + delta.count, "
+            "sum_x = group_centroids.sum_x + delta.x, "
+            "sum_y = group_centroids.sum_y + delta.y, "
+            "sum_z = group_centroids.sum_z + delta.z, updated_at = NOW() "
+            "FROM (SELECT groups.group_name, SUM(d.count) AS count, SUM(d.x) AS x, "
+            "SUM(d.y) AS y, SUM(d.z) AS z FROM (VALUES %s) AS d (user_id, x, y, z, count) "
+            "JOIN public.groups ON groups.user_id = d.user_id "
+            "GROUP BY groups.group_name) AS delta "
+            "WHERE group_centroids.group_name = delta.group_name;",
+            deltas,
+            template="(%s, %s::float8, %s::float8, %s::float8, %s)",
+        )
+
+    def get_group_members(self, group_name):
+        try:
+            self.cursor.execute(
+                "SELECT users.id, users.username FROM public.groups "
+                "JOIN public.users ON users.id = groups.user_id "
+                "WHERE groups.group_name = %s ORDER BY users.username;",
+                (group_name,),
+            )
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"Ошибка при получении участников группы: {e}")
+            DB_ERRORS.labels("get_group_members").inc()
+            return []
+
+    def get_group_locations(self, group_name):
+        try:
+            self.cursor.execute(
+                "SELECT users.latitude, users.longitude FROM public.groups "
+                "JOIN public.users ON users.id = groups.user_id "
+                "WHERE groups.group_name = %s "
+                "AND users.latitude IS NOT NULL AND users.longitude IS NOT NULL;",
+                (group_name,),
+            )
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"Ошибка при получении геолокаций участников группы: {e}")
+            DB_ERRORS.labels("get_group_locations").inc()
+            return []
+
+    def get_group_center(self, group_name):
+        """Сферический центроид группы из агрегата group_centroids.
+
+        Возвращает (широта, долгота, участников с геолокацией) за одно
+        чтение по первичному ключу, независимо от размера группы.
+        """
+        try:
+            self.cursor.execute(
+                "SELECT sum_x, sum_y, sum_z, member_count FROM public.group_centroids "
+                "WHERE group_name = %s;",
+                (group_name,),
+            )
+            row = self.cursor.fetchone()
+        except Exception as e:
+            print(f"Ошибка при вычислении центра группы в БД: {e}")
+            DB_ERRORS.labels("get_group_center").inc()
+            self.connection.rollback()
+            return None
+        if row is None or not row[3]:
+            return None, None, 0
+        point = vector_to_point(*row[:3])
+        if point is None:
+            return None, None, 0
+        return point[0], point[1], row[3]
+
+    def verify_group_centroids(self, tolerance=1e-6):
+        """Группы, агрегаты которых разошлись с пересчётом по участникам.
+
+        Возвращает отсортированный список имён или None при ошибке.
+        """
+        try:
+            self.cursor.execute(
+                f"WITH actual AS (SELECT groups.group_name, {_CENTROID_SUMS} "
+                "FROM public.groups JOIN public.users ON users.id = groups.user_id "
+                "GROUP BY groups.group_name) "
+                "SELECT COALESCE(actual.group_name, stored.group_name) FROM actual "
+                "FULL JOIN public.group_centroids AS stored "
+                "ON stored.group_name = actual.group_name "
+                "WHERE stored.group_name IS NULL "
+                "OR COALESCE(actual.member_count, 0) <> stored.member_count "
+                "OR ABS(COALESCE(actual.sum_x, 0) - stored.sum_x) > %s "
+                "OR ABS(COALESCE(actual.sum_y, 0) - stored.sum_y) > %s "
+                "OR ABS(COALESCE(actual.sum_z, 0) - stored.sum_z) > %s "
+                "ORDER BY 1;",
+                (tolerance, tolerance, tolerance),
+            )
+            return [row[0] for row in self.cursor.fetchall()]
+        except Exception as e:
+            print(f"Ошибка при проверке центров групп: {e}")
+            DB_ERRORS.labels("verify_group_centroids").inc()
+            self.connection.rollback()
+            return None
+
+    def rebuild_group_centroids(self, group_name=None):
+        """Пересчитывает агрегаты по участникам (все группы или одну).
+
+        Таблица блокируется от записи на время пересчёта, чтобы параллельные
+        обновления геолокаций не потерялись. Возвращает число пересчитанных
+        групп или None при ошибке.
+        """
+        group_filter = "WHERE groups.group_name = %s " if group_name else ""
+        params = (group_name,) if group_name else ()
+        try:
+            self.cursor.execute(
+                "LOCK TABLE public.group_centroids IN SHARE ROW EXCLUSIVE MODE;"
+            )
+            self.cursor.execute(
+                "INSERT INTO public.group_centroids "
+                "(group_name, member_count, sum_x, sum_y, sum_z, updated_at) "
+                f"SELECT groups.group_name, {_CENTROID_SUMS}, NOW() "
+                "FROM public.groups JOIN public.users ON users.id = groups.user_id "
+                f"{group_filter}GROUP BY groups.group_name "
+                "ON CONFLICT (group_name) DO UPDATE SET "
+                "member_count = EXCLUDED.member_count, sum_x = EXCLUDED.sum_x, "
+                "sum_y = EXCLUDED.sum_y, sum_z = EXCLUDED.sum_z, updated_at = NOW();",
+                params,
+            )
+            rebuilt = self.cursor.rowcount
+            self.cursor.execute(
+                "DELETE FROM public.group_centroids WHERE "
+                + ("group_name = %s AND " if group_name else "")
+                + "NOT EXISTS (SELECT 1 FROM public.groups "
+                "WHERE groups.group_name = group_centroids.group_name);",
+                params,
+            )
+            self.connection.commit()
+            return rebuilt
+        except Exception as e:
+            print(f"Ошибка при пересчёте центров групп: {e}")
+            DB_ERRORS.labels("rebuild_group_centroids").inc()
+            self.connection.rollback()
+            return None
+
+    def get_users_within(self, latitude, longitude, radius, group_name=None):
+        """Пользователи не дальше radius метров, ближайшие первыми.
+
+        Сначала отбираются строки по префиксам geohash (индекс
+        users_geohash_idx), затем точное расстояние считается по гаверсинусу.
+        Возвращает список (username, latitude, longitude, расстояние в метрах).
+        """
+        prefixes = geohash_cover(latitude, longitude, radius)
+        conditions = " OR ".join(["users.geohash LIKE %s"] * len(prefixes))
+        params = [f"{prefix}%" for prefix in prefixes]
+        query = (
+            "SELECT users.username, users.latitude, users.longitude FROM public.users "
+        )
+        if group_name is not None:
+            query += (
+                "JOIN public.groups ON groups.user_id = users.id "
+                "AND groups.group_name = %s "
+            )
+            params.insert(0, group_name)
+        query += f"WHERE ({conditions});"
+        try:
+            self.cursor.execute(query, params)
+            rows = self.cursor.fetchall()
+        except Exception as e:
+            print(f"Ошибка при поиске пользователей рядом: {e}")
+            DB_ERRORS.labels("get_users_within").inc()
+            self.connection.rollback()
+            return []
+
+        found = []
+        for username, user_latitude, user_longitude in rows:
+            distance = haversine(latitude, longitude, user_latitude, user_longitude)
+            if distance <= radius:
+                found.append(
+                    (username, float(user_latitude), float(user_longitude), distance)
+                )
+        found.sort(key=lambda row: row[3])
+        return found
+
+    def get_nearest_users(
+        self, latitude, longitude, k, max_radius=50000, group_name=None
+    ):
+        """k ближайших пользователей не дальше max_radius метров.
+
+        Радиус поиска растёт в четыре раза, пока не найдётся k пользователей:
+        в плотных районах хватает одной-двух маленьких ячеек.
+        """
+        radius = min(250, max_radius)
+        while True:
+            found = self.get_users_within(latitude, longitude, radius, group_name)
+            if len(found) >= k or radius >= max_radius:
+                return found[:k]
+            radius = min(radius * 4, max_radius)
+
+    def backfill_user_geohashes(self, batch_size=1000):
+        """Заполняет geohash у строк, записанных до появления колонки.
+        Возвращает число обновлённых строк; вызывать, пока не вернёт 0."""
+        try:
+            self.cursor.execute(
+                "SELECT id, latitude, longitude FROM public.users "
+                "WHERE geohash IS NULL AND latitude IS NOT NULL "
+                "AND longitude IS NOT NULL LIMIT %s;",
+                (batch_size,),
+            )
+            rows = self.cursor.fetchall()
+            if rows:
+                execute_values(
+                    self.cursor,
+                    "UPDATE public.users SET geohash = data.geohash "
+                    "FROM (VALUES %s) AS data (id, geohash) WHERE users.id = data.id;",
+                    [
+                        (user_id, user_geohash(latitude, longitude))
+                        for user_id, latitude, longitude in rows
+                    ],
+                )
+            self.connection.commit()
+            return len(rows)
+        except Exception as e:
+            print(f"Ошибка при заполнении geohash пользователей: {e}")
+            DB_ERRORS.labels("backfill_user_geohashes").inc()
+            self.connection.rollback()
+            return 0
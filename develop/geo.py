@@ -0,0 +1,129 @@
+import math
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = 111320.0
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude, longitude, precision=7):
+    """Кодирует координаты в geohash заданной длины (7 символов ~ 150 м)."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            value, value_range = longitude, lon_range
+        else:
+            value, value_range = latitude, lat_range
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits <<= 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(geohash)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками в метрах."""
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_cell_size(precision):
+    """Высота и ширина ячейки geohash заданной длины в градусах."""
+    bits = 5 * precision
+    lat_bits = bits // 2
+    lon_bits = bits - lat_bits
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def geohash_bounds(geohash):
+    """Границы ячейки: (мин. широта, макс. широта, мин. долгота, макс. долгота)."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if value >> shift & 1:
+                value_range[0] = mid
+            else:
+                value_range[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def geohash_cover(latitude, longitude, radius, max_precision=9):
+    """Префиксы geohash, ячейки которых вместе покрывают круг radius метров.
+
+    Берётся самая длинная точность, при которой ячейка не меньше radius по
+    обеим осям; тогда круг целиком попадает в ячейку точки и её восемь
+    соседей. Пустой префикс означает "весь мир".
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    lat_margin = radius / METERS_PER_DEGREE
+    cos_lat = math.cos(math.radians(min(90.0, abs(latitude) + lat_margin)))
+    for precision in range(max_precision, 0, -1):
+        lat_size, lon_size = geohash_cell_size(precision)
+        if (
+            lat_size * METERS_PER_DEGREE >= radius
+            and lon_size * METERS_PER_DEGREE * cos_lat >= radius
+        ):
+            break
+    else:
+        return [""]
+
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(
+        geohash_encode(latitude, longitude, precision)
+    )
+    center_lat = (lat_min + lat_max) / 2
+    center_lon = (lon_min + lon_max) / 2
+    prefixes = set()
+    for dy in (-1, 0, 1):
+        cell_lat = center_lat + dy * lat_size
+        if not -90.0 < cell_lat < 90.0:
+            continue
+        for dx in (-1, 0, 1):
+            cell_lon = (center_lon + dx * lon_size + 180.0) % 360.0 - 180.0
+            prefixes.add(geohash_encode(cell_lat, cell_lon, precision))
+    return sorted(prefixes)
+
+
+def unit_vector(latitude, longitude):
+    """Точка на единичной сфере (x, y, z)."""
+    lat = math.radians(float(latitude))
+    lon = math.radians(float(longitude))
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def vector_to_point(x, y, z):
+    """Широта и долгота направления (x, y, z); None для нулевого вектора."""
+    x, y, z = float(x), float(y), float(z)
+    norm = math.sqrt(x * x + y * y + z * z)
+    if norm < 1e-12:
+        return None
+    return math.degrees(math.asin(max(-1.0, min(1.0, z / norm)))), math.degrees(
+        math.atan2(y, x)
+    )
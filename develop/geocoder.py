@@ -0,0 +1,90 @@
+import httpx
+from cache import TTLCache
+from rate_limiter import TokenBucket
+from tracing import traced
+
+_MISSING = object()
+
+# Политика Nominatim: не более одного запроса в секунду на всё приложение.
+# В режиме воркеров каждый процесс получает свою долю этого лимита
+# (см. Controller._create_nominatim_limiter).
+NOMINATIM_RATE = 1.0
+NOMINATIM_RATE_LIMITER = TokenBucket(rate=NOMINATIM_RATE, capacity=1)
+
+
+class Geocoder:
+    """Геокодирование адресов через Nominatim с кэшем в памяти и в БД.
+
+    Отрицательные ответы (адрес не найден) тоже кэшируются, но с меньшим TTL.
+    Запрос, которому пришлось бы ждать лимита Nominatim дольше max_wait
+    секунд, не выполняется и возвращает None без кэширования.
+    """
+
+    def __init__(
+        self,
+        api_client,
+        db_manager=None,
+        ttl=30 * 24 * 3600,
+        miss_ttl=24 * 3600,
+        memory_cache=None,
+        rate_limiter=None,
+        max_wait=3.0,
+    ):
+        self.api_client = api_client
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        if memory_cache is None:
+            memory_cache = TTLCache(ttl=ttl, max_entries=4096)
+        self.memory_cache = memory_cache
+        self.rate_limiter = rate_limiter or NOMINATIM_RATE_LIMITER
+        self.max_wait = max_wait
+
+    @traced("geocode")
+    async def get_coordinates(self, address):
+        address = address.strip()
+        cached = self.memory_cache.get(address, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        if self.db_manager is not None:
+            row = await self.db_manager.get_cached_coordinates(
+                address, self.ttl, self.miss_ttl
+            )
+            if row is not None:
+                coordinates = self._to_coordinates(row[0], row[1])
+                self._remember(address, coordinates)
+                return coordinates
+
+        if not self.api_client.is_available("nominatim"):
+            return None
+
+        params = {"q": address, "format": "json", "limit": 1}
+        if not await self.rate_limiter.acquire(self.max_wait):
+            return None
+        try:
+            geo_data = await self.api_client.geocode(params)
+        except httpx.HTTPError as e:
+            print(f"Ошибка при геокодировании с помощью Nominatim: {str(e)}")
+            return None
+
+        if geo_data:
+            coordinates = self._to_coordinates(geo_data[0]["lat"], geo_data[0]["lon"])
+        else:
+            coordinates = None
+
+        self._remember(address, coordinates)
+        if self.db_manager is not None:
+            latitude, longitude = coordinates if coordinates else (None, None)
+            await self.db_manager.save_cached_coordinates(address, latitude, longitude)
+        return coordinates
+
+    def _remember(self, address, coordinates):
+        ttl = self.ttl if coordinates is not None else self.miss_ttl
+        self.memory_cache.set(address, coordinates, ttl=ttl)
+
+    @staticmethod
+    def _to_coordinates(latitude, longitude):
+        if latitude is None or longitude is None:
+            return None
+        return float(latitude), float(longitude)
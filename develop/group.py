@@ -1,18 +1,36 @@
 from telegram import Update
 from telegram.ext import CallbackContext
 
+MAX_GROUP_NAME_LENGTH = 100
+
+
+def get_group_name(update: Update, context: CallbackContext) -> str:
+    """Имя группы из аргумента команды, иначе группа текущего чата."""
+    if context.args:
+        return context.args[0][:MAX_GROUP_NAME_LENGTH]
+    return f"chat:{update.effective_chat.id}"
+
+
+def _group_label(group_name: str) -> str:
+    if group_name.startswith("chat:"):
+        return "этого чата"
+    return f"«{group_name}»"
+
 
 class Group:
     def __init__(self, db_manager):
         self.db_manager = db_manager
 
     async def show_group_info(self, update: Update, context: CallbackContext) -> None:
-        users = self.db_manager.get_all_users()
+        group_name = get_group_name(update, context)
+        users = await self.db_manager.get_group_members(group_name)
 
         if not users:
-            response = "Группа пуста. Зарегистрируйтесь в боте, чтобы присоединиться."
+            response = (
+                "Группа пуста. Добавьтесь в группу командой /add_to_group [название]."
+            )
         else:
-            info = "Информация о группе:\n"
+            info = f"Информация о группе {_group_label(group_name)}:\n"
             for user in users:
                 username = user[1]
                 info += f"{username}\n"
@@ -24,19 +42,38 @@ class Group:
             await update.message.reply_text(response)
 
     async def add_to_group(self, update: Update, context: CallbackContext) -> None:
-        await update.message.reply_text(
-            "Все пользователи, зарегистрированные в боте, автоматически добавлены в группу."
-        )
+        user = update.message.from_user
+        username = f"@{user.username}" if user.username else user.full_name
+        group_name = get_group_name(update, context)
+
+        await self.db_manager.add_user(username)
+        added = await self.db_manager.add_user_to_group(username, group_name)
+
+        if added:
+            response = f"Вы добавлены в группу {_group_label(group_name)}."
+        else:
+            response = f"Вы уже состоите в группе {_group_label(group_name)}."
+        await update.message.reply_text(response)
 
     async def remove_from_group(self, update: Update, context: CallbackContext) -> None:
-        await update.message.reply_text(
-            "Пользователей нельзя удалять из группы, так как все зарегистрированные пользователи автоматически являются частью группы."
-        )
+        user = update.message.from_user
+        username = f"@{user.username}" if user.username else user.full_name
+        group_name = get_group_name(update, context)
+
+        removed = await self.db_manager.remove_user_from_group(username, group_name)
+
+        if removed:
+            response = f"Вы удалены из группы {_group_label(group_name)}."
+        else:
+            response = f"Вы не состоите в группе {_group_label(group_name)}."
+        await update.message.reply_text(response)
 
     async def manage_group(self, update: Update, context: CallbackContext) -> None:
         group_management_text = (
-            "Показать информацию о группе: /show_group_info\n"
-            "Все зарегистрированные пользователи автоматически добавлены в группу."
+            "Показать информацию о группе: /show_group_info [название]\n"
+            "Вступить в группу: /add_to_group [название]\n"
+            "Покинуть группу: /remove_from_group [название]\n"
+            "Без названия используется группа текущего чата."
         )
 
         if update.callback_query:
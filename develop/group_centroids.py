@@ -0,0 +1,65 @@
+"""Проверка и пересборка агрегатов центров групп (таблица group_centroids).
+
+Агрегаты обновляются инкрементально, поэтому после ручных правок в БД,
+удаления пользователей или накопления ошибок округления могут разойтись
+с участниками. verify показывает такие группы, rebuild пересчитывает.
+
+Пример:
+    python group_centroids.py verify
+    python group_centroids.py rebuild --group friends
+"""
+
+import argparse
+import configparser
+import sys
+
+from database_manager import DatabaseManager
+
+
+def connect(config):
+    return DatabaseManager(
+        db_name=config.get("database", "db_name", fallback="bot_database"),
+        user=config.get("database", "user", fallback="postgres"),
+        password=config.get("database", "password", fallback="mysecretpassword"),
+        host=config.get("database", "host", fallback="localhost"),
+        port=config.get("database", "port", fallback="5432"),
+    )
+
+
+def run(db_manager, command, group_name=None, tolerance=1e-6):
+    """Выполняет команду и возвращает код выхода: 0 - агрегаты в порядке."""
+    if command == "verify":
+        drifted = db_manager.verify_group_centroids(tolerance)
+        if drifted is None:
+            return 2
+        for name in drifted:
+            print(f"Центр группы {name} расходится с участниками")
+        print(f"Проверено, расхождений: {len(drifted)}")
+        return 1 if drifted else 0
+
+    rebuilt = db_manager.rebuild_group_centroids(group_name)
+    if rebuilt is None:
+        return 2
+    print(f"Пересчитано групп: {rebuilt}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Агрегаты центров групп")
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    parser.add_argument("--group", help="пересчитать только эту группу")
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--config", default="../config.ini")
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    db_manager = connect(config)
+    try:
+        return run(db_manager, args.command, args.group, args.tolerance)
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
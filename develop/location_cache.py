@@ -0,0 +1,71 @@
+from cache import TTLCache
+
+_MISSING = object()
+
+
+class CachedDatabaseManager:
+    """Read-through кэш геолокаций пользователей поверх менеджера БД.
+
+    update_user_location обновляет запись в кэше на месте, поэтому чтения
+    после записи не уходят в Postgres. Остальные методы передаются в
+    обёрнутый менеджер без изменений.
+
+    None (нет пользователя или ошибка БД) не кэшируется. Чтение, во время
+    которого геолокация пользователя обновилась, в кэш не попадает, чтобы
+    не затереть свежую точку старой.
+    """
+
+    def __init__(self, db_manager, max_entries=10000, ttl=300, enabled=True):
+        self.db_manager = db_manager
+        self.enabled = enabled
+        self.cache = TTLCache(ttl=ttl, max_entries=max_entries)
+        self.hits = 0
+        self.misses = 0
+        # Метка последнего начатого чтения из БД для каждого пользователя;
+        # запись или инвалидация снимает её, и результат чтения отбрасывается.
+        self._loading = {}
+
+    def __getattr__(self, name):
+        return getattr(self.db_manager, name)
+
+    async def get_user_location(self, username):
+        if not self.enabled:
+            return await self.db_manager.get_user_location(username)
+
+        location = self.cache.get(username, _MISSING)
+        if location is not _MISSING:
+            self.hits += 1
+            return location
+
+        self.misses += 1
+        token = object()
+        self._loading[username] = token
+        try:
+            location = await self.db_manager.get_user_location(username)
+        finally:
+            fresh = self._loading.get(username) is token
+            if fresh:
+                del self._loading[username]
+        if fresh and location is not None:
+            self.cache.set(username, location)
+        return location
+
+    async def update_user_location(self, username, latitude, longitude):
+        result = await self.db_manager.update_user_location(
+            username, latitude, longitude
+        )
+        self._loading.pop(username, None)
+        if self.enabled:
+            self.cache.set(username, (latitude, longitude))
+        return result
+
+    def invalidate(self, username=None):
+        if username is None:
+            self.cache.clear()
+            self._loading.clear()
+        else:
+            self.cache.pop(username)
+            self._loading.pop(username, None)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.cache)}
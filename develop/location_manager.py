@@ -4,9 +4,11 @@ from database_manager import DatabaseManager
 
 
 class LocationManager:
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, on_location=None):
         self.current_location = None
         self.db_manager = db_manager
+        # Вызывается с (широта, долгота) сразу после получения геолокации.
+        self.on_location = on_location
 
     async def update_location_command(
         self, update: Update, context: CallbackContext
@@ -22,7 +24,9 @@ class LocationManager:
             latitude = update.message.location.latitude
             longitude = update.message.location.longitude
 
-            self.db_manager.update_user_location(username, latitude, longitude)
+            if self.on_location is not None:
+                self.on_location(latitude, longitude)
+            await self.db_manager.update_user_location(username, latitude, longitude)
 
             await update.message.reply_text(
                 f"Геолокация обновлена: {latitude}, {longitude}"
@@ -42,7 +46,7 @@ class LocationManager:
         )
         username = f"@{user.username}" if user.username else user.full_name
 
-        location = self.db_manager.get_user_location(username)
+        location = await self.db_manager.get_user_location(username)
 
         if location and location[0] is not None and location[1] is not None:
             latitude, longitude = location
@@ -1,5 +1,6 @@
-from telegram.ext import Application
-from controller import Controller
+from controller import Controller, read_config
+from bootstrap import build_application, configure_observability
+from workers import run_workers
 
 
 def read_token_from_file(file_path):
@@ -9,11 +10,27 @@ def read_token_from_file(file_path):
 
 def main():
     token = read_token_from_file("../config.txt")
-    application = Application.builder().token(token).build()
+    config = read_config("../config.ini")
+    mode = config.get("bot", "mode", fallback="polling")
 
+    if mode == "workers":
+        run_workers(token, config)
+        return
+
+    configure_observability(config)
+    application = build_application(token, config)
     Controller(application)
 
-    application.run_polling()
+    if mode == "webhook":
+        application.run_webhook(
+            listen=config.get("webhook", "listen", fallback="0.0.0.0"),
+            port=config.getint("webhook", "port", fallback=8443),
+            url_path=config.get("webhook", "url_path", fallback="telegram"),
+            webhook_url=config.get("webhook", "url"),
+            secret_token=config.get("webhook", "secret_token", fallback=None),
+        )
+    else:
+        application.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,159 @@
+import random
+
+import numpy as np
+from geo import EARTH_RADIUS_M
+
+
+def to_points(locations):
+    """Массив (n, 2) широт и долгот в градусах."""
+    return np.asarray(locations, dtype=float).reshape(-1, 2)
+
+
+def to_unit_vectors(points):
+    lat = np.radians(points[:, 0])
+    lon = np.radians(points[:, 1])
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def from_unit_vector(vector):
+    x, y, z = vector / np.linalg.norm(vector)
+    return float(np.degrees(np.arcsin(z))), float(np.degrees(np.arctan2(y, x)))
+
+
+def spherical_centroid(points):
+    """Нормированная сумма единичных векторов, корректна у антимеридиана."""
+    vectors = to_unit_vectors(points)
+    total = vectors.sum(axis=0)
+    if np.linalg.norm(total) < 1e-12:
+        return float(points[0, 0]), float(points[0, 1])
+    return from_unit_vector(total)
+
+
+def geometric_median(points, iterations=100, tolerance=1e-9):
+    """Алгоритм Вейсфельда: точка с минимальной суммой расстояний до участников."""
+    vectors = to_unit_vectors(points)
+    estimate = vectors.mean(axis=0)
+    for _ in range(iterations):
+        distances = np.maximum(np.linalg.norm(vectors - estimate, axis=1), 1e-12)
+        weights = 1.0 / distances
+        updated = weights @ vectors / weights.sum()
+        converged = np.linalg.norm(updated - estimate) < tolerance
+        estimate = updated
+        if converged:
+            break
+    if np.linalg.norm(estimate) < 1e-12:
+        return spherical_centroid(points)
+    return from_unit_vector(estimate)
+
+
+def minimax_point(points):
+    """Центр минимальной окружности, покрывающей всех участников: точка,
+    до которой самому дальнему участнику идти меньше всего. Считается
+    алгоритмом Вельцля в локальной проекции вокруг сферического центроида."""
+    origin_lat, origin_lon = spherical_centroid(points)
+    scale = np.radians(1.0) * EARTH_RADIUS_M
+    cos_origin = np.cos(np.radians(origin_lat))
+    dlon = (points[:, 1] - origin_lon + 180.0) % 360.0 - 180.0
+    xs = dlon * cos_origin * scale
+    ys = (points[:, 0] - origin_lat) * scale
+
+    (cx, cy), _ = _enclosing_circle(list(zip(xs.tolist(), ys.tolist())))
+
+    latitude = origin_lat + cy / scale
+    longitude = origin_lon + cx / (scale * max(cos_origin, 1e-12))
+    longitude = (longitude + 180.0) % 360.0 - 180.0
+    return float(latitude), float(longitude)
+
+
+def _enclosing_circle(points):
+    points = points[:]
+    random.Random(0).shuffle(points)
+    circle = None
+    for i, p in enumerate(points):
+        if circle is not None and _contains(circle, p):
+            continue
+        circle = (p, 0.0)
+        for j in range(i):
+            q = points[j]
+            if _contains(circle, q):
+                continue
+            circle = _circle_from_two(p, q)
+            for k in range(j):
+                r = points[k]
+                if not _contains(circle, r):
+                    circle = _circle_from_three(p, q, r)
+    return circle
+
+
+def _contains(circle, point, eps=1e-7):
+    (cx, cy), radius = circle
+    return (point[0] - cx) ** 2 + (point[1] - cy) ** 2 <= (radius + eps) ** 2
+
+
+def _circle_from_two(p, q):
+    cx = (p[0] + q[0]) / 2
+    cy = (p[1] + q[1]) / 2
+    return (cx, cy), ((p[0] - cx) ** 2 + (p[1] - cy) ** 2) ** 0.5
+
+
+def _circle_from_three(p, q, r):
+    ax, ay = p
+    bx, by = q
+    cx, cy = r
+    d = 2 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if abs(d) < 1e-12:
+        circles = [
+            _circle_from_two(p, q),
+            _circle_from_two(p, r),
+            _circle_from_two(q, r),
+        ]
+        return max(circles, key=lambda circle: circle[1])
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+    ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return (ux, uy), ((ax - ux) ** 2 + (ay - uy) ** 2) ** 0.5
+
+
+STRATEGIES = {
+    "centroid": spherical_centroid,
+    "median": geometric_median,
+    "minimax": minimax_point,
+}
+
+
+def meeting_point(points, strategy="centroid"):
+    return STRATEGIES[strategy](points)
+
+
+def distance_matrix(member_points, venue_points):
+    """Матрица (участники x заведения) расстояний по гаверсинусу в метрах."""
+    member_lat = np.radians(member_points[:, 0])[:, None]
+    member_lon = np.radians(member_points[:, 1])[:, None]
+    venue_lat = np.radians(venue_points[:, 0])[None, :]
+    venue_lon = np.radians(venue_points[:, 1])[None, :]
+    a = (
+        np.sin((venue_lat - member_lat) / 2) ** 2
+        + np.cos(member_lat)
+        * np.cos(venue_lat)
+        * np.sin((venue_lon - member_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def rank_venues(member_points, venue_points, strategy="centroid"):
+    """Порядок заведений и максимальное/среднее расстояние до участников.
+
+    Для minimax заведения упорядочиваются по максимальному расстоянию,
+    для остальных стратегий - по среднему.
+    """
+    distances = distance_matrix(member_points, venue_points)
+    max_distances = distances.max(axis=0)
+    mean_distances = distances.mean(axis=0)
+    if strategy == "minimax":
+        order = np.lexsort((mean_distances, max_distances))
+    else:
+        order = np.lexsort((max_distances, mean_distances))
+    return order, max_distances, mean_distances
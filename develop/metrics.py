@@ -0,0 +1,135 @@
+import asyncio
+import functools
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from tracing import PROFILER, TRACER
+
+# Отсчёт холодного старта: модуль импортируется одним из первых.
+PROCESS_START = time.monotonic()
+
+# Запросы к БД обычно укладываются в миллисекунды, поэтому сетка мельче
+# стандартной.
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds",
+    "Время обработки апдейта обработчиком команды",
+    ["handler"],
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Исключения, вылетевшие из обработчиков",
+    ["handler"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "bot_upstream_request_duration_seconds",
+    "Время запроса к внешнему API (2GIS, Nominatim)",
+    ["service"],
+)
+UPSTREAM_RESPONSES = Counter(
+    "bot_upstream_responses_total",
+    "Ответы внешних API по HTTP-статусу (error - ответа не было)",
+    ["service", "status"],
+)
+DB_LATENCY = Histogram(
+    "bot_db_query_duration_seconds",
+    "Время выполнения метода DatabaseManager, включая ожидание соединения",
+    ["method"],
+    buckets=DB_BUCKETS,
+)
+DB_ERRORS = Counter(
+    "bot_db_errors_total",
+    "Ошибки при выполнении методов DatabaseManager",
+    ["method"],
+)
+DB_IN_FLIGHT = Gauge(
+    "bot_db_in_flight",
+    "Выполняющиеся прямо сейчас запросы к БД",
+    ["method"],
+)
+COLD_START = Gauge(
+    "bot_cold_start_seconds",
+    "Время от запуска процесса до окончания прогрева",
+)
+FIRST_RESPONSE = Gauge(
+    "bot_first_response_seconds",
+    "Время от запуска процесса до первого обработанного апдейта",
+)
+HEALTH = Gauge(
+    "bot_health_check_ok",
+    "Результат проверки зависимости при старте (1 - доступна)",
+    ["component"],
+)
+_first_response_pending = True
+
+
+def record_cold_start():
+    elapsed = time.monotonic() - PROCESS_START
+    COLD_START.set(elapsed)
+    return elapsed
+
+
+def _record_first_response():
+    global _first_response_pending
+    _first_response_pending = False
+    FIRST_RESPONSE.set(time.monotonic() - PROCESS_START)
+
+
+def instrument(name, handler):
+    """Оборачивает обработчик Telegram: пишет его время в HANDLER_LATENCY,
+    открывает корневой span апдейта и отдаёт апдейт профилировщику."""
+    latency = HANDLER_LATENCY.labels(name)
+    errors = HANDLER_ERRORS.labels(name)
+
+    @functools.wraps(handler)
+    async def instrumented(update, context, *args, **kwargs):
+        task = asyncio.current_task() if PROFILER.should_sample() else None
+        if task is not None:
+            PROFILER.track(task)
+        start = time.perf_counter()
+        try:
+            with TRACER.span(
+                f"handler {name}", update_id=getattr(update, "update_id", None)
+            ):
+                return await handler(update, context, *args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+            if _first_response_pending:
+                _record_first_response()
+            if task is not None:
+                PROFILER.untrack(task)
+
+    return instrumented
+
+
+class StatsCollector:
+    """Отдаёт словари stats() компонентов как gauge bot_<name>{stat=...}."""
+
+    def __init__(self):
+        self._sources = {}
+
+    def register(self, name, stats):
+        self._sources[name] = stats
+
+    def collect(self):
+        for name, stats in list(self._sources.items()):
+            family = GaugeMetricFamily(
+                f"bot_{name}", f"Состояние компонента {name}", labels=["stat"]
+            )
+            for key, value in stats().items():
+                family.add_metric([key], value)
+            yield family
+
+
+STATS = StatsCollector()
+REGISTRY.register(STATS)
+
+
+def start_metrics_server(port=8000, addr="127.0.0.1"):
+    """Поднимает /metrics в формате Prometheus в фоновом потоке."""
+    start_http_server(port, addr=addr)
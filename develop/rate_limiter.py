@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Token bucket без блокировок: вызовы резервируют токены заранее и
+    при нехватке ждут своей очереди, поэтому один экземпляр можно разделять
+    между всеми корутинами процесса."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def try_acquire(self):
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, max_wait=None):
+        """Ждёт токен; если ждать пришлось бы дольше max_wait секунд,
+        сразу возвращает False без резерва, так что долг очереди не
+        превышает max_wait * rate токенов."""
+        self._refill()
+        wait = (1 - self._tokens) / self.rate
+        if max_wait is not None and wait > max_wait:
+            return False
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return True
+        # При отмене резерв не возвращается: ждущие следом уже рассчитали
+        # своё время по текущему долгу, и возврат токена пропустил бы
+        # более позднего вызывающего вперёд очереди.
+        await asyncio.sleep(-self._tokens / self.rate)
+        return True
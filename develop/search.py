@@ -1,12 +1,98 @@
-import requests
-from telegram import Update
+import asyncio
+import secrets
+
+import httpx
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
 from telegram.ext import CallbackContext
+from api_client import ApiClient
+from cache import TTLCache
+from geo import geohash_encode
+from geocoder import Geocoder
+from group import get_group_name
+from meeting_point import STRATEGIES, meeting_point, rank_venues, to_points
+from rate_limiter import TokenBucket
+from spatial_index import VenueIndex
+from single_flight import SingleFlight
+from tracing import traced
+from venue import Venue
+
+SEARCH_QUERY = "бар, клуб"
+SEARCH_RADIUS = 5000
+SEARCH_PAGE_SIZE = 5
+# 2GIS отдаёт не больше 50 результатов на один запрос с пагинацией.
+SEARCH_MAX_PAGE = 10
+STALE_NOTE = (
+    "Сервис поиска сейчас недоступен, показаны сохранённые результаты. "
+    "Они могут быть устаревшими."
+)
+EXPIRED_PAGE_MESSAGE = "Результаты поиска устарели. Выполните поиск заново."
+NOT_FOUND_MESSAGE = "Бары и клубы не найдены рядом с вами."
 
 
 class Search:
-    def __init__(self, api_key, db_manager):
+    def __init__(
+        self,
+        api_key,
+        db_manager,
+        api_client=None,
+        venue_cache=None,
+        tile_precision=7,
+        geocoder=None,
+        geocode_deadline=3.0,
+        center_in_db=False,
+        meeting_strategy="centroid",
+        venue_index=None,
+        revalidate_interval=5.0,
+        max_stale_areas=1000,
+        page_session_ttl=600,
+        page_ttl=120,
+        prefetch_rate=1.0,
+        prefetch_burst=5,
+        max_prefetches=4,
+    ):
+        if meeting_strategy not in STRATEGIES:
+            raise ValueError(
+                f"Неизвестная стратегия [search] meeting_strategy: "
+                f"{meeting_strategy!r}, допустимы: {', '.join(STRATEGIES)}"
+            )
         self.api_key = api_key
         self.db_manager = db_manager
+        self.api_client = api_client or ApiClient()
+        if venue_cache is None:
+            venue_cache = TTLCache(ttl=300, max_entries=1024)
+        self.venue_cache = venue_cache
+        self.tile_precision = tile_precision
+        self.geocoder = geocoder or Geocoder(
+            self.api_client, db_manager, max_wait=geocode_deadline
+        )
+        self.geocode_deadline = geocode_deadline
+        # Центр группы из агрегатов group_centroids читается за O(1), но
+        # без точек участников заведения остаются в порядке 2GIS и без
+        # расстояний до участников, поэтому режим включается явно.
+        self.center_in_db = center_in_db
+        self.meeting_strategy = meeting_strategy
+        self.venue_index = venue_index if venue_index is not None else VenueIndex()
+        self.single_flight = SingleFlight()
+        self.revalidate_interval = revalidate_interval
+        self.max_stale_areas = max_stale_areas
+        self._background_tasks = set()
+        self._stale_areas = {}
+        self._revalidation_task = None
+        # Параметры поиска для кнопок "назад/далее" и готовые страницы.
+        self._page_sessions = TTLCache(ttl=page_session_ttl, max_entries=10000)
+        self._pages = TTLCache(ttl=page_ttl, max_entries=2048)
+        # Загрузки районов после обновления геолокации: не больше
+        # max_prefetches одновременно и prefetch_rate в секунду.
+        self.max_prefetches = max_prefetches
+        self._prefetch_budget = TokenBucket(prefetch_rate, prefetch_burst)
+        self._area_prefetches = {}
+        self._prefetch_stats = {
+            "started": 0,
+            "deduplicated": 0,
+            "over_budget": 0,
+            "failed": 0,
+        }
 
     # TEST
     async def search(self, update: Update, context: CallbackContext) -> None:
@@ -17,14 +103,10 @@ class Search:
         )
         username = f"@{user.username}" if user.username else user.full_name
 
-        location = self.db_manager.get_user_location(username)
+        location = await self.db_manager.get_user_location(username)
         if location and location[0] is not None and location[1] is not None:
             latitude, longitude = location
-            results = self.find_nearest_bars_and_clubs(latitude, longitude)
-            if update.message:
-                await update.message.reply_text(results)
-            else:
-                await update.callback_query.message.reply_text(results)
+            await self._reply_first_page(update, latitude, longitude)
         else:
             error_message = (
                 "Геолокация не установлена. Пожалуйста, обновите свою геолокацию."
@@ -35,103 +117,430 @@ class Search:
                 await update.callback_query.message.reply_text(error_message)
 
     async def search_for_group(self, update: Update, context: CallbackContext) -> None:
-        users = self.db_manager.get_all_users()
-        if not users:
-            await update.message.reply_text(
-                "В группе нет пользователей с установленной геолокацией."
+        group_name = get_group_name(update, context)
+        if self.center_in_db:
+            members = None
+            center = await self._get_group_center(group_name)
+        else:
+            locations = await self.db_manager.get_group_locations(group_name)
+            members = to_points(locations) if locations else None
+            center = (
+                meeting_point(members, self.meeting_strategy)
+                if members is not None
+                else None
             )
+
+        if center is None:
+            error_message = "В группе нет пользователей с установленной геолокацией."
+            if update.message:
+                await update.message.reply_text(error_message)
+            else:
+                await update.callback_query.message.reply_text(error_message)
             return
 
-        latitudes = []
-        longitudes = []
-        for user in users:
-            username = user[1]
-            location = self.db_manager.get_user_location(username)
-            if location and location[0] is not None and location[1] is not None:
-                latitudes.append(location[0])
-                longitudes.append(location[1])
-
-        if not latitudes or not longitudes:
-            await update.message.reply_text(
-                "Нет доступных геолокаций участников группы."
-            )
+        central_latitude, central_longitude = center
+        await self._reply_first_page(
+            update, central_latitude, central_longitude, members=members
+        )
+
+    async def show_page(self, update: Update, context: CallbackContext) -> None:
+        """Обработчик кнопок "назад/далее" с callback_data page:<сессия>:<номер>."""
+        query = update.callback_query
+        _, token, page = query.data.split(":")
+        page = int(page)
+        if self._page_sessions.get(token) is None:
+            await query.message.reply_text(EXPIRED_PAGE_MESSAGE)
             return
 
-        central_latitude = sum(latitudes) / len(latitudes)
-        central_longitude = sum(longitudes) / len(longitudes)
+        text, has_next = await self._get_page(token, page)
+        try:
+            await query.edit_message_text(
+                text, reply_markup=self._page_markup(token, page, has_next)
+            )
+        except BadRequest as e:
+            # Повторное нажатие на ту же кнопку.
+            if "not modified" not in str(e):
+                raise
+        if has_next:
+            self._prefetch(token, page + 1)
 
-        results = self.find_nearest_bars_and_clubs(central_latitude, central_longitude)
+    async def _reply_first_page(self, update, latitude, longitude, members=None):
+        token = secrets.token_urlsafe(6)
+        head = self._covered_page(latitude, longitude)
+        self._page_sessions.set(token, (latitude, longitude, members, head))
+        text, has_next = await self._get_page(token, 1)
+        reply_markup = self._page_markup(token, 1, has_next)
         if update.message:
-            await update.message.reply_text(results)
+            await update.message.reply_text(text, reply_markup=reply_markup)
+        else:
+            await update.callback_query.message.reply_text(
+                text, reply_markup=reply_markup
+            )
+        if has_next:
+            self._prefetch(token, 2)
+
+    async def _get_page(self, token, page):
+        cached = self._pages.get((token, page))
+        if cached is not None:
+            return cached
+        try:
+            return await self.single_flight.do(
+                ("page", token, page), self._render_session_page, token, page
+            )
+        except httpx.HTTPError as e:
+            return self._search_error(e), False
+
+    async def _render_session_page(self, token, page):
+        session = self._page_sessions.get(token)
+        if session is None:
+            return EXPIRED_PAGE_MESSAGE, False
+        latitude, longitude, members, head = session
+        result = await self.find_page(
+            latitude, longitude, page, members=members, head=head
+        )
+        self._pages.set((token, page), result)
+        return result
+
+    def _prefetch(self, token, page):
+        """Готовит следующую страницу в фоне, пока пользователь читает текущую."""
+        if (token, page) in self._pages:
+            return
+        task = asyncio.ensure_future(self._get_page(token, page))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def prefetch_area(self, latitude, longitude):
+        """Загружает в фоне заведения вокруг новой геолокации пользователя,
+        включая геокодирование адресов без координат, чтобы следующий поиск
+        ответил из кэша. Возвращает задачу или None, если район уже загружен
+        или загружается либо бюджет фоновых запросов исчерпан."""
+        key = self._tile_key(latitude, longitude)
+        if (
+            key in self._area_prefetches
+            or key in self.venue_cache
+            or self.venue_index.is_covered(latitude, longitude)
+        ):
+            self._prefetch_stats["deduplicated"] += 1
+            return None
+        if (
+            len(self._area_prefetches) >= self.max_prefetches
+            or not self.api_client.is_available("catalog")
+            or not self._prefetch_budget.try_acquire()
+        ):
+            self._prefetch_stats["over_budget"] += 1
+            return None
+
+        self._prefetch_stats["started"] += 1
+        task = asyncio.ensure_future(self._prefetch_area(latitude, longitude))
+        self._area_prefetches[key] = task
+        task.add_done_callback(lambda _: self._area_prefetches.pop(key, None))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _prefetch_area(self, latitude, longitude):
+        # Задачу никто не ждёт, поэтому любая ошибка логируется здесь.
+        try:
+            await self._fetch_venues(latitude, longitude)
+        except Exception as e:
+            self._prefetch_stats["failed"] += 1
+            print(f"Ошибка при предварительной загрузке заведений: {e}")
+
+    def prefetch_stats(self):
+        return {**self._prefetch_stats, "in_flight": len(self._area_prefetches)}
+
+    @staticmethod
+    def _page_markup(token, page, has_next):
+        buttons = []
+        if page > 1:
+            buttons.append(
+                InlineKeyboardButton(
+                    "← Назад", callback_data=f"page:{token}:{page - 1}"
+                )
+            )
+        if has_next:
+            buttons.append(
+                InlineKeyboardButton(
+                    "Далее →", callback_data=f"page:{token}:{page + 1}"
+                )
+            )
+        return InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def _get_group_center(self, group_name):
+        row = await self.db_manager.get_group_center(group_name)
+        if not row or not row[2]:
+            return None
+        return row[0], row[1]
+
+    async def find_nearest_bars_and_clubs(self, latitude, longitude, members=None):
+        head = self._covered_page(latitude, longitude)
+        try:
+            text, _ = await self.find_page(
+                latitude, longitude, 1, members=members, head=head
+            )
+        except httpx.HTTPError as e:
+            return self._search_error(e)
+        return text
+
+    @staticmethod
+    def _search_error(error):
+        return f"Ошибка при поиске: {str(error)}. Попробуйте позже."
+
+    def _covered_page(self, latitude, longitude):
+        """Первая страница из индекса, если район недавно загружался, иначе None."""
+        return self.venue_index.lookup(
+            latitude, longitude, SEARCH_PAGE_SIZE, SEARCH_RADIUS
+        )
+
+    @traced("search.find_page")
+    async def find_page(self, latitude, longitude, page=1, members=None, head=None):
+        """Текст страницы page и признак того, что есть следующая.
+
+        Без head все страницы - это страницы выдачи 2GIS (из кэша тайла или
+        из API), поэтому они не пересекаются, а признак следующей страницы
+        берётся из total. head - первая страница, уже собранная из индекса
+        заведений: тогда следующие страницы идут по выдаче 2GIS без её
+        заведений. Если 2GIS недоступен, первая страница собирается из
+        индекса с пометкой об этом и без перехода дальше.
+        """
+        stale = False
+        try:
+            if head is None:
+                venues, has_next = await self._fetch_venues(latitude, longitude, page)
+            elif page == 1:
+                venues, has_next = head, len(head) >= SEARCH_PAGE_SIZE
+            else:
+                venues, has_next = await self._fetch_after_head(
+                    latitude, longitude, page, head
+                )
+        except httpx.HTTPError:
+            venues = None
+            if page == 1:
+                venues = self.venue_index.lookup(
+                    latitude,
+                    longitude,
+                    SEARCH_PAGE_SIZE,
+                    SEARCH_RADIUS,
+                    require_coverage=False,
+                )
+            if venues is None:
+                raise
+            self._schedule_revalidation(latitude, longitude)
+            stale, has_next = True, False
+
+        distances = None
+        if members is not None:
+            venues, distances = self._rank_for_members(venues, members)
+        text = self._render_venues(venues, distances)
+        if stale:
+            text = f"{text}\n\n{STALE_NOTE}"
+        return text, has_next and page < SEARCH_MAX_PAGE
+
+    async def _fetch_after_head(self, latitude, longitude, page, head):
+        """Страница page (со второй) выдачи 2GIS без заведений head: страницы
+        2GIS читаются по порядку, пока не наберётся эта страница и хотя бы
+        одно заведение сверх неё."""
+        shown = {venue.key for venue in head}
+        start = (page - 2) * SEARCH_PAGE_SIZE
+        rest = []
+        source_page, has_more = 0, True
+        while has_more and len(rest) <= start + SEARCH_PAGE_SIZE:
+            source_page += 1
+            venues, has_more = await self._fetch_venues(
+                latitude, longitude, source_page
+            )
+            rest.extend(venue for venue in venues if venue.key not in shown)
+            has_more = has_more and source_page < SEARCH_MAX_PAGE
+        return (
+            rest[start : start + SEARCH_PAGE_SIZE],
+            len(rest) > start + SEARCH_PAGE_SIZE,
+        )
+
+    def _schedule_revalidation(self, latitude, longitude):
+        """Запоминает район, отданный из сохранённых данных, и обновляет его
+        в фоне, когда 2GIS снова начнёт отвечать."""
+        key = self._tile_key(latitude, longitude)
+        if key not in self._stale_areas and len(self._stale_areas) >= (
+            self.max_stale_areas
+        ):
+            return
+        self._stale_areas[key] = (latitude, longitude)
+        if self._revalidation_task is None or self._revalidation_task.done():
+            self._revalidation_task = asyncio.ensure_future(self._revalidate())
+            self._background_tasks.add(self._revalidation_task)
+            self._revalidation_task.add_done_callback(self._background_tasks.discard)
+
+    async def _revalidate(self):
+        while self._stale_areas:
+            await asyncio.sleep(
+                max(self.api_client.retry_after("catalog"), self.revalidate_interval)
+            )
+            for key, (latitude, longitude) in list(self._stale_areas.items()):
+                try:
+                    await self._fetch_venues(latitude, longitude)
+                except httpx.HTTPError:
+                    break
+                self._stale_areas.pop(key, None)
+
+    async def _fetch_venues(self, latitude, longitude, page=1):
+        return await self.single_flight.do(
+            self._tile_key(latitude, longitude, page),
+            self._load_venues,
+            latitude,
+            longitude,
+            page,
+        )
+
+    @traced("search.load_venues")
+    async def _load_venues(self, latitude, longitude, page=1):
+        """Заведения тайла и признак следующей страницы.
+
+        В venue_cache лежат уже разобранные записи Venue, так что попадание
+        в кэш не разбирает JSON заново; догеокодируются только адреса, не
+        успевшие получить координаты в прошлый раз.
+        """
+        key = self._tile_key(latitude, longitude, page)
+        cached = self.venue_cache.get(key)
+        if cached is not None:
+            venues, has_next = cached
+            venues = await self._complete_locations(venues)
         else:
-            await update.callback_query.message.reply_text(results)
+            data = await self._fetch_search_data(latitude, longitude, page)
+            venues = await self._build_venues(data)
+            has_next = self._has_next_page(data, page)
+            self.venue_cache.set(key, (venues, has_next))
+        self.venue_index.add_many(venues)
+        if page == 1:
+            self.venue_index.mark_covered(latitude, longitude)
+        return venues, has_next
+
+    @staticmethod
+    def _has_next_page(data, page):
+        result = data.get("result", {})
+        total = result.get("total")
+        if total is not None:
+            return page * SEARCH_PAGE_SIZE < total
+        return len(result.get("items", [])) >= SEARCH_PAGE_SIZE
 
-    def find_nearest_bars_and_clubs(self, latitude, longitude):
-        url = "https://catalog.api.2gis.com/3.0/items"
+    def _tile_key(self, latitude, longitude, page=1):
+        tile = geohash_encode(latitude, longitude, self.tile_precision)
+        if page == 1:
+            return tile, SEARCH_QUERY, SEARCH_RADIUS
+        return tile, SEARCH_QUERY, SEARCH_RADIUS, page
+
+    async def _fetch_search_data(self, latitude, longitude, page=1):
         params = {
-            "q": "бар, клуб",
+            "q": SEARCH_QUERY,
             "point": f"{longitude},{latitude}",
-            "radius": 5000,
+            "radius": SEARCH_RADIUS,
             "key": self.api_key,
-            "page_size": 5,
+            "page_size": SEARCH_PAGE_SIZE,
         }
+        if page > 1:
+            params["page"] = page
+        return await self.api_client.search_items(params)
 
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            return self._parse_search_results(data)
-        except requests.RequestException as e:
-            return f"Ошибка при поиске: {str(e)}. Попробуйте позже."
-
-    def _parse_search_results(self, data):
-        results = []
+    @traced("search.build_venues")
+    async def _build_venues(self, data):
+        venues = []
         for item in data.get("result", {}).get("items", []):
-            name = item.get("name", "Без названия")
-            address = item.get("address_name", "Адрес не указан")
-
             geometry = item.get("geometry", {}).get("location", {})
-            place_lat = geometry.get("lat", None)
-            place_lon = geometry.get("lon", None)
-
-            if place_lat is None or place_lon is None:
-                coordinates = self._get_coordinates_by_address(address)
-                if coordinates:
-                    place_lat, place_lon = coordinates
-                else:
-                    place_lat, place_lon = "Не удалось определить", "координаты"
-
-            if place_lat != "Не удалось определить" and place_lon != "координаты":
-                yandex_link = self._generate_yandex_maps_link_with_name(
-                    name, place_lat, place_lon
+            venues.append(
+                Venue(
+                    item.get("id"),
+                    item.get("name", "Без названия"),
+                    item.get("address_name", "Адрес не указан"),
+                    geometry.get("lat", None),
+                    geometry.get("lon", None),
                 )
-            else:
-                yandex_link = "Ссылка не доступна"
+            )
+        return await self._complete_locations(venues)
 
-            results.append(f"{name}\nАдрес: {address}\nСсылка: {yandex_link}")
+    async def _complete_locations(self, venues):
+        """Геокодирует адреса заведений без координат из выдачи."""
+        missing = [venue.address for venue in venues if not venue.has_location]
+        if not missing:
+            return venues
+        resolved = await self._resolve_addresses(missing)
+        return [
+            (
+                venue.with_location(*resolved[venue.address])
+                if not venue.has_location and resolved.get(venue.address)
+                else venue
+            )
+            for venue in venues
+        ]
 
-        if not results:
-            return "Бары и клубы не найдены рядом с вами."
+    def _rank_for_members(self, venues, members):
+        """Заведения по удобству для участников и расстояния до них
+        (максимум, среднее); у заведений без координат - None."""
+        located = [venue for venue in venues if venue.has_location]
+        unlocated = [venue for venue in venues if not venue.has_location]
+        if not located:
+            return venues, [None] * len(venues)
 
-        return "\n\n".join(results)
+        venue_points = to_points(
+            [(venue.latitude, venue.longitude) for venue in located]
+        )
+        order, max_distances, mean_distances = rank_venues(
+            members, venue_points, self.meeting_strategy
+        )
+        ranked = [located[index] for index in order]
+        distances = [
+            (float(max_distances[index]), float(mean_distances[index]))
+            for index in order
+        ]
+        return ranked + unlocated, distances + [None] * len(unlocated)
 
-    def _get_coordinates_by_address(self, address):
-        """Использует OpenStreetMap Nominatim для получения координат по адресу."""
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {"q": address, "format": "json", "limit": 1}
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            geo_data = response.json()
+    def _render_venues(self, venues, distances=None):
+        if not venues:
+            return NOT_FOUND_MESSAGE
+        if distances is None:
+            return "\n\n".join(venue.text for venue in venues)
 
-            if geo_data:
-                return float(geo_data[0]["lat"]), float(geo_data[0]["lon"])
+        results = []
+        for venue, distance in zip(venues, distances):
+            if distance is None:
+                results.append(venue.text)
             else:
-                return None
-        except requests.RequestException as e:
-            print(f"Ошибка при геокодировании с помощью Nominatim: {str(e)}")
+                results.append(
+                    f"{venue.text}\nДо участников: максимум {distance[0]:.0f} м, "
+                    f"в среднем {distance[1]:.0f} м"
+                )
+        return "\n\n".join(results)
+
+    async def _resolve_addresses(self, addresses):
+        """Запускает геокодирование всех адресов сразу и ждёт не дольше
+        geocode_deadline. Незавершённые запросы продолжают работу в фоне и
+        наполняют кэш геокодера для следующих поисков; запросы, которые не
+        дождались бы лимита Nominatim к дедлайну, геокодер пропускает."""
+        tasks = {
+            address: asyncio.ensure_future(self._resolve_address(address))
+            for address in set(addresses)
+        }
+        if not tasks:
+            return {}
+
+        done, pending = await asyncio.wait(
+            tasks.values(), timeout=self.geocode_deadline
+        )
+        for task in pending:
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+        return {
+            address: task.result() for address, task in tasks.items() if task in done
+        }
+
+    async def _resolve_address(self, address):
+        """Координаты адреса или None: ошибка одного адреса (в том числе
+        в фоне, после дедлайна) не должна ронять весь поиск."""
+        try:
+            return await self._get_coordinates_by_address(address)
+        except Exception as e:
+            print(f"Ошибка при геокодировании адреса {address}: {e}")
             return None
 
-    def _generate_yandex_maps_link_with_name(self, place_name, latitude, longitude):
-        place_name_encoded = requests.utils.quote(place_name)
-        return f"https://yandex.ru/maps/?text={place_name_encoded}&pt={longitude},{latitude}&z=16&l=map"
+    async def _get_coordinates_by_address(self, address):
+        """Использует OpenStreetMap Nominatim для получения координат по адресу."""
+        return await self.geocoder.get_coordinates(address)
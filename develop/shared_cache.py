@@ -0,0 +1,144 @@
+import pickle
+import sqlite3
+import time
+
+_MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expires_at_idx ON entries (namespace, expires_at);
+"""
+
+
+class SharedCache:
+    """Кэш с интерфейсом TTLCache в файле SQLite, общий для всех процессов.
+
+    База открывается в режиме WAL с memory-mapped чтением, поэтому читатели
+    не блокируют писателя, а записи одного воркера сразу видны остальным.
+    Время жизни считается по часам системы, одинаковым для всех процессов.
+    Просроченные и лишние записи удаляются раз в prune_every вызовов set.
+
+    Кэш вызывается прямо из цикла событий, поэтому ждать занятую базу
+    дольше busy_timeout секунд нельзя: такой вызов пропускается (get
+    возвращает промах, set ничего не пишет) и учитывается в busy.
+    """
+
+    def __init__(
+        self,
+        path,
+        namespace,
+        ttl,
+        max_entries=10000,
+        mmap_size=256 * 1024 * 1024,
+        prune_every=100,
+        busy_timeout=0.01,
+        clock=time.time,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.clock = clock
+        self._sets = 0
+        self.busy = 0
+        self._connection = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._connection.executescript(SCHEMA)
+
+    @staticmethod
+    def _key(key):
+        return repr(key)
+
+    def get(self, key, default=None):
+        try:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, self._key(key)),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._report(e, "Ошибка при чтении общего кэша")
+            return default
+        if row is None or row[1] <= self.clock():
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        if self.max_entries <= 0:
+            return
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        try:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    self.namespace,
+                    self._key(key),
+                    pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                    expires_at,
+                ),
+            )
+        except sqlite3.Error as e:
+            self._report(e, "Ошибка при записи в общий кэш")
+            return
+        self._sets += 1
+        if self._sets % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        """Удаляет просроченные записи и самые старые сверх max_entries."""
+        try:
+            self._connection.execute(
+                "DELETE FROM entries WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, self.clock()),
+            )
+            self._connection.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM entries WHERE namespace = ? "
+                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+        except sqlite3.Error as e:
+            self._report(e, "Ошибка при очистке общего кэша")
+
+    def _report(self, error, message):
+        # Занятая другим воркером база - не ошибка, а пропуск кэша.
+        if isinstance(error, sqlite3.OperationalError) and "locked" in str(error):
+            self.busy += 1
+        else:
+            print(f"{message}: {error}")
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        self._connection.execute(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, self._key(key)),
+        )
+        return default if value is _MISSING else value
+
+    def clear(self):
+        self._connection.execute(
+            "DELETE FROM entries WHERE namespace = ?", (self.namespace,)
+        )
+
+    def close(self):
+        self._connection.close()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, self.clock()),
+        ).fetchone()[0]
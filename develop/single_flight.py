@@ -0,0 +1,26 @@
+import asyncio
+
+
+class SingleFlight:
+    """Объединяет одинаковые одновременные запросы: пока запрос с тем же
+    ключом выполняется, остальные вызывающие ждут его результат."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, function, *args):
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(function(*args))
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            future.exception()
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,117 @@
+import math
+from collections import OrderedDict
+
+from cache import TTLCache
+from geo import METERS_PER_DEGREE, geohash_encode, haversine
+
+
+class VenueIndex:
+    """Равномерная сетка по широте/долготе с уточнением по гаверсинусу.
+
+    Хранит заведения, которые уже приходили от 2GIS, и помнит, в каких
+    районах поиск уже выполнялся, чтобы отвечать на повторные запросы
+    без обращения к API.
+    """
+
+    def __init__(
+        self,
+        cell_size=0.01,
+        max_venues=100000,
+        coverage_ttl=3600,
+        coverage_precision=6,
+        min_venues=1,
+    ):
+        self.cell_size = cell_size
+        self.columns = int(round(360.0 / cell_size))
+        self.max_venues = max_venues
+        self.coverage_precision = coverage_precision
+        self.min_venues = min_venues
+        self._cells = {}
+        self._venues = OrderedDict()
+        self._covered = TTLCache(ttl=coverage_ttl, max_entries=max_venues)
+
+    def _cell(self, latitude, longitude):
+        row = math.floor(float(latitude) / self.cell_size)
+        column = math.floor(float(longitude) / self.cell_size) % self.columns
+        return row, column
+
+    def add(self, venue):
+        if not venue.has_location:
+            return
+        key = venue.key
+        self._discard(key)
+        cell = self._cell(venue.latitude, venue.longitude)
+        self._cells.setdefault(cell, {})[key] = venue
+        self._venues[key] = cell
+        while len(self._venues) > self.max_venues:
+            self._discard(next(iter(self._venues)))
+
+    def _discard(self, key):
+        cell = self._venues.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def add_many(self, venues):
+        for venue in venues:
+            self.add(venue)
+
+    def mark_covered(self, latitude, longitude):
+        self._covered.set(
+            geohash_encode(latitude, longitude, self.coverage_precision), True
+        )
+
+    def is_covered(self, latitude, longitude):
+        return geohash_encode(latitude, longitude, self.coverage_precision) in (
+            self._covered
+        )
+
+    def within(self, latitude, longitude, radius):
+        """Заведения в радиусе radius метров, отсортированные по расстоянию."""
+        latitude = float(latitude)
+        longitude = float(longitude)
+        lat_span = radius / METERS_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+        lon_span = min(180.0, radius / (METERS_PER_DEGREE * cos_lat))
+
+        min_row, min_column = self._cell(latitude - lat_span, longitude - lon_span)
+        max_row = math.floor((latitude + lat_span) / self.cell_size)
+        column_count = (
+            math.floor((longitude + lon_span) / self.cell_size)
+            - math.floor((longitude - lon_span) / self.cell_size)
+            + 1
+        )
+
+        found = []
+        for row in range(min_row, max_row + 1):
+            for offset in range(min(column_count, self.columns)):
+                bucket = self._cells.get((row, (min_column + offset) % self.columns))
+                if not bucket:
+                    continue
+                for venue in bucket.values():
+                    distance = haversine(
+                        latitude, longitude, venue.latitude, venue.longitude
+                    )
+                    if distance <= radius:
+                        found.append((distance, venue))
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+    def nearest(self, latitude, longitude, k, radius):
+        """k ближайших заведений не дальше radius метров."""
+        return self.within(latitude, longitude, radius)[:k]
+
+    def lookup(self, latitude, longitude, k, radius, require_coverage=True):
+        """Ответ из индекса или None, если района недостаточно покрыт."""
+        if require_coverage and not self.is_covered(latitude, longitude):
+            return None
+        found = self.nearest(latitude, longitude, k, radius)
+        if len(found) < self.min_venues:
+            return None
+        return [venue for _, venue in found]
+
+    def __len__(self):
+        return len(self._venues)
@@ -0,0 +1,348 @@
+"""Трассировка апдейтов и сэмплирующий профилировщик.
+
+Оба инструмента выключены по умолчанию и в этом состоянии сводятся к
+проверке одного флага: span() возвращает общий пустой контекстный
+менеджер, а профилировщик не трогает ни одного апдейта.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+import httpx
+from telegram.request import HTTPXRequest
+
+SERVICE_NAME = "knad_bar_bot"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = (
+        "tracer",
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+        "_token",
+    )
+
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = repr(exc)
+        _current_span.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2, "message": self.error} if self.error else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def otlp_payload(spans):
+    """Тело запроса OTLP/HTTP JSON (ExportTraceServiceRequest)."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": SERVICE_NAME},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class FileExporter:
+    """Пишет по одной строке OTLP JSON на каждый завершённый апдейт."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(otlp_payload(spans), ensure_ascii=False) + "\n")
+
+    async def close(self):
+        pass
+
+
+class OtlpHttpExporter:
+    """Отправляет спаны в OTLP-коллектор (Jaeger, Tempo, otel-collector)."""
+
+    def __init__(self, endpoint="http://127.0.0.1:4318/v1/traces", timeout=2.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._client = None
+        self._tasks = set()
+
+    def export(self, spans):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        task = asyncio.ensure_future(self._send(otlp_payload(spans)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, payload):
+        try:
+            await self._client.post(self.endpoint, json=payload)
+        except httpx.HTTPError as e:
+            print(f"Ошибка при отправке трассировки: {e}")
+
+    async def close(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class Tracer:
+    def __init__(self):
+        self.exporter = None
+        self.enabled = False
+        # Завершённые спаны каждой ещё открытой трассы по trace_id.
+        self._traces = {}
+
+    def configure(self, exporter):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    def span(self, name, **attributes):
+        if not self.enabled:
+            return NOOP_SPAN
+        span = Span(self, name, _current_span.get(), attributes)
+        if span.parent_id is None:
+            self._traces[span.trace_id] = []
+        return span
+
+    def _finish(self, span):
+        # Спаны апдейта уходят пачкой, когда закрывается его корневой span.
+        # Спаны фоновых задач, переживших корневой, уходят по одному.
+        if span.parent_id is None:
+            spans = self._traces.pop(span.trace_id, [])
+            spans.append(span)
+        else:
+            buffer = self._traces.get(span.trace_id)
+            if buffer is not None:
+                buffer.append(span)
+                return
+            spans = [span]
+        try:
+            self.exporter.export(spans)
+        except OSError as e:
+            print(f"Ошибка при записи трассировки: {e}")
+
+    async def close(self):
+        if self.exporter is not None:
+            await self.exporter.close()
+
+
+TRACER = Tracer()
+
+
+def traced(name):
+    """Декоратор для корутин: оборачивает вызов в span с именем name."""
+
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return await function(*args, **kwargs)
+            with TRACER.span(name):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик для каждого every-го апдейта.
+
+    Фоновый поток раз в interval секунд снимает стек потока event loop,
+    но учитывает его, только если в этот момент выполняется задача одного
+    из выбранных апдейтов. Результат - свёрнутые стеки для flamegraph.pl
+    или speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.every = 0
+        self.stacks = Counter()
+        self._seen = 0
+        self._tasks = set()
+        self._loop = None
+        self._thread_id = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self):
+        return self.every > 0
+
+    def start(self, every=100):
+        """Включает профилирование каждого every-го апдейта."""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self.every = every
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.every = 0
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def should_sample(self):
+        if not self.every:
+            return False
+        self._seen += 1
+        return self._seen % self.every == 0
+
+    def track(self, task):
+        self._tasks.add(task)
+
+    def untrack(self, task):
+        self._tasks.discard(task)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._tasks:
+                continue
+            task = asyncio.current_task(self._loop)
+            if task not in self._tasks:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+            )
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def dump(self, path):
+        """Записывает накопленные стеки в формате "a;b;c count"."""
+        stacks, self.stacks = self.stacks, Counter()
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        return len(stacks)
+
+
+PROFILER = SamplingProfiler()
+
+
+def create_exporter(kind, path="traces.jsonl", endpoint=None):
+    """Экспортёр по названию из config.ini: none, file или otlp."""
+    if kind == "file":
+        return FileExporter(path)
+    if kind == "otlp":
+        return OtlpHttpExporter(endpoint or "http://127.0.0.1:4318/v1/traces")
+    return None
+
+
+def install_profiler_signal(every=100, output="profile.folded"):
+    """SIGUSR1 включает профилировщик, повторный SIGUSR1 выключает его и
+    записывает стеки в output."""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    def toggle():
+        if PROFILER.enabled:
+            PROFILER.stop()
+            count = PROFILER.dump(output)
+            print(f"Профилировщик остановлен, {count} стеков записано в {output}")
+        else:
+            PROFILER.start(every)
+            print(f"Профилировщик включён для каждого {every}-го апдейта")
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, toggle)
+
+
+class TracedRequest(HTTPXRequest):
+    """HTTPXRequest, который оборачивает вызовы Bot API в спаны."""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if not TRACER.enabled:
+            return await super().do_request(url, method, request_data, **kwargs)
+        with TRACER.span(f"telegram {url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, request_data, **kwargs)
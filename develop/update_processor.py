@@ -0,0 +1,63 @@
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обрабатывает апдейты параллельно, но сохраняет порядок для каждого
+    пользователя: новая геолокация пользователя всегда записывается раньше
+    его следующего поиска.
+
+    max_pending_updates ограничивает число апдейтов в работе, включая ждущие
+    своей очереди у того же пользователя, max_workers - число одновременно
+    выполняемых обработчиков. У одного пользователя в работе не больше
+    max_user_pending апдейтов, остальные отбрасываются, чтобы он не занял
+    все места очереди.
+    """
+
+    def __init__(self, max_workers=32, max_pending_updates=256, max_user_pending=4):
+        super().__init__(max(max_workers, max_pending_updates))
+        self.max_workers = max_workers
+        self.max_user_pending = max_user_pending
+        self.dropped = 0
+        self._workers = asyncio.BoundedSemaphore(max_workers)
+        self._user_locks = {}
+
+    @staticmethod
+    def _user_key(update):
+        user = getattr(update, "effective_user", None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, "effective_chat", None)
+        return chat.id if chat is not None else None
+
+    async def do_process_update(self, update, coroutine) -> None:
+        key = self._user_key(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+
+        entry = self._user_locks.get(key)
+        if entry is None:
+            entry = self._user_locks[key] = [asyncio.Lock(), 0]
+        elif entry[1] >= self.max_user_pending:
+            self.dropped += 1
+            coroutine.close()
+            print(f"Слишком много апдейтов от {key}, апдейт отброшен")
+            return
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._workers:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,64 @@
+from urllib.parse import quote
+
+NO_LINK = "Ссылка не доступна"
+
+
+def yandex_maps_link(name, latitude, longitude):
+    return (
+        f"https://yandex.ru/maps/?text={quote(name)}"
+        f"&pt={longitude},{latitude}&z=16&l=map"
+    )
+
+
+class Venue:
+    """Заведение из выдачи 2GIS с готовыми ссылкой на карту и текстом ответа.
+
+    Ссылка и текст считаются один раз при создании, поэтому повторные
+    ответы из кэша и индекса не кодируют URL и не собирают строки заново.
+    При сериализации запись сводится к кортежу исходных полей.
+    """
+
+    __slots__ = ("id", "name", "address", "latitude", "longitude", "link", "text")
+
+    def __init__(self, id, name, address, latitude=None, longitude=None):
+        self.id = id
+        self.name = name
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+        self.link = (
+            yandex_maps_link(name, latitude, longitude) if self.has_location else None
+        )
+        self.text = f"{name}\nАдрес: {address}\nСсылка: {self.link or NO_LINK}"
+
+    @property
+    def has_location(self):
+        return self.latitude is not None and self.longitude is not None
+
+    @property
+    def key(self):
+        return self.id or (self.name, self.address)
+
+    def with_location(self, latitude, longitude):
+        return Venue(self.id, self.name, self.address, latitude, longitude)
+
+    def to_tuple(self):
+        return self.id, self.name, self.address, self.latitude, self.longitude
+
+    @classmethod
+    def from_tuple(cls, fields):
+        return cls(*fields)
+
+    def __reduce__(self):
+        return Venue, self.to_tuple()
+
+    def __eq__(self, other):
+        if not isinstance(other, Venue):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+    def __repr__(self):
+        return f"Venue{self.to_tuple()!r}"
@@ -0,0 +1,169 @@
+"""Режим нескольких процессов за одним приёмником вебхука.
+
+Главный процесс принимает апдейты от Telegram и раскладывает их по
+очередям воркеров по хэшу id пользователя, так что апдейты одного
+пользователя всегда обрабатывает один и тот же воркер в исходном порядке.
+Каждый воркер - обычные Application и Controller в своём процессе; кэши
+заведений и геокодирования воркеры делят через файл SQLite
+([cache] shared_path).
+
+Лимит Nominatim (1 запрос/с) делится поровну между воркерами. Отложенная
+запись геолокаций по умолчанию выключена ([database] write_flush_interval
+= 0): сброс перед чтением групп видит только буфер своего процесса.
+"""
+
+import asyncio
+import configparser
+import hmac
+import json
+import multiprocessing
+import os
+import queue
+import zlib
+
+import tornado.web
+from telegram import Bot, Update
+from bootstrap import build_application, configure_observability
+from controller import Controller
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def update_user_id(data):
+    """id отправителя из сырого апдейта без разбора всего объекта."""
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if isinstance(user, dict) and "id" in user:
+            return user["id"]
+        chat = value.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return data.get("update_id", 0)
+
+
+def route(data, workers):
+    return zlib.crc32(str(update_user_id(data)).encode()) % workers
+
+
+class WebhookHandler(tornado.web.RequestHandler):
+    def initialize(self, queues, secret_token):
+        self.queues = queues
+        self.secret_token = secret_token
+
+    def post(self):
+        if self.secret_token and not hmac.compare_digest(
+            self.request.headers.get(SECRET_HEADER, ""), self.secret_token
+        ):
+            self.set_status(403)
+            return
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            self.set_status(400)
+            return
+        try:
+            self.queues[route(data, len(self.queues))].put_nowait(data)
+        except queue.Full:
+            # Telegram повторит доставку позже.
+            self.set_status(503)
+
+
+def config_to_dict(config):
+    return {
+        section: dict(config.items(section, raw=True)) for section in config.sections()
+    }
+
+
+def worker_main(index, token, config_data, updates):
+    config = configparser.ConfigParser()
+    config.read_dict(config_data)
+    asyncio.run(_run_worker(index, token, config, updates))
+
+
+async def _run_worker(index, token, config, updates):
+    configure_observability(config, metrics_port_offset=index + 1)
+    application = build_application(token, config, updater=False)
+    controller = Controller(application, config=config)
+
+    async with application:
+        await controller.post_init(application)
+        await application.start()
+        try:
+            while True:
+                try:
+                    data = await asyncio.to_thread(updates.get, True, 1.0)
+                except queue.Empty:
+                    continue
+                if data is None:
+                    break
+                await application.update_queue.put(
+                    Update.de_json(data, application.bot)
+                )
+        finally:
+            await application.stop()
+            await controller.shutdown(application)
+
+
+async def _serve_webhook(token, config, queues):
+    url_path = config.get("webhook", "url_path", fallback="telegram").strip("/")
+    secret_token = config.get("webhook", "secret_token", fallback=None)
+
+    async with Bot(token) as bot:
+        await bot.set_webhook(
+            url=config.get("webhook", "url"),
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+        )
+
+    app = tornado.web.Application(
+        [
+            (
+                f"/{url_path}",
+                WebhookHandler,
+                {"queues": queues, "secret_token": secret_token},
+            )
+        ]
+    )
+    app.listen(
+        config.getint("webhook", "port", fallback=8443),
+        address=config.get("webhook", "listen", fallback="0.0.0.0"),
+    )
+    print(f"Приёмник вебхука запущен, воркеров: {len(queues)}")
+    await asyncio.Event().wait()
+
+
+def run_workers(token, config):
+    """Запускает воркеры и приёмник вебхука в текущем процессе.
+
+    Метрики воркера с номером i доступны на [metrics] port + i + 1.
+    """
+    count = config.getint("workers", "count", fallback=os.cpu_count() or 1)
+    queue_size = config.getint("workers", "queue_size", fallback=1000)
+    config_data = config_to_dict(config)
+    # Воркерам нужно точное число процессов, чтобы поделить лимит Nominatim.
+    config_data.setdefault("workers", {})["count"] = str(count)
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue(maxsize=queue_size) for _ in range(count)]
+    processes = [
+        context.Process(
+            target=worker_main,
+            args=(index, token, config_data, queues[index]),
+            name=f"bot-worker-{index}",
+            daemon=True,
+        )
+        for index in range(count)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        asyncio.run(_serve_webhook(token, config, queues))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for updates in queues:
+            updates.put(None)
+        for process in processes:
+            process.join(timeout=10)
@@ -0,0 +1,188 @@
+import asyncio
+
+# Методы, которые читают или меняют группы или ищут пользователей по
+# геолокации и поэтому должны видеть все отложенные записи о пользователях.
+FLUSH_BEFORE = frozenset(
+    {
+        "get_all_users",
+        "add_user_to_group",
+        "remove_user_from_group",
+        "get_group_members",
+        "get_group_locations",
+        "get_group_center",
+        "get_users_within",
+        "get_nearest_users",
+    }
+)
+
+
+class WriteBehindDatabaseManager:
+    """Буфер отложенной записи поверх AsyncDatabaseManager.
+
+    Регистрации и обновления геолокации копятся в памяти (для каждого
+    пользователя остаётся только последняя точка) и записываются пачками
+    при достижении max_batch или раз в flush_interval секунд. Остальные
+    методы передаются в обёрнутый менеджер без изменений.
+
+    При flush_interval = 0 записи не откладываются: каждая сразу уходит
+    в БД. Так работает режим воркеров, где сброс перед чтением групп
+    (FLUSH_BEFORE) видит только буфер своего процесса.
+
+    Неудачная пачка делится пополам, пока ошибка не сведётся к отдельным
+    строкам; строка, которая не записалась max_attempts раз, пока другие
+    записывались, отбрасывается. В буфере не больше max_pending записей, лишние
+    отбрасываются с сообщением в лог.
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        max_batch=500,
+        flush_interval=1.0,
+        max_pending=10000,
+        max_attempts=3,
+    ):
+        self.db_manager = db_manager
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._attempts = {}
+        self._pending_users = set()
+        self._pending_locations = {}
+        self._flushing_locations = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._size_flush = None
+
+    def __getattr__(self, name):
+        attribute = getattr(self.db_manager, name)
+        if name not in FLUSH_BEFORE:
+            return attribute
+
+        async def flushed(*args, **kwargs):
+            await self.flush()
+            return await attribute(*args, **kwargs)
+
+        return flushed
+
+    def pending_count(self):
+        return len(self._pending_users) + len(self._pending_locations)
+
+    async def add_user(self, username):
+        if username not in self._pending_users and self._is_full():
+            print(f"Буфер записи переполнен, регистрация {username} отброшена")
+            return
+        self._pending_users.add(username)
+        await self._after_write()
+
+    async def update_user_location(self, username, latitude, longitude):
+        if username not in self._pending_locations and self._is_full():
+            print(f"Буфер записи переполнен, геолокация {username} отброшена")
+            return
+        self._pending_locations[username] = (latitude, longitude)
+        await self._after_write()
+
+    def _is_full(self):
+        return self.pending_count() >= self.max_pending
+
+    async def _after_write(self):
+        if self.flush_interval <= 0:
+            await self.flush()
+        else:
+            self._schedule_size_flush()
+
+    async def get_user_location(self, username):
+        location = self._pending_locations.get(username)
+        if location is None:
+            location = self._flushing_locations.get(username)
+        if location is not None:
+            return location
+        return await self.db_manager.get_user_location(username)
+
+    def _schedule_size_flush(self):
+        if self.pending_count() < self.max_batch:
+            return
+        if self._size_flush is None or self._size_flush.done():
+            self._size_flush = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        async with self._flush_lock:
+            users, self._pending_users = self._pending_users, set()
+            self._flushing_locations, self._pending_locations = (
+                self._pending_locations,
+                {},
+            )
+            try:
+                failed = await self._write_rows(
+                    "add_users", sorted(users), lambda username: username
+                )
+                for username in failed:
+                    if not self._is_full():
+                        self._pending_users.add(username)
+                rows = [
+                    (username, *location)
+                    for username, location in self._flushing_locations.items()
+                ]
+                failed = await self._write_rows(
+                    "update_user_locations", rows, lambda row: row[0]
+                )
+                for username, *location in failed:
+                    if username in self._pending_locations or not self._is_full():
+                        self._pending_locations.setdefault(username, tuple(location))
+            finally:
+                self._flushing_locations = {}
+
+    async def _write_rows(self, method, rows, username_of):
+        """Записывает строки и возвращает те, что стоит повторить позже;
+        строки, исчерпавшие max_attempts, отбрасываются. Если не записалось
+        ничего, скорее недоступна БД, и попытка строкам не засчитывается."""
+        failed = await self._write_batch(getattr(self.db_manager, method), rows)
+        if len(failed) == len(rows):
+            return rows
+        retry = []
+        for row in rows:
+            key = method, username_of(row)
+            if row not in failed:
+                self._attempts.pop(key, None)
+                continue
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts < self.max_attempts:
+                self._attempts[key] = attempts
+                retry.append(row)
+            else:
+                self._attempts.pop(key, None)
+                print(f"Запись {row} не удалась {attempts} раз и отброшена")
+        return retry
+
+    async def _write_batch(self, write, rows):
+        """Строки, которые не удалось записать: пачка с ошибкой делится
+        пополам, чтобы одна плохая строка не держала остальные."""
+        if not rows or await write(rows):
+            return set()
+        if len(rows) == 1:
+            return set(rows)
+        middle = len(rows) // 2
+        return await self._write_batch(write, rows[:middle]) | (
+            await self._write_batch(write, rows[middle:])
+        )
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._flush_task is None and self.flush_interval > 0:
+            self._flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        await self.db_manager.close()
@@ -0,0 +1,98 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from develop.admission import (
+    AdmissionController,
+    OVERLOADED_MESSAGE,
+    RATE_LIMITED_MESSAGE,
+)
+from telegram import Update, Message, User, Chat
+
+
+def make_update(user_id):
+    user = User(id=user_id, username=f"user{user_id}", first_name="Test", is_bot=False)
+    chat = Chat(id=user_id, type="private")
+    message = Message(
+        message_id=1, from_user=user, chat=chat, date=None, text="/search"
+    )
+    message.set_bot(AsyncMock())
+    return Update(update_id=1, message=message)
+
+
+@pytest.mark.asyncio
+async def test_user_over_rate_is_rejected():
+    admission = AdmissionController(user_rate=0.001, user_burst=2)
+    handler = AsyncMock()
+    guarded = admission.guard(handler)
+    update = make_update(1)
+
+    with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
+        for _ in range(3):
+            await guarded(update, None)
+
+        mock_reply.assert_called_once_with(RATE_LIMITED_MESSAGE)
+    assert handler.call_count == 2
+    assert admission.stats()["rejected_rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_global_concurrency_and_queue_shed_load():
+    admission = AdmissionController(max_concurrent=1, max_queue=1)
+    release = asyncio.Event()
+    running = 0
+    peak = 0
+
+    async def handler(update, context):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+
+    guarded = admission.guard(handler)
+    first = asyncio.ensure_future(guarded(make_update(1), None))
+    second = asyncio.ensure_future(guarded(make_update(2), None))
+    await asyncio.sleep(0)
+    with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
+        await guarded(make_update(3), None)
+
+        mock_reply.assert_called_once_with(OVERLOADED_MESSAGE)
+    assert admission.stats()["in_flight"] == 1
+    assert admission.stats()["waiting"] == 1
+
+    release.set()
+    await asyncio.gather(first, second)
+
+    assert peak == 1
+    assert admission.stats()["admitted"] == 2
+    assert admission.stats()["rejected_overloaded"] == 1
+
+
+@pytest.mark.asyncio
+async def test_overloaded_rejection_does_not_spend_user_token():
+    admission = AdmissionController(
+        user_rate=0.001, user_burst=1, max_concurrent=1, max_queue=0
+    )
+    release = asyncio.Event()
+
+    async def handler(update, context):
+        await release.wait()
+
+    guarded = admission.guard(handler)
+    first = asyncio.ensure_future(guarded(make_update(1), None))
+    await asyncio.sleep(0)
+    with patch.object(Message, "reply_text", new=AsyncMock()):
+        await guarded(make_update(2), None)
+    release.set()
+    await first
+
+    await guarded(make_update(2), None)
+
+    assert admission.stats()["rejected_overloaded"] == 1
+    assert admission.stats()["rejected_rate_limited"] == 0
+    assert admission.stats()["admitted"] == 2
@@ -0,0 +1,77 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import httpx
+import pytest
+from develop.api_client import ApiClient, CATALOG_URL
+from develop.search import Search
+
+
+def make_client(handler, **kwargs):
+    api_client = ApiClient(**kwargs)
+    api_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return api_client
+
+
+@pytest.mark.asyncio
+async def test_search_items_success():
+    def handler(request):
+        assert str(request.url).startswith(CATALOG_URL)
+        assert request.url.params["q"] == "бар"
+        return httpx.Response(200, json={"result": {"items": []}})
+
+    api_client = make_client(handler)
+
+    result = await api_client.search_items({"q": "бар"})
+
+    assert result == {"result": {"items": []}}
+    await api_client.close()
+
+
+@pytest.mark.asyncio
+async def test_geocode_http_error():
+    api_client = make_client(lambda request: httpx.Response(503))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await api_client.geocode({"q": "Москва"})
+    await api_client.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=[])
+
+    api_client = make_client(handler, max_concurrency=3)
+
+    await asyncio.gather(*(api_client.geocode({"q": str(i)}) for i in range(10)))
+
+    assert peak == 3
+    await api_client.close()
+
+
+@pytest.mark.asyncio
+async def test_non_json_body_is_http_error():
+    api_client = make_client(
+        lambda request: httpx.Response(200, text="<html>Bad gateway</html>")
+    )
+
+    with pytest.raises(httpx.HTTPError):
+        await api_client.search_items({"q": "бар"})
+
+    search = Search(api_key="testkey", db_manager=None, api_client=api_client)
+    result = await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+
+    assert result.startswith("Ошибка при поиске")
+    await api_client.close()
@@ -0,0 +1,82 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import psycopg2
+import pytest
+from unittest.mock import patch, Mock
+from develop.async_database_manager import AsyncDatabaseManager
+
+
+def make_connection():
+    connection = Mock()
+    connection.closed = 0
+    return connection
+
+
+@pytest.fixture
+def pool():
+    with patch("develop.async_database_manager.ThreadedConnectionPool") as mock_pool:
+        yield mock_pool.return_value
+
+
+@pytest.fixture
+def db_manager(pool):
+    return AsyncDatabaseManager(
+        db_name="testdb", user="testuser", password="testpass", statement_timeout=100
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_user_location_checks_out_connection(db_manager, pool):
+    connection = make_connection()
+    connection.cursor.return_value.fetchone.return_value = (55.7558, 37.6173)
+    pool.getconn.return_value = connection
+
+    result = await db_manager.get_user_location("testuser")
+
+    assert result == (55.7558, 37.6173)
+    connection.cursor.return_value.execute.assert_called_once_with(
+        "SELECT latitude, longitude FROM public.users WHERE username = %s;",
+        ("testuser",),
+    )
+    pool.putconn.assert_called_once_with(connection, close=False)
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_is_passed_to_pool(db_manager, pool):
+    pool.getconn.return_value = make_connection()
+
+    await db_manager.add_user("testuser")
+
+    assert db_manager.connect_kwargs["options"] == "-c statement_timeout=100"
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_dropped_connection(db_manager, pool):
+    dropped = make_connection()
+
+    def drop(*args):
+        dropped.closed = 2
+        raise psycopg2.OperationalError("server closed the connection")
+
+    dropped.cursor.return_value.execute.side_effect = drop
+    dropped.rollback.side_effect = psycopg2.InterfaceError("connection already closed")
+    healthy = make_connection()
+    healthy.cursor.return_value.fetchall.return_value = [(1, "@user1")]
+    pool.getconn.side_effect = [dropped, healthy]
+
+    result = await db_manager.get_all_users()
+
+    assert result == [(1, "@user1")]
+    pool.putconn.assert_any_call(dropped, close=True)
+    pool.putconn.assert_any_call(healthy, close=False)
+
+
+@pytest.mark.asyncio
+async def test_returns_default_when_database_unavailable(db_manager, pool):
+    pool.getconn.side_effect = psycopg2.OperationalError("could not connect")
+
+    assert await db_manager.get_all_users() == []
+    assert await db_manager.get_user_location("testuser") is None
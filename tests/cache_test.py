@@ -0,0 +1,86 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+from develop.cache import TTLCache
+import math
+import random
+from develop.geo import geohash_bounds, geohash_cover, geohash_encode, haversine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_set():
+    cache = TTLCache(ttl=10)
+    cache.set("key", "value")
+
+    assert cache.get("key") == "value"
+    assert "key" in cache
+    assert cache.get("missing") is None
+
+
+def test_entry_expires_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set("key", "value")
+
+    clock.now = 11
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = TTLCache(ttl=10, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_geohash_encode():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash_encode(55.7558, 37.6173, 7) == geohash_encode(55.7559, 37.6174, 7)
+
+
+def test_haversine():
+    assert haversine(55.7558, 37.6173, 55.7558, 37.6173) == 0
+    assert 630000 < haversine(55.7558, 37.6173, 59.9343, 30.3351) < 640000
+
+
+def test_geohash_bounds_contain_encoded_point():
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(geohash_encode(55.75, 37.61, 6))
+    assert lat_min <= 55.75 <= lat_max
+    assert lon_min <= 37.61 <= lon_max
+
+
+def test_geohash_cover_contains_every_point_in_radius():
+    rng = random.Random(0)
+    for _ in range(500):
+        latitude = rng.uniform(-70, 70)
+        longitude = rng.uniform(-180, 180)
+        radius = rng.choice([100, 2000, 20000])
+        prefixes = geohash_cover(latitude, longitude, radius)
+        for _ in range(5):
+            bearing = rng.uniform(0, 2 * math.pi)
+            distance = rng.uniform(0, radius) / 111320
+            point_lat = latitude + distance * math.cos(bearing)
+            point_lon = longitude + distance * math.sin(bearing) / math.cos(
+                math.radians(latitude)
+            )
+            point_lon = (point_lon + 180) % 360 - 180
+            if haversine(latitude, longitude, point_lat, point_lon) > radius:
+                continue
+            geohash = geohash_encode(point_lat, point_lon, 9)
+            assert any(geohash.startswith(prefix) for prefix in prefixes)
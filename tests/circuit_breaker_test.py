@@ -0,0 +1,157 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import httpx
+import pytest
+from develop.api_client import ApiClient
+
+# api_client импортирует circuit_breaker как верхнеуровневый модуль, и
+# CircuitOpenError должен быть тем же классом.
+from circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from develop.search import STALE_NOTE, Search
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_on_failure_rate_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(
+        "catalog", failure_rate=0.5, min_calls=4, reset_timeout=10, clock=clock
+    )
+
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record_success() if success else breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 10
+
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats() == {"open": 0, "calls": 0, "failures": 0}
+
+
+def test_failed_probe_reopens_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker("catalog", min_calls=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 5
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == 5
+
+
+def make_client(handler, breaker):
+    return ApiClient(
+        transport=httpx.MockTransport(handler), breakers={"catalog": breaker}
+    )
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_without_request():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    api_client = make_client(handler, CircuitBreaker("catalog", min_calls=2))
+
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            await api_client.search_items({"q": "бар"})
+    with pytest.raises(CircuitOpenError):
+        await api_client.search_items({"q": "бар"})
+
+    assert len(calls) == 2
+    assert not api_client.is_available("catalog")
+    await api_client.close()
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_open_breaker():
+    api_client = make_client(
+        lambda request: httpx.Response(403), CircuitBreaker("catalog", min_calls=2)
+    )
+
+    for _ in range(3):
+        with pytest.raises(httpx.HTTPStatusError):
+            await api_client.search_items({"q": "бар"})
+
+    assert api_client.breakers["catalog"].state == CLOSED
+    await api_client.close()
+
+
+@pytest.mark.asyncio
+async def test_search_serves_stale_results_and_revalidates():
+    healthy = True
+
+    def handler(request):
+        if not healthy:
+            return httpx.Response(503)
+        return httpx.Response(
+            200,
+            json={
+                "result": {
+                    "items": [
+                        {
+                            "id": "1",
+                            "name": "Бар",
+                            "address_name": "Улица",
+                            "geometry": {"location": {"lat": 55.7558, "lon": 37.6173}},
+                        }
+                    ]
+                }
+            },
+        )
+
+    breaker = CircuitBreaker("catalog", min_calls=1, reset_timeout=0.05)
+    search = Search(
+        api_key="testkey",
+        db_manager=None,
+        api_client=make_client(handler, breaker),
+        revalidate_interval=0.01,
+    )
+
+    fresh = await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+    assert STALE_NOTE not in fresh
+
+    healthy = False
+    search.venue_cache.clear()
+    search.venue_index._covered.clear()
+
+    stale = await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+    assert "Бар" in stale and STALE_NOTE in stale
+    assert breaker.state == OPEN
+
+    healthy = True
+    await asyncio.wait_for(search._revalidation_task, timeout=1)
+
+    assert breaker.state == CLOSED
+    assert search._stale_areas == {}
+    assert search.venue_index.is_covered(55.7558, 37.6173)
+    await search.api_client.close()
@@ -0,0 +1,113 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock
+from prometheus_client import REGISTRY
+from telegram.ext import Application
+from develop.async_database_manager import AsyncDatabaseManager
+from develop.api_client import ApiClient
+from develop.controller import (
+    Controller,
+    MENU_MARKUP,
+    START_INLINE_MARKUP,
+    START_REPLY_MARKUP,
+)
+from load_generator import default_config
+
+
+def make_controller(db_ping, warmup_timeout=0.1):
+    config = default_config()
+    config.read_dict({"bot": {"warmup_timeout": str(warmup_timeout)}})
+    db_backend = Mock(spec=AsyncDatabaseManager)
+    db_backend.ping.side_effect = db_ping
+    api_client = Mock(spec=ApiClient)
+    api_client.breakers = {}
+    api_client.ping.return_value = True
+    application = Application.builder().token("123:TEST").updater(None).build()
+    return Controller(
+        application, config=config, db_backend=db_backend, api_client=api_client
+    )
+
+
+@pytest.mark.asyncio
+async def test_warm_up_does_not_wait_for_slow_database():
+    started = asyncio.Event()
+
+    async def slow_ping():
+        started.set()
+        await asyncio.sleep(10)
+        return True
+
+    controller = make_controller(slow_ping, warmup_timeout=0.05)
+
+    start = time.perf_counter()
+    await controller.warm_up()
+
+    assert time.perf_counter() - start < 1
+    assert started.is_set()
+    assert REGISTRY.get_sample_value("bot_health_check_ok", {"component": "catalog"})
+    for task in controller._warmup_tasks:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_reports_failed_database():
+    async def failed_ping():
+        return False
+
+    controller = make_controller(failed_ping)
+    await controller.warm_up()
+
+    assert (
+        REGISTRY.get_sample_value("bot_health_check_ok", {"component": "database"}) == 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_start_and_menu_reuse_prebuilt_markup():
+    controller = make_controller(AsyncMock(return_value=True))
+    update = Mock()
+    update.message.from_user.username = "user"
+    update.message.reply_text = AsyncMock()
+
+    await controller.start(update, Mock())
+    await controller.menu_handler(update, Mock())
+
+    markups = [
+        call.kwargs["reply_markup"] for call in update.message.reply_text.call_args_list
+    ]
+    assert markups[0] is START_INLINE_MARKUP
+    assert markups[1] is START_REPLY_MARKUP
+    assert markups[2] is MENU_MARKUP
+
+
+def test_workers_share_nominatim_rate_limit():
+    config = default_config()
+    assert Controller._create_nominatim_limiter(config) is None
+
+    config.read_dict({"bot": {"mode": "workers"}, "workers": {"count": "4"}})
+    limiter = Controller._create_nominatim_limiter(config)
+
+    assert limiter.rate == pytest.approx(0.25)
+
+
+@pytest.mark.asyncio
+async def test_page_buttons_pass_admission_control():
+    controller = make_controller(AsyncMock(return_value=True))
+    update = Mock()
+    update.effective_user.id = 1
+    update.callback_query.data = "page:token:2"
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.message.reply_text = AsyncMock()
+
+    for _ in range(controller.admission.user_burst + 1):
+        await controller.button_handler(update, Mock())
+
+    stats = controller.admission.stats()
+    assert stats["admitted"] == controller.admission.user_burst
+    assert stats["rejected_rate_limited"] == 1
@@ -1,6 +1,8 @@
 import pytest
 from unittest.mock import patch, Mock
 from develop.database_manager import DatabaseManager
+from develop.geo import unit_vector
+from develop.group_centroids import run
 
 
 @pytest.fixture
@@ -36,15 +38,44 @@ def test_add_user_exception(db_manager):
 
 
 def test_update_user_location(db_manager):
+    db_manager.cursor.fetchone.return_value = None
+
     db_manager.update_user_location("testuser", 55.7558, 37.6173)
 
-    db_manager.cursor.execute.assert_called_once_with(
-        "UPDATE public.users SET latitude = %s, longitude = %s WHERE username = %s;",
-        (55.7558, 37.6173, "testuser"),
+    db_manager.cursor.execute.assert_called_with(
+        "UPDATE public.users SET latitude = %s, longitude = %s, geohash = %s "
+        "WHERE username = %s;",
+        (55.7558, 37.6173, "ucfv0n014", "testuser"),
     )
     db_manager.connection.commit.assert_called_once()
 
 
+def test_update_user_location_shifts_group_centroids(db_manager):
+    db_manager.cursor.fetchone.return_value = (7, 55.0, 37.0)
+
+    with patch("develop.database_manager.execute_values") as mock_execute_values:
+        db_manager.update_user_location("testuser", 56.0, 38.0)
+
+    assert "FOR UPDATE" in db_manager.cursor.execute.call_args_list[0].args[0]
+    query, deltas = mock_execute_values.call_args.args[1:3]
+    assert "UPDATE public.group_centroids" in query
+    old, new = unit_vector(55.0, 37.0), unit_vector(56.0, 38.0)
+    assert deltas[0][0] == 7 and deltas[0][4] == 0
+    assert deltas[0][1:4] == pytest.approx([b - a for a, b in zip(old, new)])
+    db_manager.connection.commit.assert_called_once()
+
+
+def test_first_location_counts_member(db_manager):
+    db_manager.cursor.fetchone.return_value = (7, None, None)
+
+    with patch("develop.database_manager.execute_values") as mock_execute_values:
+        db_manager.update_user_location("testuser", 55.0, 37.0)
+
+    deltas = mock_execute_values.call_args.args[2]
+    assert deltas[0][4] == 1
+    assert deltas[0][1:4] == pytest.approx(unit_vector(55.0, 37.0))
+
+
 def test_update_user_location_exception(db_manager):
     db_manager.cursor.execute.side_effect = Exception("Database error")
 
@@ -91,3 +122,208 @@ def test_get_all_users_exception(db_manager):
     result = db_manager.get_all_users()
 
     assert result == []
+
+
+def test_get_cached_coordinates(db_manager):
+    db_manager.cursor.fetchone.return_value = (55.7558, 37.6173)
+
+    result = db_manager.get_cached_coordinates("Москва", 3600, 60)
+
+    assert result == (55.7558, 37.6173)
+    args = db_manager.cursor.execute.call_args[0]
+    assert "FROM public.geocode_cache" in args[0]
+    assert args[1] == ("Москва", 60, 3600)
+
+
+def test_save_cached_coordinates(db_manager):
+    db_manager.save_cached_coordinates("Москва", None, None)
+
+    args = db_manager.cursor.execute.call_args[0]
+    assert "ON CONFLICT (address) DO UPDATE" in args[0]
+    assert args[1] == ("Москва", None, None)
+    db_manager.connection.commit.assert_called_once()
+
+
+def test_add_user_to_group(db_manager):
+    db_manager.cursor.fetchone.return_value = (3, 55.0, 37.0)
+    db_manager.cursor.rowcount = 1
+
+    assert db_manager.add_user_to_group("@user1", "friends") is True
+
+    calls = db_manager.cursor.execute.call_args_list
+    assert "ON CONFLICT (group_name, user_id) DO NOTHING" in calls[1].args[0]
+    assert calls[1].args[1] == (3, "friends")
+    query, params = calls[2].args
+    assert "INSERT INTO public.group_centroids" in query
+    assert params[:2] == ("friends", 1)
+    assert params[2:] == pytest.approx(unit_vector(55.0, 37.0))
+    db_manager.connection.commit.assert_called_once()
+
+
+def test_add_unknown_user_to_group(db_manager):
+    db_manager.cursor.fetchone.return_value = None
+
+    assert db_manager.add_user_to_group("@nobody", "friends") is False
+    assert db_manager.cursor.execute.call_count == 1
+    db_manager.connection.commit.assert_not_called()
+
+
+def test_remove_user_from_group_subtracts_location(db_manager):
+    db_manager.cursor.fetchone.return_value = (3, 55.0, 37.0)
+    db_manager.cursor.rowcount = 1
+
+    assert db_manager.remove_user_from_group("@user1", "friends") is True
+
+    params = db_manager.cursor.execute.call_args.args[1]
+    assert params[:2] == ("friends", -1)
+    assert params[2:] == pytest.approx([-v for v in unit_vector(55.0, 37.0)])
+
+
+def test_remove_user_from_group_not_member(db_manager):
+    db_manager.cursor.fetchone.return_value = (3, None, None)
+    db_manager.cursor.rowcount = 0
+
+    assert db_manager.remove_user_from_group("@user1", "friends") is False
+    assert db_manager.cursor.execute.call_count == 2
+
+
+def test_get_group_members(db_manager):
+    db_manager.cursor.fetchall.return_value = [(1, "@user1")]
+
+    result = db_manager.get_group_members("friends")
+
+    assert result == [(1, "@user1")]
+    args = db_manager.cursor.execute.call_args[0]
+    assert "WHERE groups.group_name = %s" in args[0]
+    assert args[1] == ("friends",)
+
+
+def test_get_group_locations(db_manager):
+    db_manager.cursor.fetchall.return_value = [(55.7558, 37.6173)]
+
+    result = db_manager.get_group_locations("friends")
+
+    assert result == [(55.7558, 37.6173)]
+    assert "users.latitude IS NOT NULL" in db_manager.cursor.execute.call_args[0][0]
+
+
+def test_get_group_center(db_manager):
+    sums = [a + b for a, b in zip(unit_vector(55.0, 179.0), unit_vector(55.0, -179.0))]
+    db_manager.cursor.fetchone.return_value = (*sums, 2)
+
+    latitude, longitude, count = db_manager.get_group_center("friends")
+
+    assert count == 2
+    assert latitude == pytest.approx(55.0, abs=0.01)
+    assert abs(longitude) == pytest.approx(180.0)
+    assert "FROM public.group_centroids" in db_manager.cursor.execute.call_args[0][0]
+
+
+def test_get_group_center_empty(db_manager):
+    db_manager.cursor.fetchone.return_value = (0.0, 0.0, 0.0, 0)
+
+    assert db_manager.get_group_center("friends") == (None, None, 0)
+
+
+def test_verify_group_centroids(db_manager):
+    db_manager.cursor.fetchall.return_value = [("drifted",)]
+
+    assert db_manager.verify_group_centroids() == ["drifted"]
+    assert (
+        "FULL JOIN public.group_centroids" in db_manager.cursor.execute.call_args[0][0]
+    )
+
+
+def test_rebuild_group_centroids_for_group(db_manager):
+    db_manager.cursor.rowcount = 1
+
+    assert db_manager.rebuild_group_centroids("friends") == 1
+
+    calls = db_manager.cursor.execute.call_args_list
+    assert "LOCK TABLE public.group_centroids" in calls[0].args[0]
+    assert "WHERE groups.group_name = %s" in calls[1].args[0]
+    assert calls[1].args[1] == ("friends",) == calls[2].args[1]
+    db_manager.connection.commit.assert_called_once()
+
+
+def test_centroids_command_exit_codes():
+    db_manager = Mock()
+    db_manager.verify_group_centroids.return_value = []
+    assert run(db_manager, "verify") == 0
+    db_manager.verify_group_centroids.return_value = ["friends"]
+    assert run(db_manager, "verify") == 1
+    db_manager.rebuild_group_centroids.return_value = None
+    assert run(db_manager, "rebuild", "friends") == 2
+    db_manager.rebuild_group_centroids.assert_called_once_with("friends")
+
+
+def test_add_users(db_manager):
+    with patch("develop.database_manager.execute_values") as mock_execute_values:
+        assert db_manager.add_users(["@user1", "@user2"]) is True
+
+        args = mock_execute_values.call_args[0]
+        assert "ON CONFLICT (username) DO NOTHING" in args[1]
+        assert args[2] == [("@user1",), ("@user2",)]
+    db_manager.connection.commit.assert_called_once()
+
+
+def test_update_user_locations_exception(db_manager):
+    with patch("develop.database_manager.execute_values") as mock_execute_values:
+        mock_execute_values.side_effect = Exception("Database error")
+
+        assert db_manager.update_user_locations([("@user1", 55.0, 37.0)]) is False
+    db_manager.connection.rollback.assert_called_once()
+
+
+def test_update_user_locations_writes_geohash(db_manager):
+    db_manager.cursor.fetchall.return_value = []
+
+    with patch("develop.database_manager.execute_values") as mock_execute_values:
+        assert db_manager.update_user_locations([("@user1", 55.7558, 37.6173)])
+
+    rows = mock_execute_values.call_args.args[2]
+    assert rows == [("@user1", 55.7558, 37.6173, "ucfv0n014")]
+
+
+def test_update_user_locations_shifts_each_known_user(db_manager):
+    db_manager.cursor.fetchall.return_value = [("@user1", 1, 55.0, 37.0)]
+
+    with patch("develop.database_manager.execute_values") as mock_execute_values:
+        assert db_manager.update_user_locations(
+            [("@user1", 56.0, 38.0), ("@new", 55.0, 37.0)]
+        )
+
+    deltas = mock_execute_values.call_args.args[2]
+    assert [delta[0] for delta in deltas] == [1]
+    assert deltas[0][1:4] == pytest.approx(
+        [b - a for a, b in zip(unit_vector(55.0, 37.0), unit_vector(56.0, 38.0))]
+    )
+
+
+def test_get_users_within_prunes_by_prefix_and_refines(db_manager):
+    db_manager.cursor.fetchall.return_value = [
+        ("@near", 55.7560, 37.6175),
+        ("@far", 55.7700, 37.6500),
+    ]
+
+    result = db_manager.get_users_within(55.7558, 37.6173, 1000, group_name="friends")
+
+    query, params = db_manager.cursor.execute.call_args.args
+    assert "JOIN public.groups" in query and "users.geohash LIKE %s" in query
+    assert params[0] == "friends"
+    assert all(param.endswith("%") for param in params[1:])
+    assert [row[0] for row in result] == ["@near"]
+    assert result[0][3] < 50
+
+
+def test_get_nearest_users_expands_radius(db_manager):
+    db_manager.cursor.fetchall.side_effect = [
+        [],
+        [("@user1", 55.7600, 37.6200)],
+        [("@user1", 55.7600, 37.6200), ("@user2", 55.7700, 37.6300)],
+    ]
+
+    result = db_manager.get_nearest_users(55.7558, 37.6173, k=2)
+
+    assert [row[0] for row in result] == ["@user1", "@user2"]
+    assert db_manager.cursor.execute.call_count == 3
@@ -0,0 +1,94 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import httpx
+import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock
+from develop.geocoder import Geocoder
+from develop.async_database_manager import AsyncDatabaseManager
+from develop.rate_limiter import TokenBucket
+
+
+def unlimited():
+    return TokenBucket(rate=1000, capacity=1000)
+
+
+@pytest.mark.asyncio
+async def test_get_coordinates_from_api_is_persisted():
+    api_client = Mock()
+    api_client.geocode = AsyncMock(return_value=[{"lat": "55.7558", "lon": "37.6173"}])
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_cached_coordinates.return_value = None
+    geocoder = Geocoder(api_client, db_manager, rate_limiter=unlimited())
+
+    result = await geocoder.get_coordinates("Москва")
+    again = await geocoder.get_coordinates("Москва")
+
+    assert result == again == (55.7558, 37.6173)
+    api_client.geocode.assert_called_once()
+    db_manager.get_cached_coordinates.assert_called_once()
+    db_manager.save_cached_coordinates.assert_called_once_with(
+        "Москва", 55.7558, 37.6173
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_coordinates_from_db():
+    api_client = Mock()
+    api_client.geocode = AsyncMock()
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_cached_coordinates.return_value = (
+        Decimal("55.7558"),
+        Decimal("37.6173"),
+    )
+    geocoder = Geocoder(api_client, db_manager, rate_limiter=unlimited())
+
+    result = await geocoder.get_coordinates("Москва")
+
+    assert result == (55.7558, 37.6173)
+    api_client.geocode.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_miss_is_cached_with_short_ttl():
+    api_client = Mock()
+    api_client.geocode = AsyncMock(return_value=[])
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_cached_coordinates.return_value = None
+    geocoder = Geocoder(api_client, db_manager, miss_ttl=60, rate_limiter=unlimited())
+    geocoder.memory_cache = Mock(wraps=geocoder.memory_cache)
+
+    result = await geocoder.get_coordinates("Нигде")
+    again = await geocoder.get_coordinates("Нигде")
+
+    assert result is None and again is None
+    api_client.geocode.assert_called_once()
+    db_manager.save_cached_coordinates.assert_called_once_with("Нигде", None, None)
+    geocoder.memory_cache.set.assert_called_once_with("Нигде", None, ttl=60)
+
+
+@pytest.mark.asyncio
+async def test_http_error_is_not_cached():
+    api_client = Mock()
+    api_client.geocode = AsyncMock(side_effect=httpx.ConnectError("down"))
+    geocoder = Geocoder(api_client, rate_limiter=unlimited())
+
+    assert await geocoder.get_coordinates("Москва") is None
+    assert await geocoder.get_coordinates("Москва") is None
+    assert api_client.geocode.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_lookup_that_cannot_start_in_time_is_skipped():
+    api_client = Mock()
+    api_client.geocode = AsyncMock(return_value=[{"lat": "55.7558", "lon": "37.6173"}])
+    rate_limiter = TokenBucket(rate=0.01, capacity=1)
+    rate_limiter.try_acquire()
+    geocoder = Geocoder(api_client, rate_limiter=rate_limiter, max_wait=1.0)
+
+    assert await geocoder.get_coordinates("Москва") is None
+    api_client.geocode.assert_not_called()
+    assert "Москва" not in geocoder.memory_cache
@@ -0,0 +1,72 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from develop.group import Group
+from develop.async_database_manager import AsyncDatabaseManager
+from telegram import Update, Message, User, Chat
+from telegram.ext import CallbackContext
+
+
+def make_update(text):
+    user = User(id=1, username="testuser", first_name="Test", is_bot=False)
+    chat = Chat(id=12345, type="group")
+    message = Message(message_id=1, from_user=user, chat=chat, date=None, text=text)
+    return Update(update_id=1, message=message)
+
+
+@pytest.mark.asyncio
+async def test_add_to_named_group():
+    update = make_update("/add_to_group friends")
+    context = Mock(spec=CallbackContext)
+    context.args = ["friends"]
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.add_user_to_group.return_value = True
+    group = Group(db_manager)
+
+    with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
+        await group.add_to_group(update, context)
+
+        db_manager.add_user.assert_called_once_with("@testuser")
+        db_manager.add_user_to_group.assert_called_once_with("@testuser", "friends")
+        mock_reply.assert_called_once_with("Вы добавлены в группу «friends».")
+
+
+@pytest.mark.asyncio
+async def test_remove_from_chat_group():
+    update = make_update("/remove_from_group")
+    context = Mock(spec=CallbackContext)
+    context.args = []
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.remove_user_from_group.return_value = False
+    group = Group(db_manager)
+
+    with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
+        await group.remove_from_group(update, context)
+
+        db_manager.remove_user_from_group.assert_called_once_with(
+            "@testuser", "chat:12345"
+        )
+        mock_reply.assert_called_once_with("Вы не состоите в группе этого чата.")
+
+
+@pytest.mark.asyncio
+async def test_show_group_info_lists_only_group_members():
+    update = make_update("/show_group_info")
+    context = Mock(spec=CallbackContext)
+    context.args = []
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_group_members.return_value = [(1, "@user1"), (2, "@user2")]
+    group = Group(db_manager)
+
+    with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
+        await group.show_group_info(update, context)
+
+        db_manager.get_group_members.assert_called_once_with("chat:12345")
+        db_manager.get_all_users.assert_not_called()
+        mock_reply.assert_called_once_with(
+            "Информация о группе этого чата:\n@user1\n@user2\n"
+        )
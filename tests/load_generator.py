@@ -0,0 +1,540 @@
+"""Нагрузочное тестирование бота.
+
+Генерирует поток синтетических апдейтов Telegram (start, геолокация,
+поиск, групповой поиск, нажатия inline-кнопок) и прогоняет их через
+настоящие обработчики Controller. 2GIS, Nominatim и Bot API заменены
+локальными заглушками с настраиваемой задержкой, Postgres - хранилищем
+в памяти (или настоящей БД из config.ini с флагом --postgres).
+
+Это инструмент для разработки, а не часть бота, поэтому он лежит рядом
+с тестами. Пример:
+    python tests/load_generator.py --users 200 --rate 100 --duration 30
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import argparse
+import asyncio
+import configparser
+import json
+import random
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest
+from api_client import ApiClient
+from controller import Controller, read_config
+from geo import haversine
+from rate_limiter import TokenBucket
+from tracing import PROFILER, TRACER, FileExporter
+from update_processor import PerUserUpdateProcessor
+
+# Несколько «центров города», вокруг которых находится большинство пользователей.
+HOTSPOTS = [(55.7558, 37.6173), (55.7602, 37.6185), (55.7415, 37.6208)]
+
+# Сценарий пользователя после регистрации: команда и её вес.
+COMMAND_WEIGHTS = {
+    "search": 35,
+    "location": 25,
+    "button:search": 15,
+    "search_for_group": 10,
+    "search_nearby": 10,
+    "button:current_location": 5,
+}
+
+
+class InMemoryDatabase:
+    """Хранилище в памяти с интерфейсом AsyncDatabaseManager."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.users = {}
+        self.groups = defaultdict(set)
+        self.geocode_cache = {}
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def add_user(self, username):
+        await self._round_trip()
+        self.users.setdefault(username, [len(self.users) + 1, None, None])
+
+    async def add_users(self, usernames):
+        for username in usernames:
+            await self.add_user(username)
+        return True
+
+    async def update_user_location(self, username, latitude, longitude):
+        await self._round_trip()
+        user = self.users.setdefault(username, [len(self.users) + 1, None, None])
+        user[1], user[2] = latitude, longitude
+
+    async def update_user_locations(self, locations):
+        for username, latitude, longitude in locations:
+            await self.update_user_location(username, latitude, longitude)
+        return True
+
+    async def get_user_location(self, username):
+        await self._round_trip()
+        user = self.users.get(username)
+        return (user[1], user[2]) if user else None
+
+    async def get_all_users(self):
+        await self._round_trip()
+        return [(user[0], username) for username, user in self.users.items()]
+
+    async def add_user_to_group(self, username, group_name):
+        await self._round_trip()
+        if username not in self.users or username in self.groups[group_name]:
+            return False
+        self.groups[group_name].add(username)
+        return True
+
+    async def remove_user_from_group(self, username, group_name):
+        await self._round_trip()
+        if username not in self.groups[group_name]:
+            return False
+        self.groups[group_name].discard(username)
+        return True
+
+    async def get_group_members(self, group_name):
+        await self._round_trip()
+        return sorted(
+            (self.users[username][0], username) for username in self.groups[group_name]
+        )
+
+    async def get_group_locations(self, group_name):
+        await self._round_trip()
+        return [
+            (self.users[username][1], self.users[username][2])
+            for username in self.groups[group_name]
+            if self.users[username][1] is not None
+        ]
+
+    async def get_group_center(self, group_name):
+        locations = await self.get_group_locations(group_name)
+        if not locations:
+            return None, None, 0
+        latitudes, longitudes = zip(*locations)
+        return (
+            sum(latitudes) / len(latitudes),
+            sum(longitudes) / len(longitudes),
+            len(locations),
+        )
+
+    async def get_users_within(self, latitude, longitude, radius, group_name=None):
+        await self._round_trip()
+        usernames = self.groups[group_name] if group_name is not None else self.users
+        found = []
+        for username in usernames:
+            _, user_latitude, user_longitude = self.users[username]
+            if user_latitude is None:
+                continue
+            distance = haversine(latitude, longitude, user_latitude, user_longitude)
+            if distance <= radius:
+                found.append((username, user_latitude, user_longitude, distance))
+        return sorted(found, key=lambda row: row[3])
+
+    async def get_nearest_users(
+        self, latitude, longitude, k, max_radius=50000, group_name=None
+    ):
+        found = await self.get_users_within(latitude, longitude, max_radius, group_name)
+        return found[:k]
+
+    async def get_cached_coordinates(self, address, ttl, miss_ttl):
+        await self._round_trip()
+        return self.geocode_cache.get(address)
+
+    async def save_cached_coordinates(self, address, latitude, longitude):
+        await self._round_trip()
+        self.geocode_cache[address] = (latitude, longitude)
+
+    async def ping(self):
+        await self._round_trip()
+        return True
+
+    async def close(self):
+        pass
+
+
+class FakeUpstream:
+    """Заглушки 2GIS и Nominatim для httpx.MockTransport."""
+
+    def __init__(self, catalog_latency=0.15, geocode_latency=0.3, missing_ratio=0.2):
+        self.catalog_latency = catalog_latency
+        self.geocode_latency = geocode_latency
+        self.missing_ratio = missing_ratio
+        self.calls = defaultdict(int)
+
+    async def __call__(self, request):
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        if request.url.host == "nominatim.openstreetmap.org":
+            self.calls["geocode"] += 1
+            await asyncio.sleep(self.geocode_latency)
+            seed = sum(map(ord, request.url.params["q"]))
+            latitude, longitude = HOTSPOTS[seed % len(HOTSPOTS)]
+            return httpx.Response(
+                200, json=[{"lat": str(latitude), "lon": str(longitude)}]
+            )
+
+        self.calls["catalog"] += 1
+        await asyncio.sleep(self.catalog_latency)
+        longitude, latitude = map(float, request.url.params["point"].split(","))
+        page_size = int(request.url.params.get("page_size", 5))
+        base = f"{latitude:.2f},{longitude:.2f}"
+        items = []
+        for index in range(page_size):
+            item = {
+                "id": f"{base}:{index}",
+                "name": f"Бар {base} #{index}",
+                "address_name": f"Улица {base}, {index}",
+            }
+            if index >= page_size * self.missing_ratio:
+                item["geometry"] = {
+                    "location": {
+                        "lat": latitude + 0.001 * index,
+                        "lon": longitude + 0.001 * index,
+                    }
+                }
+            items.append(item)
+        return httpx.Response(200, json={"result": {"items": items}})
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Отвечает на вызовы Bot API без обращения к сети."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = defaultdict(int)
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if endpoint == "getMe":
+            result = {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "LoadTestBot",
+                "username": "load_test_bot",
+            }
+        elif endpoint == "sendMessage":
+            parameters = request_data.parameters if request_data else {}
+            self._message_id += 1
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": parameters.get("chat_id", 0), "type": "private"},
+                "text": parameters.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class LoadGenerator:
+    """Открытая модель нагрузки: апдейты приходят пуассоновским потоком
+    с интенсивностью rate в секунду от users виртуальных пользователей."""
+
+    def __init__(self, application, users=100, rate=50.0, groups=10, seed=0):
+        self.application = application
+        self.users = users
+        self.rate = rate
+        self.groups = groups
+        self.random = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._sessions = {}
+        self._update_id = 0
+        self._commands_by_update = {}
+        application.add_error_handler(self._on_error)
+
+    async def _on_error(self, update, context):
+        if isinstance(update, Update):
+            command = self._commands_by_update.get(update.update_id, "unknown")
+            self.errors[command] += 1
+
+    def _user_json(self, user_id):
+        return {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": f"User{user_id}",
+            "username": f"load_user{user_id}",
+        }
+
+    def _message_json(self, user_id, **fields):
+        self._update_id += 1
+        return {
+            "message_id": self._update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user_json(user_id),
+            **fields,
+        }
+
+    def _command(self, user_id, command, args=""):
+        text = f"/{command} {args}".strip()
+        return {
+            "message": self._message_json(
+                user_id,
+                text=text,
+                entities=[
+                    {"type": "bot_command", "offset": 0, "length": len(command) + 1}
+                ],
+            )
+        }
+
+    def _location(self, user_id):
+        hotspot = HOTSPOTS[user_id % len(HOTSPOTS)]
+        return {
+            "message": self._message_json(
+                user_id,
+                location={
+                    "latitude": hotspot[0] + self.random.gauss(0, 0.005),
+                    "longitude": hotspot[1] + self.random.gauss(0, 0.005),
+                },
+            )
+        }
+
+    def _button(self, user_id, data):
+        return {
+            "callback_query": {
+                "id": str(self._update_id),
+                "from": self._user_json(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": self._message_json(user_id, text="Меню"),
+            }
+        }
+
+    def next_update(self):
+        user_id = self.random.randint(1, self.users)
+        step = self._sessions.get(user_id, 0)
+        self._sessions[user_id] = step + 1
+        group_name = f"load{user_id % self.groups}"
+
+        if step == 0:
+            command, payload = "start", self._command(user_id, "start")
+        elif step == 1:
+            command = "add_to_group"
+            payload = self._command(user_id, "add_to_group", group_name)
+        elif step == 2:
+            command, payload = "location", self._location(user_id)
+        else:
+            command = self.random.choices(
+                list(COMMAND_WEIGHTS), weights=list(COMMAND_WEIGHTS.values())
+            )[0]
+            if command == "location":
+                payload = self._location(user_id)
+            elif command.startswith("button:"):
+                payload = self._button(user_id, command.split(":", 1)[1])
+            elif command == "search_for_group":
+                payload = self._command(user_id, command, group_name)
+            else:
+                payload = self._command(user_id, command)
+
+        payload["update_id"] = self._update_id
+        update = Update.de_json(payload, self.application.bot)
+        self._commands_by_update[update.update_id] = command
+        return command, update
+
+    async def _dispatch(self, command, update):
+        started = time.perf_counter()
+        await self.application.update_processor.process_update(
+            update, self.application.process_update(update)
+        )
+        self.latencies[command].append(time.perf_counter() - started)
+
+    async def run(self, duration):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        next_arrival = started
+        tasks = []
+        while True:
+            next_arrival += self.random.expovariate(self.rate)
+            if next_arrival - started > duration:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - loop.time()))
+            command, update = self.next_update()
+            tasks.append(asyncio.ensure_future(self._dispatch(command, update)))
+        await asyncio.gather(*tasks)
+        return loop.time() - started
+
+    def report(self, elapsed):
+        rows = []
+        for command, latencies in sorted(self.latencies.items()):
+            p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+            rows.append(
+                {
+                    "command": command,
+                    "count": len(latencies),
+                    "errors": self.errors.get(command, 0),
+                    "throughput": len(latencies) / elapsed,
+                    "p50_ms": p50,
+                    "p95_ms": p95,
+                    "p99_ms": p99,
+                }
+            )
+        return rows
+
+
+def format_report(rows, elapsed):
+    lines = [
+        f"{'command':<26}{'count':>8}{'errors':>8}{'rps':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['command']:<26}{row['count']:>8}{row['errors']:>8}"
+            f"{row['throughput']:>9.1f}{row['p50_ms']:>10.1f}"
+            f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+        )
+    total = sum(row["count"] for row in rows)
+    lines.append(
+        f"Всего: {total} апдейтов за {elapsed:.1f} с ({total / elapsed:.1f}/с)"
+    )
+    return "\n".join(lines)
+
+
+def default_config():
+    config = configparser.ConfigParser()
+    config.read_dict({"api": {"yandex_api_key": "load-test"}})
+    return config
+
+
+async def run_load_test(
+    users=100,
+    rate=50.0,
+    duration=10.0,
+    groups=10,
+    config=None,
+    use_postgres=False,
+    db_latency=0.002,
+    catalog_latency=0.15,
+    geocode_latency=0.3,
+    geocode_rate=1.0,
+    telegram_latency=0.05,
+    max_workers=32,
+    seed=0,
+    trace_path=None,
+    profile_every=0,
+    profile_path="profile.folded",
+):
+    config = config or default_config()
+    if trace_path:
+        TRACER.configure(FileExporter(trace_path))
+    upstream = FakeUpstream(catalog_latency, geocode_latency)
+    telegram = FakeTelegramRequest(telegram_latency)
+    application = (
+        Application.builder()
+        .token("123456:LOAD-TEST")
+        .request(telegram)
+        .get_updates_request(FakeTelegramRequest())
+        .updater(None)
+        .concurrent_updates(PerUserUpdateProcessor(max_workers=max_workers))
+        .build()
+    )
+    controller = Controller(
+        application,
+        config=config,
+        db_backend=None if use_postgres else InMemoryDatabase(db_latency),
+        api_client=ApiClient(transport=httpx.MockTransport(upstream)),
+    )
+    controller.search.geocoder.rate_limiter = TokenBucket(rate=geocode_rate)
+    generator = LoadGenerator(application, users, rate, groups, seed)
+
+    await application.initialize()
+    await controller.post_init(application)
+    if profile_every:
+        PROFILER.start(profile_every)
+    try:
+        elapsed = await generator.run(duration)
+    finally:
+        if profile_every:
+            PROFILER.stop()
+            PROFILER.dump(profile_path)
+        await controller.shutdown(application)
+        await application.shutdown()
+        TRACER.configure(None)
+
+    return {
+        "elapsed": elapsed,
+        "commands": generator.report(elapsed),
+        "upstream_calls": dict(upstream.calls),
+        "telegram_calls": dict(telegram.calls),
+        "admission": controller.admission.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование бота")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=50.0, help="апдейтов в секунду")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--config", help="config.ini с настройками бота")
+    parser.add_argument("--postgres", action="store_true", help="использовать Postgres")
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    parser.add_argument("--catalog-latency", type=float, default=0.15)
+    parser.add_argument("--geocode-latency", type=float, default=0.3)
+    parser.add_argument("--geocode-rate", type=float, default=1.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--max-workers", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", help="файл для спанов в формате OTLP JSON")
+    parser.add_argument(
+        "--profile-every", type=int, default=0, help="профилировать каждый N-й апдейт"
+    )
+    parser.add_argument("--profile-output", default="profile.folded")
+    args = parser.parse_args()
+
+    result = asyncio.run(
+        run_load_test(
+            users=args.users,
+            rate=args.rate,
+            duration=args.duration,
+            groups=args.groups,
+            config=read_config(args.config) if args.config else None,
+            use_postgres=args.postgres,
+            db_latency=args.db_latency,
+            catalog_latency=args.catalog_latency,
+            geocode_latency=args.geocode_latency,
+            geocode_rate=args.geocode_rate,
+            telegram_latency=args.telegram_latency,
+            max_workers=args.max_workers,
+            seed=args.seed,
+            trace_path=args.trace,
+            profile_every=args.profile_every,
+            profile_path=args.profile_output,
+        )
+    )
+    print(format_report(result["commands"], result["elapsed"]))
+    print(f"Вызовы внешних API: {result['upstream_calls']}")
+    print(f"Вызовы Bot API: {result['telegram_calls']}")
+    print(f"Контроль допуска: {result['admission']}")
+
+
+if __name__ == "__main__":
+    main()
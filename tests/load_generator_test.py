@@ -0,0 +1,41 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import pytest
+from load_generator import InMemoryDatabase, format_report, run_load_test
+
+
+@pytest.mark.asyncio
+async def test_load_test_drives_real_handlers():
+    result = await run_load_test(
+        users=10,
+        rate=200,
+        duration=0.3,
+        groups=2,
+        db_latency=0,
+        catalog_latency=0,
+        geocode_latency=0,
+        geocode_rate=1000,
+        telegram_latency=0,
+    )
+
+    commands = {row["command"]: row for row in result["commands"]}
+    assert commands["start"]["count"] > 0
+    assert all(row["errors"] == 0 for row in result["commands"])
+    assert all(row["p50_ms"] <= row["p99_ms"] for row in result["commands"])
+    assert result["telegram_calls"]["sendMessage"] > 0
+    assert "Всего:" in format_report(result["commands"], result["elapsed"])
+
+
+@pytest.mark.asyncio
+async def test_in_memory_database_groups():
+    database = InMemoryDatabase()
+    await database.add_user("@user1")
+    await database.update_user_location("@user1", 55.0, 37.0)
+
+    assert await database.add_user_to_group("@user1", "friends") is True
+    assert await database.add_user_to_group("@user1", "friends") is False
+    assert await database.get_group_locations("friends") == [(55.0, 37.0)]
+    assert await database.get_group_center("friends") == (55.0, 37.0, 1)
@@ -0,0 +1,96 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import pytest
+from unittest.mock import Mock
+from develop.async_database_manager import AsyncDatabaseManager
+from develop.location_cache import CachedDatabaseManager
+
+
+@pytest.fixture
+def inner():
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_user_location.return_value = (55.7558, 37.6173)
+    return db_manager
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_hit_cache(inner):
+    db_manager = CachedDatabaseManager(inner)
+
+    first = await db_manager.get_user_location("@user1")
+    second = await db_manager.get_user_location("@user1")
+
+    assert first == second == (55.7558, 37.6173)
+    inner.get_user_location.assert_called_once_with("@user1")
+    assert db_manager.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+@pytest.mark.asyncio
+async def test_update_refreshes_entry_in_place(inner):
+    db_manager = CachedDatabaseManager(inner)
+    await db_manager.get_user_location("@user1")
+
+    await db_manager.update_user_location("@user1", 59.9343, 30.3351)
+
+    assert await db_manager.get_user_location("@user1") == (59.9343, 30.3351)
+    inner.update_user_location.assert_called_once_with("@user1", 59.9343, 30.3351)
+    inner.get_user_location.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_none_is_not_cached(inner):
+    # None означает и ошибку БД, поэтому каждый раз спрашиваем заново.
+    inner.get_user_location.return_value = None
+    db_manager = CachedDatabaseManager(inner)
+
+    assert await db_manager.get_user_location("@user1") is None
+    assert await db_manager.get_user_location("@user1") is None
+    assert inner.get_user_location.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_read_racing_with_update_does_not_overwrite_it(inner):
+    release = asyncio.Event()
+
+    async def slow_read(username):
+        await release.wait()
+        return (1.0, 1.0)
+
+    inner.get_user_location.side_effect = slow_read
+    db_manager = CachedDatabaseManager(inner)
+
+    read = asyncio.ensure_future(db_manager.get_user_location("@user1"))
+    await asyncio.sleep(0)
+    await db_manager.update_user_location("@user1", 55.0, 37.0)
+    release.set()
+
+    assert await read == (1.0, 1.0)
+    assert await db_manager.get_user_location("@user1") == (55.0, 37.0)
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_reads_database(inner):
+    db_manager = CachedDatabaseManager(inner, enabled=False)
+
+    await db_manager.get_user_location("@user1")
+    await db_manager.update_user_location("@user1", 59.9343, 30.3351)
+    await db_manager.get_user_location("@user1")
+
+    assert inner.get_user_location.call_count == 2
+    assert len(db_manager.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_size_is_bounded_and_other_methods_delegate(inner):
+    inner.get_group_members.return_value = [(1, "@user1")]
+    db_manager = CachedDatabaseManager(inner, max_entries=2)
+
+    for username in ("@user1", "@user2", "@user3"):
+        await db_manager.get_user_location(username)
+
+    assert len(db_manager.cache) == 2
+    assert await db_manager.get_group_members("friends") == [(1, "@user1")]
@@ -6,7 +6,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../deve
 import pytest
 from unittest.mock import AsyncMock, Mock, patch
 from develop.location_manager import LocationManager
-from develop.database_manager import DatabaseManager
+from develop.async_database_manager import AsyncDatabaseManager
 from telegram import Update, Message, User, Location, Chat, CallbackQuery
 from telegram.ext import CallbackContext
 
@@ -21,7 +21,7 @@ async def test_update_location_command():
     update = Update(update_id=1, message=message)
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock(spec=DatabaseManager)
+    db_manager = Mock(spec=AsyncDatabaseManager)
     location_manager = LocationManager(db_manager=db_manager)
 
     message.reply_text = AsyncMock()
@@ -43,7 +43,7 @@ async def test_update_location_command():
     update = Update(update_id=1, message=message)
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock(spec=DatabaseManager)
+    db_manager = Mock(spec=AsyncDatabaseManager)
     location_manager = LocationManager(db_manager=db_manager)
 
     with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
@@ -65,10 +65,10 @@ async def test_update_location_success():
     update = Update(update_id=1, message=message)
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock(spec=DatabaseManager)
+    db_manager = Mock(spec=AsyncDatabaseManager)
     location_manager = LocationManager(db_manager=db_manager)
 
-    db_manager.update_user_location = Mock()
+    db_manager.update_user_location = AsyncMock()
 
     with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
         await location_manager.update_location(update, context)
@@ -79,6 +79,27 @@ async def test_update_location_success():
         mock_reply.assert_called_once_with("Геолокация обновлена: 55.7558, 37.6173")
 
 
+@pytest.mark.asyncio
+async def test_update_location_notifies_listener():
+    user = User(id=1, username="testuser", first_name="Test", is_bot=False)
+    chat = Chat(id=12345, type="private")
+    location = Location(latitude=55.7558, longitude=37.6173)
+    message = Message(
+        message_id=1, from_user=user, chat=chat, date=None, text=None, location=location
+    )
+    update = Update(update_id=1, message=message)
+
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.update_user_location = AsyncMock()
+    on_location = Mock()
+    location_manager = LocationManager(db_manager=db_manager, on_location=on_location)
+
+    with patch.object(Message, "reply_text", new=AsyncMock()):
+        await location_manager.update_location(update, Mock(spec=CallbackContext))
+
+    on_location.assert_called_once_with(55.7558, 37.6173)
+
+
 @pytest.mark.asyncio
 async def test_update_location_no_location():
     user = User(id=1, username="testuser", first_name="Test", is_bot=False)
@@ -89,7 +110,7 @@ async def test_update_location_no_location():
     update = Update(update_id=1, message=message)
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock(spec=DatabaseManager)
+    db_manager = Mock(spec=AsyncDatabaseManager)
     location_manager = LocationManager(db_manager=db_manager)
 
     with patch.object(Message, "reply_text", new=AsyncMock()) as mock_reply:
@@ -110,8 +131,8 @@ async def test_show_current_location_success():
     update = Update(update_id=1, message=message)
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock(spec=DatabaseManager)
-    db_manager.get_user_location = Mock(return_value=(55.7558, 37.6173))
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_user_location = AsyncMock(return_value=(55.7558, 37.6173))
 
     location_manager = LocationManager(db_manager=db_manager)
 
@@ -132,8 +153,8 @@ async def test_show_current_location_no_data():
     update = Update(update_id=1, message=message)
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock(spec=DatabaseManager)
-    db_manager.get_user_location = Mock(return_value=None)
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_user_location = AsyncMock(return_value=None)
 
     location_manager = LocationManager(db_manager=db_manager)
 
@@ -0,0 +1,78 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import pytest
+from develop.geo import haversine
+from develop.meeting_point import (
+    distance_matrix,
+    geometric_median,
+    meeting_point,
+    minimax_point,
+    rank_venues,
+    spherical_centroid,
+    to_points,
+)
+
+
+def test_spherical_centroid_across_antimeridian():
+    points = to_points([(10.0, 179.0), (10.0, -179.0)])
+
+    latitude, longitude = spherical_centroid(points)
+
+    assert latitude == pytest.approx(10.0, abs=0.01)
+    assert abs(longitude) == pytest.approx(180.0, abs=1e-6)
+
+
+def test_geometric_median_resists_outlier():
+    points = to_points(
+        [(55.75, 37.61), (55.751, 37.611), (55.752, 37.612), (59.93, 30.33)]
+    )
+
+    latitude, longitude = geometric_median(points)
+    centroid_latitude, _ = spherical_centroid(points)
+
+    assert latitude == pytest.approx(55.751, abs=0.002)
+    assert centroid_latitude > 56
+
+
+def test_minimax_point_minimises_farthest_member():
+    points = to_points([(55.70, 37.60), (55.80, 37.60), (55.75, 37.62)])
+
+    latitude, longitude = minimax_point(points)
+    farthest = max(haversine(latitude, longitude, *point) for point in points)
+
+    assert latitude == pytest.approx(55.75, abs=1e-3)
+    assert longitude == pytest.approx(37.60, abs=1e-3)
+    assert farthest == pytest.approx(
+        haversine(55.70, 37.60, 55.80, 37.60) / 2, rel=0.01
+    )
+
+
+def test_meeting_point_strategies_agree_for_single_member():
+    points = to_points([(55.7558, 37.6173)])
+
+    for strategy in ("centroid", "median", "minimax"):
+        assert meeting_point(points, strategy) == pytest.approx((55.7558, 37.6173))
+
+
+def test_distance_matrix_matches_haversine():
+    members = to_points([(55.7558, 37.6173), (59.9343, 30.3351)])
+    venues = to_points([(55.75, 37.62), (55.8, 37.5), (59.9, 30.3)])
+
+    distances = distance_matrix(members, venues)
+
+    assert distances.shape == (2, 3)
+    assert distances[1, 2] == pytest.approx(haversine(59.9343, 30.3351, 59.9, 30.3))
+
+
+def test_rank_venues_by_max_distance_for_minimax():
+    members = to_points([(55.70, 37.60), (55.80, 37.60)])
+    venues = to_points([(55.70, 37.60), (55.75, 37.60)])
+
+    order, max_distances, mean_distances = rank_venues(members, venues, "minimax")
+
+    assert order.tolist() == [1, 0]
+    assert max_distances[1] < max_distances[0]
+    assert mean_distances[0] == pytest.approx(mean_distances[1], rel=1e-3)
@@ -0,0 +1,89 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import httpx
+import pytest
+from unittest.mock import patch
+from prometheus_client import REGISTRY, generate_latest
+from develop.api_client import ApiClient
+from develop.async_database_manager import AsyncDatabaseManager
+
+# Модули проекта импортируют metrics как верхнеуровневый модуль, поэтому
+# и здесь берём его так же, иначе метрики зарегистрируются дважды.
+from metrics import STATS, instrument
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_instrument_records_latency_and_errors():
+    async def ok(update, context):
+        return "done"
+
+    async def broken(update, context):
+        raise RuntimeError("boom")
+
+    before = sample("bot_handler_duration_seconds_count", handler="test_ok")
+    assert await instrument("test_ok", ok)(None, None) == "done"
+    assert sample("bot_handler_duration_seconds_count", handler="test_ok") == (
+        before + 1
+    )
+
+    errors = sample("bot_handler_errors_total", handler="test_broken")
+    with pytest.raises(RuntimeError):
+        await instrument("test_broken", broken)(None, None)
+    assert sample("bot_handler_errors_total", handler="test_broken") == errors + 1
+
+
+@pytest.mark.asyncio
+async def test_api_client_counts_statuses():
+    def handler(request):
+        if request.url.host == "nominatim.openstreetmap.org":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"result": {"items": []}})
+
+    api_client = ApiClient(transport=httpx.MockTransport(handler))
+    ok = sample("bot_upstream_responses_total", service="catalog", status="200")
+    failed = sample("bot_upstream_responses_total", service="nominatim", status="503")
+
+    await api_client.search_items({"q": "бар"})
+    with pytest.raises(httpx.HTTPStatusError):
+        await api_client.geocode({"q": "Москва"})
+    await api_client.close()
+
+    assert sample("bot_upstream_responses_total", service="catalog", status="200") == (
+        ok + 1
+    )
+    assert sample(
+        "bot_upstream_responses_total", service="nominatim", status="503"
+    ) == (failed + 1)
+    assert sample("bot_upstream_request_duration_seconds_count", service="catalog")
+
+
+@pytest.mark.asyncio
+async def test_database_call_records_errors_and_in_flight():
+    db_manager = AsyncDatabaseManager(db_name="testdb", user="user", password="pass")
+    errors = sample("bot_db_errors_total", method="get_all_users")
+    calls = sample("bot_db_query_duration_seconds_count", method="get_all_users")
+
+    with patch.object(db_manager, "_call_sync", side_effect=RuntimeError("down")):
+        assert await db_manager.get_all_users() == []
+
+    assert sample("bot_db_errors_total", method="get_all_users") == errors + 1
+    assert sample("bot_db_query_duration_seconds_count", method="get_all_users") == (
+        calls + 1
+    )
+    assert sample("bot_db_in_flight", method="get_all_users") == 0
+
+
+def test_stats_collector_exports_component_stats():
+    STATS.register("test_component", lambda: {"hits": 3, "size": 7})
+
+    output = generate_latest(REGISTRY).decode()
+
+    assert 'bot_test_component{stat="hits"} 3.0' in output
+    assert 'bot_test_component{stat="size"} 7.0' in output
@@ -1,6 +1,17 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import httpx
 import pytest
 from unittest.mock import AsyncMock, Mock, patch
 from develop.search import Search
+from develop.async_database_manager import AsyncDatabaseManager
+from develop.rate_limiter import TokenBucket
+from develop.meeting_point import to_points
+from develop.venue import Venue
 from telegram import Update, Message, User, Chat, Bot
 from telegram.ext import CallbackContext
 
@@ -21,18 +32,16 @@ async def test_search_success():
 
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock()
+    db_manager = Mock(spec=AsyncDatabaseManager)
     db_manager.get_user_location.return_value = (55.7558, 37.6173)
 
     search = Search(api_key="testkey", db_manager=db_manager)
-    search.find_nearest_bars_and_clubs = Mock(
-        return_value="Ближайшие бары и клубы найдены"
-    )
+    search.find_page = AsyncMock(return_value=("Ближайшие бары и клубы найдены", False))
 
     await search.search(update, context)
 
-    search.find_nearest_bars_and_clubs.assert_called_with(55.7558, 37.6173)
-    assert search.find_nearest_bars_and_clubs.called
+    search.find_page.assert_called_with(55.7558, 37.6173, 1, members=None, head=None)
+    assert search.find_page.called
 
 
 @pytest.mark.asyncio
@@ -51,7 +60,7 @@ async def test_search_no_location():
 
     context = Mock(spec=CallbackContext)
 
-    db_manager = Mock()
+    db_manager = Mock(spec=AsyncDatabaseManager)
     db_manager.get_user_location.return_value = None
 
     search = Search(api_key="testkey", db_manager=db_manager)
@@ -66,20 +75,44 @@ async def test_search_for_group_success():
     update = Update(update_id=1, message=AsyncMock())
 
     context = Mock(spec=CallbackContext)
+    context.args = ["friends"]
 
-    db_manager = Mock()
-    db_manager.get_all_users.return_value = [(1, "@user1"), (2, "@user2")]
-    db_manager.get_user_location.side_effect = [(55.7558, 37.6173), (55.75, 37.62)]
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_group_locations.return_value = [(55.7558, 37.6173), (55.75, 37.62)]
 
     search = Search(api_key="testkey", db_manager=db_manager)
-    search.find_nearest_bars_and_clubs = Mock(
-        return_value="Групповой поиск выполнен успешно"
+    search.find_page = AsyncMock(
+        return_value=("Групповой поиск выполнен успешно", False)
     )
 
     await search.search_for_group(update, context)
 
-    search.find_nearest_bars_and_clubs.assert_called_with(55.7529, 37.61865)
-    assert search.find_nearest_bars_and_clubs.called
+    args, kwargs = search.find_page.call_args
+    assert args[:2] == pytest.approx((55.7529, 37.61865), abs=1e-4)
+    assert kwargs["members"].tolist() == [[55.7558, 37.6173], [55.75, 37.62]]
+    db_manager.get_group_locations.assert_called_once_with("friends")
+    db_manager.get_user_location.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_search_for_group_reads_aggregate_when_enabled():
+    update = Update(update_id=1, message=AsyncMock())
+
+    context = Mock(spec=CallbackContext)
+    context.args = ["friends"]
+
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_group_center.return_value = (55.7529, 37.61865, 2)
+
+    search = Search(api_key="testkey", db_manager=db_manager, center_in_db=True)
+    search.find_page = AsyncMock(
+        return_value=("Групповой поиск выполнен успешно", False)
+    )
+
+    await search.search_for_group(update, context)
+
+    search.find_page.assert_called_with(55.7529, 37.61865, 1, members=None, head=None)
+    db_manager.get_group_locations.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -87,21 +120,25 @@ async def test_search_for_group_no_users():
     update = Update(update_id=1, message=AsyncMock())
 
     context = Mock(spec=CallbackContext)
+    context.args = ["friends"]
 
-    db_manager = Mock()
-    db_manager.get_all_users.return_value = []
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.get_group_locations.return_value = []
 
     search = Search(api_key="testkey", db_manager=db_manager)
+    search.find_page = AsyncMock()
 
     await search.search_for_group(update, context)
 
-    db_manager.get_all_users.assert_called_once()
+    db_manager.get_group_locations.assert_called_once()
+    search.find_page.assert_not_called()
 
 
-def test_find_nearest_bars_and_clubs_success():
+@pytest.mark.asyncio
+async def test_find_nearest_bars_and_clubs_success():
     search = Search(api_key="testkey", db_manager=None)
-    with patch("requests.get") as mock_get:
-        mock_get.return_value.json.return_value = {
+    search.api_client.search_items = AsyncMock(
+        return_value={
             "result": {
                 "items": [
                     {
@@ -112,50 +149,407 @@ def test_find_nearest_bars_and_clubs_success():
                 ]
             }
         }
-        mock_get.return_value.raise_for_status = Mock()
+    )
 
-        result = search.find_nearest_bars_and_clubs(55.7558, 37.6173)
-        assert "Бар" in result
+    result = await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+    assert "Бар" in result
 
 
-def test_find_nearest_bars_and_clubs_error():
+@pytest.mark.asyncio
+async def test_find_nearest_bars_and_clubs_http_error():
     search = Search(api_key="testkey", db_manager=None)
-    with patch("requests.get") as mock_get:
-        mock_get.side_effect = Exception("Ошибка сети")
+    search.api_client.search_items = AsyncMock(
+        side_effect=httpx.ConnectTimeout("timeout")
+    )
 
-        with pytest.raises(Exception) as excinfo:
-            search.find_nearest_bars_and_clubs(55.7558, 37.6173)
-        assert "Ошибка сети" in str(excinfo.value)
+    result = await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+    assert "Ошибка при поиске" in result
 
 
-def test_get_coordinates_by_address_success():
+@pytest.mark.asyncio
+async def test_find_nearest_bars_and_clubs_error():
     search = Search(api_key="testkey", db_manager=None)
-    with patch("requests.get") as mock_get:
-        mock_get.return_value.json.return_value = [{"lat": "55.7558", "lon": "37.6173"}]
-        mock_get.return_value.raise_for_status = Mock()
+    search.api_client.search_items = AsyncMock(side_effect=Exception("Ошибка сети"))
 
-        result = search._get_coordinates_by_address("Москва")
-        assert result == (55.7558, 37.6173)
+    with pytest.raises(Exception) as excinfo:
+        await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+    assert "Ошибка сети" in str(excinfo.value)
 
 
-def test_get_coordinates_by_address_error():
+@pytest.mark.asyncio
+async def test_get_coordinates_by_address_success():
     search = Search(api_key="testkey", db_manager=None)
-    with patch("requests.get") as mock_get:
-        mock_get.side_effect = Exception("Ошибка сети")
+    search.geocoder.rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    search.api_client.geocode = AsyncMock(
+        return_value=[{"lat": "55.7558", "lon": "37.6173"}]
+    )
 
-        with pytest.raises(Exception) as excinfo:
-            search._get_coordinates_by_address("Неизвестный адрес")
-        assert "Ошибка сети" in str(excinfo.value)
+    result = await search._get_coordinates_by_address("Москва")
+    assert result == (55.7558, 37.6173)
 
 
-def test_generate_yandex_maps_link_with_name_success():
+@pytest.mark.asyncio
+async def test_get_coordinates_by_address_error():
     search = Search(api_key="testkey", db_manager=None)
-    result = search._generate_yandex_maps_link_with_name("Бар", 55.7558, 37.6173)
-    assert "yandex.ru/maps" in result
-    assert "55.7558" in result
+    search.geocoder.rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    search.api_client.geocode = AsyncMock(side_effect=Exception("Ошибка сети"))
+
+    with pytest.raises(Exception) as excinfo:
+        await search._get_coordinates_by_address("Неизвестный адрес")
+    assert "Ошибка сети" in str(excinfo.value)
 
 
-def test_generate_yandex_maps_link_with_name_empty():
+@pytest.mark.asyncio
+async def test_find_nearest_bars_and_clubs_uses_tile_cache():
     search = Search(api_key="testkey", db_manager=None)
-    result = search._generate_yandex_maps_link_with_name("", 55.7558, 37.6173)
-    assert "yandex.ru/maps" in result
+    search.api_client.search_items = AsyncMock(
+        return_value={
+            "result": {
+                "items": [
+                    {
+                        "name": "Бар",
+                        "address_name": "Улица",
+                        "geometry": {"location": {"lat": 55.7558, "lon": 37.6173}},
+                    }
+                ]
+            }
+        }
+    )
+
+    first = await search.find_nearest_bars_and_clubs(55.75580, 37.61730)
+    second = await search.find_nearest_bars_and_clubs(55.75581, 37.61731)
+
+    assert first == second
+    search.api_client.search_items.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_build_venues_geocodes_concurrently_with_deadline():
+    search = Search(api_key="testkey", db_manager=None, geocode_deadline=0.05)
+
+    async def get_coordinates(address):
+        if address == "Медленная":
+            await asyncio.sleep(1)
+        return 55.75, 37.61
+
+    search.geocoder.get_coordinates = get_coordinates
+    data = {
+        "result": {
+            "items": [
+                {"name": "Бар", "address_name": "Быстрая"},
+                {"name": "Клуб", "address_name": "Медленная"},
+            ]
+        }
+    }
+
+    result = search._render_venues(await search._build_venues(data))
+
+    bar, club = result.split("\n\n")
+    assert "yandex.ru/maps" in bar
+    assert "Ссылка не доступна" in club
+    for task in search._background_tasks:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_failed_geocode_leaves_venue_unresolved():
+    search = Search(api_key="testkey", db_manager=None)
+
+    async def get_coordinates(address):
+        if address == "Сломанная":
+            raise ValueError("bad address")
+        return 55.75, 37.61
+
+    search.geocoder.get_coordinates = get_coordinates
+    search.api_client.search_items = AsyncMock(
+        return_value={
+            "result": {
+                "items": [
+                    {"name": "Бар", "address_name": "Целая"},
+                    {"name": "Клуб", "address_name": "Сломанная"},
+                ]
+            }
+        }
+    )
+
+    text, _ = await search.find_page(55.75, 37.61)
+
+    bar, club = text.split("\n\n")
+    assert "yandex.ru/maps" in bar
+    assert "Ссылка не доступна" in club
+
+
+@pytest.mark.asyncio
+async def test_find_page_ranks_venues_for_members():
+    search = Search(api_key="testkey", db_manager=None, meeting_strategy="minimax")
+    data = {
+        "result": {
+            "items": [
+                {
+                    "name": "Далёкий",
+                    "address_name": "Окраина",
+                    "geometry": {"location": {"lat": 55.9, "lon": 37.9}},
+                },
+                {
+                    "name": "Близкий",
+                    "address_name": "Центр",
+                    "geometry": {"location": {"lat": 55.753, "lon": 37.619}},
+                },
+            ]
+        }
+    }
+    members = to_points([(55.7558, 37.6173), (55.75, 37.62)])
+
+    search.api_client.search_items = AsyncMock(return_value=data)
+
+    result, _ = await search.find_page(55.7558, 37.6173, members=members)
+
+    first, second = result.split("\n\n")
+    assert first.startswith("Близкий")
+    assert "До участников: максимум" in first
+    assert second.startswith("Далёкий")
+
+
+@pytest.mark.asyncio
+async def test_find_nearest_bars_and_clubs_falls_back_to_index_when_api_fails():
+    search = Search(api_key="testkey", db_manager=None)
+    search.api_client.search_items = AsyncMock(
+        side_effect=httpx.ConnectTimeout("timeout")
+    )
+    search.venue_index.add(Venue("1", "Бар", "Улица", 55.7560, 37.6175))
+
+    result = await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+
+    assert result.startswith("Бар\nАдрес: Улица")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_for_same_area_are_coalesced():
+    search = Search(api_key="testkey", db_manager=None)
+
+    async def search_items(params):
+        await asyncio.sleep(0.01)
+        return {
+            "result": {
+                "items": [
+                    {
+                        "id": "1",
+                        "name": "Бар",
+                        "address_name": "Улица",
+                        "geometry": {"location": {"lat": 55.7558, "lon": 37.6173}},
+                    }
+                ]
+            }
+        }
+
+    search.api_client.search_items = AsyncMock(side_effect=search_items)
+
+    results = await asyncio.gather(
+        search.find_nearest_bars_and_clubs(55.75580, 37.61730),
+        search.find_nearest_bars_and_clubs(55.75581, 37.61731),
+        search.find_nearest_bars_and_clubs(55.75582, 37.61732),
+    )
+
+    assert all("Бар" in result for result in results)
+    search.api_client.search_items.assert_called_once()
+
+
+def catalog_page(page, total=7):
+    count = min(5, total - (page - 1) * 5)
+    return {
+        "result": {
+            "total": total,
+            "items": [
+                {
+                    "id": f"{page}:{index}",
+                    "name": f"Бар {page}.{index}",
+                    "address_name": "Улица",
+                    "geometry": {
+                        "location": {"lat": 55.75 + index * 1e-3, "lon": 37.61}
+                    },
+                }
+                for index in range(count)
+            ],
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_search_pages_prefetch_next_page():
+    search = Search(api_key="testkey", db_manager=Mock(spec=AsyncDatabaseManager))
+    search.db_manager.get_user_location.return_value = (55.75, 37.61)
+    search.api_client.search_items = AsyncMock(
+        side_effect=lambda params: catalog_page(params.get("page", 1))
+    )
+    update = Update(update_id=1, message=AsyncMock())
+    update.message.from_user.username = "testuser"
+
+    await search.search(update, Mock(spec=CallbackContext))
+    await asyncio.gather(*search._background_tasks)
+
+    text = update.message.reply_text.call_args.args[0]
+    markup = update.message.reply_text.call_args.kwargs["reply_markup"]
+    (next_button,) = markup.inline_keyboard[0]
+    assert "Бар 1.0" in text
+    assert next_button.text == "Далее →"
+    assert search.api_client.search_items.call_count == 2
+    assert search.api_client.search_items.call_args.args[0]["page"] == 2
+
+    query = AsyncMock()
+    query.data = next_button.callback_data
+    await search.show_page(Update(update_id=2, callback_query=query), Mock())
+
+    page_text = query.edit_message_text.call_args.args[0]
+    (previous_button,) = query.edit_message_text.call_args.kwargs[
+        "reply_markup"
+    ].inline_keyboard[0]
+    assert "Бар 2.0" in page_text and "Бар 1.0" not in page_text
+    assert previous_button.text == "← Назад"
+    assert search.api_client.search_items.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_show_page_with_expired_session():
+    search = Search(api_key="testkey", db_manager=None)
+    query = AsyncMock()
+    query.data = "page:unknown:2"
+
+    await search.show_page(Update(update_id=1, callback_query=query), Mock())
+
+    query.message.reply_text.assert_called_once_with(
+        "Результаты поиска устарели. Выполните поиск заново."
+    )
+    query.edit_message_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cached_tile_skips_parsing():
+    search = Search(api_key="testkey", db_manager=None)
+    search.api_client.search_items = AsyncMock(return_value=catalog_page(1, total=3))
+
+    first, _ = await search.find_page(55.75, 37.61)
+    search.venue_index._covered.clear()
+    with patch.object(search, "_build_venues") as build_venues:
+        second, _ = await search.find_page(55.75, 37.61)
+
+    assert second == first
+    build_venues.assert_not_called()
+    venues, has_next = search.venue_cache.get(search._tile_key(55.75, 37.61))
+    assert [venue.name for venue in venues] == ["Бар 1.0", "Бар 1.1", "Бар 1.2"]
+    assert has_next is False
+
+
+@pytest.mark.asyncio
+async def test_prefetch_area_warms_next_search_and_deduplicates():
+    search = Search(api_key="testkey", db_manager=None)
+
+    async def search_items(params):
+        await asyncio.sleep(0.01)
+        return catalog_page(1, total=3)
+
+    search.api_client.search_items = AsyncMock(side_effect=search_items)
+
+    task = search.prefetch_area(55.75, 37.61)
+    assert search.prefetch_area(55.75001, 37.61001) is None
+    await task
+    assert search.prefetch_area(55.75, 37.61) is None
+
+    text, _ = await search.find_page(55.75, 37.61)
+
+    assert "Бар 1.0" in text
+    search.api_client.search_items.assert_called_once()
+    assert search.prefetch_stats() == {
+        "started": 1,
+        "deduplicated": 2,
+        "over_budget": 0,
+        "failed": 0,
+        "in_flight": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_prefetch_area_respects_budget():
+    search = Search(
+        api_key="testkey", db_manager=None, prefetch_rate=0.001, prefetch_burst=2
+    )
+    search.api_client.search_items = AsyncMock(return_value=catalog_page(1, total=3))
+
+    tasks = [search.prefetch_area(55.0 + index, 37.0) for index in range(3)]
+    await asyncio.gather(*[task for task in tasks if task is not None])
+
+    assert tasks[2] is None
+    assert search.api_client.search_items.call_count == 2
+    assert search.prefetch_stats()["over_budget"] == 1
+
+
+@pytest.mark.asyncio
+async def test_find_nearest_bars_and_clubs_answers_covered_area_from_index():
+    search = Search(api_key="testkey", db_manager=None)
+    search.api_client.search_items = AsyncMock(
+        return_value={
+            "result": {
+                "items": [
+                    {
+                        "id": "1",
+                        "name": "Бар",
+                        "address_name": "Улица",
+                        "geometry": {"location": {"lat": 55.7558, "lon": 37.6173}},
+                    }
+                ]
+            }
+        }
+    )
+
+    await search.find_nearest_bars_and_clubs(55.7558, 37.6173)
+    search.venue_cache.clear()
+    result = await search.find_nearest_bars_and_clubs(55.7559, 37.6174)
+
+    assert "Бар" in result
+    search.api_client.search_items.assert_called_once()
+
+
+def page_names(text):
+    return [block.split("\n")[0] for block in text.split("\n\n")]
+
+
+@pytest.mark.asyncio
+async def test_pages_do_not_repeat_venues_in_covered_area():
+    search = Search(api_key="testkey", db_manager=Mock(spec=AsyncDatabaseManager))
+    search.api_client.search_items = AsyncMock(
+        side_effect=lambda params: catalog_page(params.get("page", 1), total=12)
+    )
+    # Индекс знает две страницы выдачи и покрывает район, поэтому первая
+    # страница собирается из него вперемешку из обеих.
+    await search.find_page(55.75, 37.61, 1)
+    await search.find_page(55.75, 37.61, 2)
+    head = search._covered_page(55.75, 37.61)
+    search._page_sessions.set("token", (55.75, 37.61, None, head))
+
+    names, page, has_next = [], 1, True
+    while has_next:
+        text, has_next = await search._get_page("token", page)
+        names.extend(page_names(text))
+        page += 1
+    first = page_names((await search._get_page("token", 1))[0])
+    assert set(first) != {f"Бар 1.{index}" for index in range(5)}
+    assert sorted(names) == sorted(
+        f"Бар {page}.{index}"
+        for page in (1, 2, 3)
+        for index in range(5 if page < 3 else 2)
+    )
+
+
+def test_unknown_meeting_strategy_fails_fast():
+    with pytest.raises(ValueError, match="meeting_strategy"):
+        Search(api_key="testkey", db_manager=None, meeting_strategy="centriod")
+
+
+@pytest.mark.asyncio
+async def test_failed_prefetch_is_logged_and_counted():
+    search = Search(api_key="testkey", db_manager=None)
+    search.api_client.search_items = AsyncMock(side_effect=ValueError("boom"))
+
+    await search.prefetch_area(55.75, 37.61)
+
+    assert search.prefetch_stats()["failed"] == 1
+    assert search.prefetch_stats()["in_flight"] == 0
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from develop.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_with_same_key_share_one_execution():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def load(value):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    results = await asyncio.gather(
+        *(single_flight.do("key", load, 21) for _ in range(5))
+    )
+
+    assert results == [42] * 5
+    assert calls == 1
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    single_flight = SingleFlight()
+
+    async def load(value):
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(
+        single_flight.do("a", load, 1), single_flight.do("b", load, 2)
+    )
+
+    assert results == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_not_cached():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        raise ValueError("upstream")
+
+    results = await asyncio.gather(
+        single_flight.do("key", fail),
+        single_flight.do("key", fail),
+        return_exceptions=True,
+    )
+    with pytest.raises(ValueError):
+        await single_flight.do("key", fail)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    single_flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    first = asyncio.ensure_future(single_flight.do("key", load))
+    second = asyncio.ensure_future(single_flight.do("key", load))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
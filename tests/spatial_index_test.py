@@ -0,0 +1,68 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+from develop.spatial_index import VenueIndex
+from develop.venue import Venue
+
+
+def venue(name, latitude, longitude, venue_id=None):
+    return Venue(venue_id, name, f"{name} адрес", latitude, longitude)
+
+
+def test_within_returns_sorted_venues_inside_radius():
+    index = VenueIndex()
+    index.add_many(
+        [
+            venue("Дальний", 55.80, 37.62),
+            venue("Ближний", 55.7560, 37.6175),
+            venue("Средний", 55.76, 37.62),
+        ]
+    )
+
+    found = index.within(55.7558, 37.6173, 1000)
+
+    assert [item.name for _, item in found] == ["Ближний", "Средний"]
+    assert found[0][0] < found[1][0] <= 1000
+
+
+def test_nearest_across_antimeridian():
+    index = VenueIndex()
+    index.add(venue("Восток", 0.0, 179.999))
+    index.add(venue("Запад", 0.0, -179.999))
+
+    found = index.nearest(0.0, 180.0, 5, 1000)
+
+    assert {item.name for _, item in found} == {"Восток", "Запад"}
+
+
+def test_lookup_requires_coverage():
+    index = VenueIndex()
+    index.add(venue("Бар", 55.7560, 37.6175))
+
+    assert index.lookup(55.7558, 37.6173, 5, 5000) is None
+
+    index.mark_covered(55.7558, 37.6173)
+
+    assert [item.name for item in index.lookup(55.7558, 37.6173, 5, 5000)] == ["Бар"]
+
+
+def test_readding_venue_replaces_it_and_cap_evicts_oldest():
+    index = VenueIndex(max_venues=2)
+    index.add(venue("Бар", 55.75, 37.61, venue_id="1"))
+    index.add(venue("Бар", 55.76, 37.62, venue_id="1"))
+    index.add(venue("Клуб", 55.75, 37.61, venue_id="2"))
+    index.add(venue("Паб", 55.75, 37.61, venue_id="3"))
+
+    names = [item.name for _, item in index.within(55.755, 37.615, 5000)]
+
+    assert len(index) == 2
+    assert sorted(names) == ["Клуб", "Паб"]
+
+
+def test_venues_without_coordinates_are_skipped():
+    index = VenueIndex()
+    index.add(venue("Без координат", None, None))
+
+    assert len(index) == 0
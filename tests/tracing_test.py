@@ -0,0 +1,110 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import pytest
+
+# Как и metrics, tracing хранит состояние на уровне модуля, поэтому берём
+# тот же экземпляр модуля, что и остальной код.
+from tracing import NOOP_SPAN, SamplingProfiler, Tracer, otlp_payload, traced
+import tracing
+
+
+class ListExporter:
+    def __init__(self):
+        self.batches = []
+
+    def export(self, spans):
+        self.batches.append(spans)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def exporter():
+    exporter = ListExporter()
+    tracing.TRACER.configure(exporter)
+    yield exporter
+    tracing.TRACER.configure(None)
+
+
+def test_disabled_tracer_returns_noop_span():
+    tracer = Tracer()
+    assert tracer.span("anything") is NOOP_SPAN
+
+
+@pytest.mark.asyncio
+async def test_nested_spans_are_exported_with_root(exporter):
+    @traced("inner")
+    async def inner():
+        return 42
+
+    with tracing.TRACER.span("root", update_id=7):
+        assert await inner() == 42
+        assert exporter.batches == []
+
+    (batch,) = exporter.batches
+    inner_span, root_span = batch
+    assert inner_span.name == "inner"
+    assert inner_span.trace_id == root_span.trace_id
+    assert inner_span.parent_id == root_span.span_id
+
+    payload = otlp_payload(batch)
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[1]["attributes"] == [
+        {"key": "update_id", "value": {"stringValue": "7"}}
+    ]
+    assert "parentSpanId" not in spans[1]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_are_exported_separately(exporter):
+    first_done = asyncio.Event()
+
+    async def handle(name, wait_for=None):
+        with tracing.TRACER.span(f"root {name}"):
+            with tracing.TRACER.span(f"child {name}"):
+                await asyncio.sleep(0)
+            if wait_for is not None:
+                await wait_for.wait()
+            else:
+                first_done.set()
+
+    await asyncio.gather(handle("slow", wait_for=first_done), handle("fast"))
+
+    assert [[span.name for span in batch] for batch in exporter.batches] == [
+        ["child fast", "root fast"],
+        ["child slow", "root slow"],
+    ]
+
+
+def test_span_records_error(exporter):
+    with pytest.raises(ValueError):
+        with tracing.TRACER.span("root"):
+            raise ValueError("boom")
+
+    (root,) = exporter.batches[0]
+    assert root.to_otlp()["status"]["code"] == 2
+
+
+def test_profiler_samples_every_nth_update(tmp_path):
+    profiler = SamplingProfiler()
+    assert not profiler.should_sample()
+
+    profiler.every = 3
+    assert [profiler.should_sample() for _ in range(6)] == [
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+    profiler.stacks["main;handler;search"] += 2
+    path = tmp_path / "profile.folded"
+    assert profiler.dump(path) == 1
+    assert path.read_text() == "main;handler;search 2\n"
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from develop.update_processor import PerUserUpdateProcessor
+
+
+def make_update(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id))
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_user_keep_order():
+    processor = PerUserUpdateProcessor(max_workers=4)
+    events = []
+
+    async def handle(name, delay):
+        await asyncio.sleep(delay)
+        events.append(name)
+
+    await asyncio.gather(
+        processor.process_update(make_update(1), handle("location", 0.02)),
+        processor.process_update(make_update(1), handle("search", 0)),
+    )
+
+    assert events == ["location", "search"]
+
+
+@pytest.mark.asyncio
+async def test_different_users_run_concurrently():
+    processor = PerUserUpdateProcessor(max_workers=4)
+    events = []
+
+    async def handle(name, delay):
+        await asyncio.sleep(delay)
+        events.append(name)
+
+    await asyncio.gather(
+        processor.process_update(make_update(1), handle("slow", 0.02)),
+        processor.process_update(make_update(2), handle("fast", 0)),
+    )
+
+    assert events == ["fast", "slow"]
+    assert processor._user_locks == {}
+
+
+@pytest.mark.asyncio
+async def test_worker_limit_is_respected():
+    processor = PerUserUpdateProcessor(max_workers=2)
+    running = 0
+    peak = 0
+
+    async def handle():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(
+        *(processor.process_update(make_update(i), handle()) for i in range(6))
+    )
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_flooding_user_does_not_delay_others():
+    processor = PerUserUpdateProcessor(
+        max_workers=4, max_pending_updates=8, max_user_pending=2
+    )
+    release = asyncio.Event()
+    handled = []
+
+    async def handle(name):
+        if name == "flood":
+            await release.wait()
+        handled.append(name)
+
+    flood = [
+        asyncio.ensure_future(processor.process_update(make_update(1), handle("flood")))
+        for _ in range(20)
+    ]
+    await asyncio.sleep(0)
+
+    await asyncio.wait_for(
+        processor.process_update(make_update(2), handle("other")), 0.5
+    )
+    release.set()
+    await asyncio.gather(*flood)
+
+    assert handled.count("flood") == 2
+    assert processor.dropped == 18
@@ -0,0 +1,46 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import pickle
+from develop.venue import NO_LINK, Venue, yandex_maps_link
+
+
+def test_yandex_maps_link():
+    result = yandex_maps_link("Бар", 55.7558, 37.6173)
+    assert "yandex.ru/maps" in result
+    assert "55.7558" in result
+
+
+def test_yandex_maps_link_empty_name():
+    assert "yandex.ru/maps" in yandex_maps_link("", 55.7558, 37.6173)
+
+
+def test_venue_precomputes_link_and_text():
+    venue = Venue("1", "Бар Ёж", "Улица", 55.7558, 37.6173)
+
+    assert venue.link == yandex_maps_link("Бар Ёж", 55.7558, 37.6173)
+    assert venue.text == f"Бар Ёж\nАдрес: Улица\nСсылка: {venue.link}"
+
+
+def test_venue_without_location():
+    venue = Venue(None, "Клуб", "Площадь")
+
+    assert venue.link is None
+    assert venue.text.endswith(NO_LINK)
+    assert venue.key == ("Клуб", "Площадь")
+    assert venue.with_location(55.0, 37.0).has_location
+
+
+def test_venue_pickles_as_field_tuple():
+    venue = Venue("1", "Бар", "Улица", 55.7558, 37.6173)
+
+    restored = pickle.loads(pickle.dumps(venue))
+
+    assert restored == venue
+    assert restored.text == venue.text
+    assert Venue.from_tuple(venue.to_tuple()) == venue
+    # Ссылка и текст не сериализуются, а пересчитываются при загрузке.
+    fields = {name: getattr(venue, name) for name in Venue.__slots__}
+    assert len(pickle.dumps(venue)) < len(pickle.dumps(fields))
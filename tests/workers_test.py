@@ -0,0 +1,124 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import queue
+import time
+import httpx
+import pytest
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from develop.shared_cache import SharedCache
+from develop.workers import WebhookHandler, route, update_user_id
+
+
+def message_update(update_id, user_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "chat": {"id": user_id, "type": "private"},
+            "date": 0,
+            "text": "/search",
+        },
+    }
+
+
+def test_update_user_id_for_messages_and_callbacks():
+    assert update_user_id(message_update(1, 42)) == 42
+    callback = {
+        "update_id": 2,
+        "callback_query": {"id": "1", "from": {"id": 7}, "chat_instance": "1"},
+    }
+    assert update_user_id(callback) == 7
+    assert update_user_id({"update_id": 3}) == 3
+
+
+def test_route_keeps_user_on_one_worker():
+    workers = {route(message_update(i, 42), 8) for i in range(20)}
+    assert len(workers) == 1
+    spread = {route(message_update(1, user_id), 8) for user_id in range(200)}
+    assert len(spread) == 8
+
+
+@pytest.mark.asyncio
+async def test_webhook_handler_routes_and_checks_secret():
+    queues = [queue.Queue(), queue.Queue()]
+    app = tornado.web.Application(
+        [("/telegram", WebhookHandler, {"queues": queues, "secret_token": "s3cret"})]
+    )
+    sockets = bind_sockets(0, "127.0.0.1")
+    port = sockets[0].getsockname()[1]
+    server = HTTPServer(app)
+    server.add_sockets(sockets)
+
+    url = f"http://127.0.0.1:{port}/telegram"
+    update = message_update(1, 42)
+    async with httpx.AsyncClient() as client:
+        denied = await client.post(url, json=update)
+        accepted = await client.post(
+            url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+        )
+    server.stop()
+
+    assert denied.status_code == 403
+    assert accepted.status_code == 200
+    assert queues[route(update, 2)].get_nowait() == update
+
+
+def test_shared_cache_is_visible_across_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = SharedCache(path, "venues", ttl=60)
+    second = SharedCache(path, "venues", ttl=60)
+
+    first.set(("u4pruyd", "бар", 5000), {"result": {"items": []}})
+    first.set("unknown address", None)
+
+    assert second.get(("u4pruyd", "бар", 5000)) == {"result": {"items": []}}
+    assert "unknown address" in second
+    assert second.get("unknown address", "missing") is None
+    assert SharedCache(path, "geocode", ttl=60).get("unknown address") is None
+
+
+def test_shared_cache_expires_and_prunes(tmp_path):
+    now = [1000.0]
+    cache = SharedCache(
+        str(tmp_path / "cache.sqlite"),
+        "venues",
+        ttl=10,
+        max_entries=2,
+        prune_every=1,
+        clock=lambda: now[0],
+    )
+
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=20)
+    cache.set("c", 3, ttl=30)
+    assert len(cache) == 2
+    assert cache.get("a") is None
+
+    now[0] += 25
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_shared_cache_skips_busy_database(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SharedCache(path, "venues", ttl=60)
+    cache.set("a", 1)
+    writer = SharedCache(path, "venues", ttl=60)
+    writer._connection.execute("BEGIN EXCLUSIVE")
+
+    start = time.perf_counter()
+    cache.set("b", 2)
+    value = cache.get("a", "missing")
+
+    # В WAL читатели не ждут писателя, пропускается только запись.
+    assert time.perf_counter() - start < 0.5
+    assert value == 1
+    assert cache.busy == 1
+    writer._connection.execute("ROLLBACK")
+    assert cache.get("b") is None
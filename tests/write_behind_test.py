@@ -0,0 +1,154 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../develop")))
+
+import asyncio
+import pytest
+from unittest.mock import Mock
+from develop.async_database_manager import AsyncDatabaseManager
+from develop.write_behind import WriteBehindDatabaseManager
+
+
+@pytest.fixture
+def inner():
+    db_manager = Mock(spec=AsyncDatabaseManager)
+    db_manager.add_users.return_value = True
+    db_manager.update_user_locations.return_value = True
+    db_manager.get_user_location.return_value = (1.0, 2.0)
+    return db_manager
+
+
+@pytest.mark.asyncio
+async def test_latest_location_per_user_is_flushed_in_one_batch(inner):
+    db_manager = WriteBehindDatabaseManager(inner)
+
+    await db_manager.add_user("@user1")
+    await db_manager.update_user_location("@user1", 55.0, 37.0)
+    await db_manager.update_user_location("@user1", 55.5, 37.5)
+    await db_manager.update_user_location("@user2", 59.9, 30.3)
+    inner.update_user_locations.assert_not_called()
+
+    await db_manager.flush()
+
+    inner.add_users.assert_called_once_with(["@user1"])
+    inner.update_user_locations.assert_called_once_with(
+        [("@user1", 55.5, 37.5), ("@user2", 59.9, 30.3)]
+    )
+    assert db_manager.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_reader_sees_pending_write(inner):
+    db_manager = WriteBehindDatabaseManager(inner)
+
+    await db_manager.update_user_location("@user1", 55.5, 37.5)
+
+    assert await db_manager.get_user_location("@user1") == (55.5, 37.5)
+    assert await db_manager.get_user_location("@user2") == (1.0, 2.0)
+    inner.get_user_location.assert_called_once_with("@user2")
+
+
+@pytest.mark.asyncio
+async def test_batch_size_triggers_flush(inner):
+    db_manager = WriteBehindDatabaseManager(inner, max_batch=2)
+
+    await db_manager.update_user_location("@user1", 55.5, 37.5)
+    await db_manager.update_user_location("@user2", 59.9, 30.3)
+    await asyncio.sleep(0)
+
+    inner.update_user_locations.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_newer_pending_values(inner):
+    inner.update_user_locations.return_value = False
+    db_manager = WriteBehindDatabaseManager(inner)
+
+    await db_manager.update_user_location("@user1", 55.5, 37.5)
+    await db_manager.flush()
+
+    assert db_manager.pending_count() == 1
+    assert await db_manager.get_user_location("@user1") == (55.5, 37.5)
+
+
+@pytest.mark.asyncio
+async def test_group_reads_flush_pending_writes_first(inner):
+    db_manager = WriteBehindDatabaseManager(inner)
+    inner.get_group_locations.return_value = [(55.5, 37.5)]
+
+    await db_manager.add_user("@user1")
+    result = await db_manager.get_group_locations("friends")
+
+    assert result == [(55.5, 37.5)]
+    inner.add_users.assert_called_once_with(["@user1"])
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_and_closes(inner):
+    db_manager = WriteBehindDatabaseManager(inner, flush_interval=60)
+    db_manager.start()
+
+    await db_manager.update_user_location("@user1", 55.5, 37.5)
+    await db_manager.close()
+
+    inner.update_user_locations.assert_called_once()
+    inner.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_zero_flush_interval_writes_through(inner):
+    db_manager = WriteBehindDatabaseManager(inner, flush_interval=0)
+    db_manager.start()
+
+    await db_manager.update_user_location("@user1", 55.0, 37.0)
+
+    inner.update_user_locations.assert_called_once_with([("@user1", 55.0, 37.0)])
+    assert db_manager._flush_task is None
+    assert db_manager.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_bad_row_does_not_block_the_batch(inner):
+    # Как слишком длинное имя для VARCHAR(50): пачка с ним не записывается.
+    bad = "x" * 100
+    inner.update_user_locations.side_effect = lambda rows: all(
+        row[0] != bad for row in rows
+    )
+    db_manager = WriteBehindDatabaseManager(inner, max_attempts=2)
+
+    for index in range(4):
+        await db_manager.update_user_location(f"@user{index}", 55.0, 37.0)
+    await db_manager.update_user_location(bad, 55.0, 37.0)
+    await db_manager.flush()
+
+    batches = [call.args[0] for call in inner.update_user_locations.call_args_list]
+    written = {
+        row[0]
+        for batch in batches
+        if all(row[0] != bad for row in batch)
+        for row in batch
+    }
+    assert written == {f"@user{index}" for index in range(4)}
+    assert db_manager.pending_count() == 1
+
+    await db_manager.update_user_location("@user0", 56.0, 38.0)
+    await db_manager.flush()
+
+    assert db_manager.pending_count() == 0
+    assert await db_manager.get_user_location(bad) == (1.0, 2.0)
+
+
+@pytest.mark.asyncio
+async def test_pending_buffer_is_capped(inner):
+    inner.update_user_locations.return_value = False
+    db_manager = WriteBehindDatabaseManager(inner, max_pending=2)
+
+    for index in range(3):
+        await db_manager.update_user_location(f"@user{index}", 55.0, 37.0)
+    await db_manager.update_user_location("@user0", 56.0, 38.0)
+    await db_manager.flush()
+
+    assert db_manager.pending_count() == 2
+    assert await db_manager.get_user_location("@user0") == (56.0, 38.0)
+    assert await db_manager.get_user_location("@user2") == (1.0, 2.0)